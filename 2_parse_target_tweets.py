@@ -40,6 +40,9 @@ if __name__ == "__main__":
 	# modes of research
 	modes_of_research = ['interdisciplinary', 'multidisciplinary','transdisciplinary']
 
+	# tracker to keep track of processed tweet ids (per tweet type)
+	tweet_tracker = get_tweet_tracker(db, collection = 'raw_tweets')
+
 	# process tweets for each mode of research
 	for mode in modes_of_research:
 
@@ -48,8 +51,9 @@ if __name__ == "__main__":
 		# read tweets files
 		F = read_directory(os.path.join(location_tweets, mode))
 
-		# tracker to keep track of processed tweet ids
-		tweet_tracker = set(['{}{}'.format(x['tweet_type'], x['id']) for x in db.read_collection(collection = 'raw_tweets')])
+		# report the progress over the tweets, and count the tweets that were already processed instead of logging each of them
+		progress = ProgressReporter('parse {} tweets'.format(mode))
+		skipped = 0
 
 		# loop over each file, read content, parse relevant fields, save to db
 		for i, f in enumerate(F):
@@ -62,14 +66,16 @@ if __name__ == "__main__":
 			# loop over each tweet
 			for tweet in tweets:
 
+				progress.update()
+
 				# convert string to json
 				tweet = json.loads(tweet)
 
 				# check if tweet ID already processed
-				if '{}{}'.format(mode, str(tweet['id'])) not in tweet_tracker:
+				if (mode, tweet['id']) not in tweet_tracker:
 
 					# add to tracker so we won't process the same id + type again
-					tweet_tracker.add(mode + str(tweet['id']))
+					tweet_tracker.add(mode, tweet['id'])
 
 					# create new document so we can save it to the database
 					doc = {}
@@ -86,5 +92,13 @@ if __name__ == "__main__":
 					db.insert_one_to_collection(collection = 'raw_tweets', doc = doc)
 
 				else:
-					logging.info('Tweet ID {} already processed, skipping...'.format(tweet['id']))
+					skipped += 1
+
+			# save the tracker after each file, so a next run knows which tweets were inserted
+			tweet_tracker.save()
+
+		progress.finish()
+
+		logging.info('Skipped {} tweets that were already processed'.format(skipped))
+
 		
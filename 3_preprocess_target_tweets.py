@@ -54,27 +54,230 @@
 		with the condition that they are part of the training data. As a result, slang that is indicative of a specific sentiment class (e.g. positive or negative) would be assigned appropriate weights or probabilities during model creation.
 
 	### What do the switches do:
-	There are two switches that can be turned on or off (by setting them to True or False).
+	There are four switches that can be turned on or off (by setting them to True or False).
 
 	*	filter_tweets = [True|False]
 		-	exclude non-English tweets, exclude retweets, and matches words found in the bio field of the tweet to a list of occupations. Filtering for occuptations enables the creation of a set of tweets from a specific audience (here originating from an academic setting)
 	*	clean_tweets = [True|False]
 		-	performs the remaining of the preprocessing steps
+	*	reprocess_tweets = [True|False]
+		-	preprocess the target tweets that were created with an older version of the preprocessing (see use_preprocess_cache) again, and update them in place. Note that tweets are not checked for duplicates again, but the near-duplicate index is built again from the updated texts, so new tweets are compared with the current texts
+	*	word_boundary_matching = [True|False]
+		-	only match occupations in the bio as whole words, for example, 'actuary' will then not match 'actuaryship'
 
 
+	### Settings
+
+	*	num_workers = cpu_count()
+		-	number of processes that clean, tokenize, and lemmatize the tweets; each process loads spaCy once and set to 1 to process the tweets in a single process
+	*	chunk_size = 1000
+		-	number of tweets send to a process at once and inserted into the database in bulk
+	*	use_preprocess_cache = [True|False]
+		-	read the preprocessed text from the collection 'preprocess_cache', keyed by a hash of the raw text and the version of the preprocessing. Changing the cleaning functions or the spaCy model creates a new version, so outdated texts are preprocessed again
+	*	near_duplicate_threshold = 0.8
+		-	minimum similarity of two cleaned tweets of the same tweet type to be considered duplicates (estimated with MinHash signatures of word pairs), 1.0 only removes identical tweets. The index of kept tweets is stored in the collections 'near_duplicate_index' and 'near_duplicate_index_signatures'; drop these together with 'target_tweets' when processing from scratch
+
 	How to run:
 	python 3_preprocess_target_tweets.py
 
 """
 
 # packages and modules
+import re
 from helper_functions import *
 from database import MongoDatabase
+from word_matcher import WordMatcher
+from multiprocessing import cpu_count
+from near_duplicates import NearDuplicateIndex
+from reprocess import reprocess_collection
+from stream_pipeline import StreamPipeline, Source, Transform, Filter, BatchTransform, Sink
 
 
 # switches, set to True what needs to be executed
 filter_tweets = True
 clean_tweets = True
+reprocess_tweets = False
+
+# only match academic words in the bio that are not part of a larger word (False gives the same matches as a plain substring search)
+word_boundary_matching = False
+
+# number of processes that clean the tweets (each loads spaCy once) and number of tweets send to a process at once
+num_workers = cpu_count()
+chunk_size = 1000
+
+# read the preprocessed text of tweets that have been preprocessed before (by step 3 or 5, with the same version of the preprocessing) from the cache
+use_preprocess_cache = True
+
+# minimum similarity (Jaccard similarity of word pairs) of two cleaned tweets of the same tweet type to be considered duplicates, 1.0 only removes identical tweets
+near_duplicate_threshold = 0.8
+
+"""
+	Internal Helper Functions
+"""
+
+def get_bio(d):
+
+	"""
+		Return the lowercased user bio of a tweet document, with new lines replaced by a space
+	"""
+
+	return d['tweet_raw']['user']['description'].lower().replace('\n', ' ').replace('\r', ' ')
+
+
+def get_candidate_tweets_pipeline():
+
+	"""
+		Aggregation pipeline that selects the raw tweets that are candidates for the filtered tweets on the database server, so only these tweets have to be read
+			- English tweets only
+			- no retweets
+			- not already in the filtered tweets (same tweet ID and tweet type)
+
+		Returns
+		--------
+		pipeline : list
+			aggregation pipeline for the raw_tweets collection
+	"""
+
+	return [
+		# Check for language as some tweets appear in non-english, and check for retweets
+		{'$match' : {'tweet_raw.lang' : 'en', 'tweet_raw.full_text' : {'$not' : re.compile('^RT ')}}},
+		# look up the filtered tweets with the same tweet ID (in case we want to repeat the process for a set of new tweets), an equality look up uses the
+		# (id, tweet_type) index on all versions of MongoDB, a look up with a pipeline of $expr conditions only does so from MongoDB 5.0
+		{'$lookup' : {'from' : 'filtered_tweets', 'localField' : 'id', 'foreignField' : 'id', 'as' : 'processed'}},
+		# a tweet is processed if one of the filtered tweets with its tweet ID has the same tweet type
+		{'$addFields' : {'processed' : {'$in' : ['$tweet_type', '$processed.tweet_type']}}},
+		# only keep the tweets that have not been processed yet
+		{'$match' : {'processed' : False}},
+		{'$project' : {'processed' : False}},
+	]
+
+
+def match_academic_words(d, academic_matcher):
+
+	"""
+		Map the bio of the user to 1 or more academic professions
+
+		Parameters
+		----------
+		d : dictionary
+			raw tweet document
+		academic_matcher : WordMatcher
+			matcher created from the academic words
+
+		Returns
+		--------
+		d : dictionary
+			document with the matches added, or None if the bio could not be mapped (these tweets are removed)
+	"""
+
+	# read user bio
+	bio = get_bio(d)
+
+	# bios of bots are never mapped to academic professions
+	if ' bot ' in bio:
+		return None
+
+	# check if bio can be mapped to 1 or more academmic professions
+	matches = academic_matcher.find(bio)
+
+	if len(matches) == 0:
+		return None
+
+	for w in matches:
+		logging.info('Academic word match in bio: {}'.format(w))
+
+	# add matches so we can use it later
+	d['matches'] = matches
+
+	# remove _id so we can save it to database again but different collection
+	del d['_id']
+
+	return d
+
+
+def create_target_doc(d):
+
+	"""
+		Create the target tweet document from a filtered tweet, keeping only the fields needed for the target tweets (so only little data has to be send to the worker processes).
+		The preprocessed text is added later on.
+	"""
+
+	# create new document so we can insert it into the database
+	new_doc = {}
+	new_doc['tweet_id'] = d['id']
+	new_doc['tweet_date'] = d['tweet_date']
+	new_doc['tweet_type'] = d['tweet_type']
+	new_doc['raw_text'] = d['tweet_raw']['full_text']
+	new_doc['bio'] = get_bio(d)
+	new_doc['matches'] = d['matches']
+
+	return new_doc
+
+
+def remove_processed(docs, tweet_tracker):
+
+	"""
+		Remove the filtered tweets that have already been saved as target tweets, the whole batch is checked at once
+
+		Parameters
+		----------
+		docs : list of dictionaries
+			filtered tweet documents
+		tweet_tracker : TweetTracker
+			tracker of the tweet IDs in the target_tweets collection
+
+		Returns
+		--------
+		docs : list of dictionaries
+			the documents, with None for the processed tweets
+	"""
+
+	processed = tweet_tracker.contains([d['tweet_type'] for d in docs], [d['id'] for d in docs])
+
+	return [None if p else d for d, p in zip(docs, processed)]
+
+
+def save_target_docs(db, docs, tweet_tracker, near_duplicate_index):
+
+	"""
+		Save the target tweets to the database and add them to the tracker and to the near-duplicate index. The index is saved after the tweets, so a tweet that is
+		processed again after a crash is not found to be a duplicate of itself
+	"""
+
+	db.insert_many_to_collection(collection = 'target_tweets', docs = docs)
+
+	near_duplicate_index.save(texts = [d['text'] for d in docs], groups = [d['tweet_type'] for d in docs])
+
+	tweet_tracker.add([d['tweet_type'] for d in docs], [d['tweet_id'] for d in docs])
+
+
+def remove_near_duplicates(docs, near_duplicate_index):
+
+	"""
+		Remove tweets that are (near) duplicates of a tweet with the same tweet type, processed in this or in a previous run
+
+		occasionally tweets will duplicate the tweet, even though they have different tweet IDs, they are the same and should not be included in the analysis
+		we compare the content of the cleaned tweet. The reason why we don't compare the raw content is that the duplicated tweet often has a different URL at the end.
+		The cleaning process will replace it into a URL placeholder, so it doesn't matter if they are different. Template tweets with small changes in wording are
+		found by comparing the MinHash signatures of the cleaned tweets.
+
+		Parameters
+		----------
+		docs : list of dictionaries
+			target tweet documents with the preprocessed text
+		near_duplicate_index : NearDuplicateIndex
+			index of the tweets that have been kept so far
+
+		Returns
+		--------
+		docs : list of dictionaries
+			the documents, with None for the duplicates
+	"""
+
+	is_new = near_duplicate_index.find_new(texts = [d['text'] for d in docs], groups = [d['tweet_type'] for d in docs])
+
+	return [d if new else None for d, new in zip(docs, is_new)]
+
 
 """
 	Script starts here
@@ -103,61 +306,23 @@ if __name__ == "__main__":
 			filtered tweets will be stored in the collectin 'filtered_tweets'
 		"""
 
-		# read tweets documents from database
-		D = db.read_collection(collection = 'raw_tweets')
-
-		# tracker to keep track of processed tweet IDs (in case we want to repeat the process for a set of new tweets)
-		tweet_tracker = set(['{}{}'.format(x['tweet_type'], x['id']) for x in db.read_collection( collection = 'filtered_tweets')] )
+		# indexes so the language filter and the look up of processed tweets run on the database server
+		db.create_index(collection = 'raw_tweets', keys = [('tweet_raw.lang', 1)])
+		db.create_index(collection = 'filtered_tweets', keys = [('id', 1), ('tweet_type', 1)])
 
 		# read academic/scientists professions (so we can filter the bio on these words)
 		academic_words = [x.strip('\n').strip('\r').lower() for x in read_plain_text(os.path.join('files', 'filter_bio', 'academic_words.txt'), read_lines = True)]
 
-		# loop over each tweet document
-		for i, d in enumerate(D):
-
-			logging.debug('Processing tweet {}/{}'.format(i + 1, D.count()))
-
-			# check if doc already in database
-			if not '{}{}'.format(d['tweet_type'], d['id']) in tweet_tracker:
+		# build the matcher once, so each bio is scanned only once, regardless of the number of academic words
+		academic_matcher = WordMatcher(academic_words, word_boundary = word_boundary_matching)
 
-				# get the raw tweet
-				tweet = d['tweet_raw']
-				# read the content of the tweet
-				text = tweet['full_text']
-				# read language
-				lang = tweet['lang']
-				# read user bio
-				bio = tweet['user']['description'].lower().replace('\n', ' ').replace('\r', ' ')
-
-				# Check for language as some tweets appear in non-english
-				if lang != 'en':
-					continue
-
-				# check for retweets
-				if text.startswith('RT '):
-					continue
-
-				# check if bio can be mapped to 1 or more academmic professions
-				matches = []
-				for w in academic_words:
-					if w in bio:
-						if ' bot ' not in bio:
-							logging.info('Academic word match in bio: {}'.format(w))
-							matches.append(w)
-
-				if len(matches) == 0:
-					continue
-
-				# add matches so we can use it later
-				d['matches'] = matches
-
-				# remove _id so we can save it to database again but different collection
-				del d['_id']
-
-				# save doc to filtered_tweets collectino
-				db.insert_one_to_collection(collection = 'filtered_tweets', doc = d)
-			else:
-				logging.debug('Tweet {} already processed'.format(d['id']))
+		# filter the raw tweets and save them to the filtered_tweets collection
+		StreamPipeline(name = 'filter target tweets', stages = [
+			# non-English tweets, retweets, and processed tweets are removed on the database server, before they are read
+			Source('read candidate raw tweets', lambda: db.aggregate_collection(collection = 'raw_tweets', pipeline = get_candidate_tweets_pipeline())),
+			Transform('match academic words', lambda d: match_academic_words(d, academic_matcher)),
+			Sink('save filtered tweets', lambda docs: db.insert_many_to_collection(collection = 'filtered_tweets', docs = docs), batch_size = chunk_size),
+		]).run()
 
 	# execute if set to True
 	if clean_tweets:
@@ -188,60 +353,32 @@ if __name__ == "__main__":
 				- lemmatization
 		"""
 
-		# read tweets documents from database
-		D = db.read_collection(collection = 'filtered_tweets')
-
 		# tracker to keep track of processed tweet IDs (in case we want to repeat the process for a set of new tweets)
-		tweet_tracker = set(['{}{}'.format(x['tweet_type'], x['tweet_id']) for x in db.read_collection( collection = 'target_tweets')] )
-
-		# tracker for cleaned tweet content (so we can find duplicated content)
-		tweet_text_tracker = set()
-
-		# setup spacy object, so we can do some NLP things
-		nlp = setup_spacy()
+		tweet_tracker = get_tweet_tracker(db, collection = 'target_tweets', id_field = 'tweet_id')
 
-		# loop over each tweet document
-		for i, d in enumerate(D):
+		# index of the cleaned tweet content (so we can find near-duplicated content), stored in the database so duplicates across runs are found as well
+		near_duplicate_index = NearDuplicateIndex(threshold = near_duplicate_threshold)
 
-			logging.debug('Processing tweet {}/{}'.format(i + 1, D.count()))
+		# clean the filtered tweets and save them to the target_tweets collection. Tweets are cleaned, tokenized, and lemmatized in batches (in parallel if num_workers > 1, each
+		# worker loads spaCy once). Batches are returned in order, so the duplicates are found in the same order as a sequential run would
+		StreamPipeline(name = 'clean target tweets', stages = [
+			Source('read filtered tweets', lambda: db.read_collection(collection = 'filtered_tweets'), total = db.count_collection(collection = 'filtered_tweets')),
+			BatchTransform('skip processed tweets', lambda docs: remove_processed(docs, tweet_tracker), batch_size = chunk_size),
+			Transform('create target tweets', create_target_doc),
+			BatchTransform('preprocess text', preprocess_docs, batch_size = chunk_size, num_workers = num_workers, initializer = init_preprocess_worker, initargs = (use_preprocess_cache,)),
+			BatchTransform('skip near-duplicate tweets', lambda docs: remove_near_duplicates(docs, near_duplicate_index), batch_size = chunk_size),
+			Sink('save target tweets', lambda docs: save_target_docs(db, docs, tweet_tracker, near_duplicate_index), batch_size = chunk_size),
+		]).run()
 
-			# check if doc already in database
-			if not '{}{}'.format(d['tweet_type'], d['id']) in tweet_tracker:
+		# save the tracker, so a next run does not have to read the processed tweet IDs from the database
+		tweet_tracker.save()
 
-				# get the original tweet text
-				raw_text = d['tweet_raw']['full_text']
-
-				# preprocess the tweet text
-				text = clean_tweet(raw_text)
-
-				# tokenize the tweet text
-				tokens = get_tokens(text)
-
-				# convert to lemma
-				tokens = get_lemma(nlp(' '.join(tokens)))
-
-				# convert list to string again
-				text = ' '.join(tokens).encode('utf-8')
-				
-				# create new document so we can insert it into the database
-				new_doc = {}
-				new_doc['tweet_id'] = d['id']
-				new_doc['tweet_date'] = d['tweet_date']
-				new_doc['tweet_type'] = d['tweet_type']
-				new_doc['text'] = text
-				new_doc['raw_text'] = raw_text
-				new_doc['bio'] = d['tweet_raw']['user']['description'].lower().replace('\n', ' ').replace('\r', ' ')
-				new_doc['matches'] = d['matches']
-
-				# occasionally tweets will duplicate the tweet, even though they have different tweet IDs, they are the same and should not be included in the analysis
-				# we utilize a somewhat crude way of finding duplicates, that is, the content of the cleaned tweet. The reason why we don't compare the raw content is that
-				# the duplicated tweet often has a different URL at the end. The cleaning process will replace it into a URL placeholder, so it doesn't matter if they are different.
-				if '{}{}'.format(d['tweet_type'], text) not in tweet_text_tracker:
-
-					# add to tracker
-					tweet_text_tracker.add('{}{}'.format(d['tweet_type'], text))
-
-					# save doc to extended tweets
-					db.insert_one_to_collection(collection = 'target_tweets', doc = new_doc)
+	# execute if set to True
+	if reprocess_tweets:
 
+		"""
+			Preprocess the target tweets again that were created with an older version of the preprocessing (for example, after changing clean_tweet), only the text and
+			the version of the preprocessing are updated. The near-duplicate index is built again from the updated texts
+		"""
 
+		reprocess_collection(db, collection = 'target_tweets', batch_size = chunk_size, num_workers = num_workers, use_preprocess_cache = use_preprocess_cache, near_duplicate_index = NearDuplicateIndex(threshold = near_duplicate_threshold))
@@ -13,7 +13,7 @@
 
 	### What do the switches do
 
-	There are 7 switches that can be turned on or off (by setting the value to True or False). Each switch will collect the tweets from the Twitter API from a specific training dataset.
+	There are 8 switches that can be turned on or off (by setting the value to True or False). The first 7 switches will each collect the tweets from the Twitter API from a specific training dataset.
 
 	*	get_sanders_tweets = [True|False]
 	*	get_semeval_tweets = [True|False]
@@ -22,6 +22,27 @@
 	*	get_omd_tweets = [True|False]
 	*	get_stanford_test_tweets = [True|False]
 	*	get_manual_labeled_tweets = [True|False]
+	*	migrate_stored_tweets = [True|False]
+		-	convert the tweets that older runs stored as JSON text into subdocuments with only the fields in TWEET_FIELDS (see helper_functions.py), for all training collections
+
+	### Settings
+
+	*	clarin13_languages = ['English']
+		-	languages of the CLARIN-13 dataset to collect, for example, ['English', 'German']; the label files of these languages are read in parallel
+	*	num_workers = 8
+		-	number of fetch threads that call the Twitter API at the same time
+	*	chunk_size = 100
+		-	number of tweets that a fetch thread gets from the Twitter API before passing them to the writer
+	*	rate_limit_calls = 900
+	*	rate_limit_period = 900
+		-	maximum number of calls to the Twitter API within the period (in seconds), shared by all fetch threads
+	*	worker_rate_limit_calls = None
+		-	maximum number of calls of each fetch thread within the period, None for no limit per thread
+
+	Each training dataset is declared in get_training_datasets() by its label files, the column with the tweet ID, and the rule to read the label. The label files of all
+	switched on datasets are read as one stream into an index of tweet IDs, so a tweet that is in several datasets is retrieved from the Twitter API only once. A tweet
+	ID that appears more than once in a dataset is stored once, with the label of its first row in the order of the files of the dataset. The tweets are retrieved by
+	a pool of fetch threads that fill a bounded queue, and a single writer thread inserts them into the database in bulk.
 
 	How to run:
 	python 4_get_training_tweets.py
@@ -29,12 +50,15 @@
 """
 
 # packages and modules
-import json
 import math # some special math operations
+import numpy as np
 from collections import Counter # to get frequencies of items in list
 from helper_functions import *
 from database import MongoDatabase
 from twitter import Twitter
+from rate_limiter import RateLimiter
+from hydration import Hydrator
+from stream_pipeline import StreamPipeline, Source, Transform, Sink
 
 # Twitter API keys
 API_KEY = ''
@@ -48,6 +72,15 @@ get_hcr_tweets = False
 get_omd_tweets = False
 get_stanford_test_tweets = False
 get_manual_labeled_tweets = True
+migrate_stored_tweets = False
+
+# settings
+clarin13_languages = ['English']
+num_workers = 8
+chunk_size = 100
+rate_limit_calls = 900
+rate_limit_period = 900
+worker_rate_limit_calls = None
 
 
 """
@@ -60,448 +93,495 @@ def get_tweet_by_id(tweet_id):
 
 		Parameters
 		---------
-		tweet_id: string
+		tweet_id: int
 			unique tweet ID
 
 		Returns
 		--------
-		new_doc : dictionary
-			new document that can be inserted into the database
+		tweet : dictionary
+			the fields of the tweet that are used later on (see project_tweet), stored as a subdocument of the new document
 
 	"""
 
 	# extract full tweet
 	tweet = twitter.get_status(id = tweet_id, tweet_mode = 'extended')
 
-	# convert to json
+	# keep only the fields that are used later on
 	if tweet is not None:
-		tweet = json.dumps(tweet._json)
+		tweet = project_tweet(tweet._json)
 
 	return tweet
 
 
-"""
-	Script starts here
-"""
+def get_label_from_column(column):
 
-if __name__ == "__main__":
+	"""
+		Return the label rule of a dataset that has the sentiment label in a single column
 
-	# create logging to console
-	set_logger()
+		Parameters
+		----------
+		column : int
+			index of the column with the written sentiment label (or the code used by the Stanford dataset)
 
-	logging.info('Start: {} '.format(__file__))
+		Returns
+		--------
+		label_rule : function
+			function that takes a row and returns the sentiment code, or None if the label is not positive, negative, or neutral (for example, irrelevant)
+	"""
 
-	# create database connection
-	db = MongoDatabase()
+	return lambda row: convert_sentiment_label(row[column])
 
-	# instantiate twitter object
-	twitter = Twitter(key = API_KEY, secret = API_SECRET)
 
-	# create connection
-	twitter.connect_to_API()
+def get_omd_label(row):
+
+	"""
+		Label rule of the OMD dataset, a row has the rating of each annotator (1 = negative, 2 = positive, 3 = mixed, 4 = other)
+	"""
+
+	# We only included the positive and negative tweets with at least two-thirds agreement between annotators ratings; mixed and other tweets were discarded
+	labels = [x for x in row[1:] if x != ""]
+	labels = ['negative' if x == '1' else x for x in labels]
+	labels = ['positive' if x == '2' else x for x in labels]
 
-	if get_sanders_tweets:
+	if len(labels) == 0:
+		return None
 
-		"""
-			The Sanders dataset consists out of 5,513 hand classified tweets related to the topics Apple (@Apple), Google (#Google), Microsoft (#Microsoft), and Twitter (#Twitter). Tweets were 
-			classified as positive, neutral, negative, or irrelevant; the latter referring to non-English tweets which we discarded. The Sanders dataset has been used for boosting Twitter 
-			sentiment classification using different sentiment dimensions, combining automatically and hand-labeled twitter sentiment labels, and combining community detection and sentiment 
-			analysis}. The dataset is available from http://www.sananalytics.com/lab/.
+	# get label and count of rating that occured most
+	tweet_label, count = Counter(labels).most_common(1)[0]
+	# only include if at least 2/3 of the ratings (so positive, postive, negative means that we include the tweet as a positive tweet, whereas positive, negative will be excluded)
+	if count >= math.ceil(len(labels) * 0.66):
+		# only add the positive and negative tweets, ignore tweets that have been labeled as mixed or other
+		if tweet_label in ['positive', 'negative']:
+			return get_sentiment_code(tweet_label)
 
-			Tweets are saved into the collection 'sanders_tweets_raw'
-		"""	
+	return None
 
-		# name of the collection to store tweets to
-		db_collection = 'sanders_tweets_raw'
 
-		# location sanders tweets
-		sanders_tweets_location = os.path.join('files', 'training_tweets', 'sanders', 'sanders_tweets.csv')
+def get_manual_label(row):
 
-		# read sanders tweets
-		data = read_csv(sanders_tweets_location)
+	"""
+		Label rule of the manually labeled dataset (search for the column with an x)
+	"""
 
-		# read tweets that have already been processed (if you run for the first time, this will be an empty set)
-		processed_tweets = set([x['tweet_id'] for x in db.read_collection(collection = db_collection)])
+	if row[2] == 'x':
+		return get_sentiment_code('negative')
+	elif row[3] == 'x':
+		return get_sentiment_code('neutral')
+	elif row[4] == 'x':
+		return get_sentiment_code('positive')
 
-		# loop over each row of the CSV file
-		for i, row in enumerate(data):
+	logging.error('Tweet has no label, skipping...')
+	return None
 
-			# verbose
-			logging.info('Processing tweet {}/{}'.format(i + 1, len(data)))
 
-			# get values from columns
-			tweet_label = row[1]
-			tweet_id = row[2]
+def get_training_datasets():
 
-			# check if tweet_id has already been processed
-			if not tweet_id in processed_tweets:
+	"""
+		Registry of the training datasets. Each dataset declares its label files, the column with the tweet ID, and the rule to read the sentiment label from a row
 
-				# get content of the tweet
-				tweet = get_tweet_by_id(tweet_id)
+		Returns
+		--------
+		datasets : dictionary
+			key = name of the dataset, value = dictionary with
+				collection : name of the collection to store the tweets to
+				files : list of label files (CSV)
+				skip_header : True if the label files start with a header row
+				id_column : index of the column with the tweet ID
+				label_rule : function that takes a row and returns the sentiment code, or None to skip the row
+	"""
 
-				# create new document to insert into the database
-				new_doc = {}
-				# add label
-				new_doc['label'] = tweet_label
-				# add tweet id
-				new_doc['tweet_id'] = tweet_id
-				# add raw tweet content
-				new_doc['tweet'] = tweet
+	# location of the label files
+	location = os.path.join('files', 'training_tweets')
 
-				# insert into database
-				db.insert_one_to_collection(collection = db_collection, doc = new_doc)
-	
-	# execute if set to True
-	if get_semeval_tweets:
+	datasets = {}
 
-		"""
-			The Semantic Analysis in Twitter Task 2016 dataset, also known as SemEval-2016 Task 4, was created for various sentiment classification tasks. The tasks can be seen as challenges where 
-			teams can compete amongst a number of sub-tasks, such as classifying tweets into positive, negative and neutral sentiment, or estimating distributions of sentiment classes. 
-			Typically, teams with better classification accuracy or other performance measure rank higher. The dataset consist of training, development, and development-test data that combined 
-			consist of 3,918 positive, 2,736 neutral, and 1,208 negative tweets. The original dataset contained a total of 10,000 tweets -- 100 tweets from 100 topics. Each tweet was labeled 
-			by 5 human annotators and only tweets for which 3 out of 5 annotators agreed on their sentiment label were considered. The dataset is available from http://alt.qcri.org/semeval2016/task4/.
+	"""
+		The Sanders dataset consists out of 5,513 hand classified tweets related to the topics Apple (@Apple), Google (#Google), Microsoft (#Microsoft), and Twitter (#Twitter). Tweets were
+		classified as positive, neutral, negative, or irrelevant; the latter referring to non-English tweets which we discarded. The Sanders dataset has been used for boosting Twitter
+		sentiment classification using different sentiment dimensions, combining automatically and hand-labeled twitter sentiment labels, and combining community detection and sentiment
+		analysis}. The dataset is available from http://www.sananalytics.com/lab/.
 
-			Tweets are saved into the collection 'semeval_tweets_raw'
-		"""
+		Tweets are saved into the collection 'sanders_tweets_raw'
+	"""
+	datasets['sanders'] = {	'collection' : 'sanders_tweets_raw',
+							'files' : [os.path.join(location, 'sanders', 'sanders_tweets.csv')],
+							'skip_header' : False,
+							'id_column' : 2,
+							'label_rule' : get_label_from_column(1)}
 
-		# name of the collection to store tweets to
-		db_collection = 'semeval_tweets_raw'
+	"""
+		The Semantic Analysis in Twitter Task 2016 dataset, also known as SemEval-2016 Task 4, was created for various sentiment classification tasks. The tasks can be seen as challenges where
+		teams can compete amongst a number of sub-tasks, such as classifying tweets into positive, negative and neutral sentiment, or estimating distributions of sentiment classes.
+		Typically, teams with better classification accuracy or other performance measure rank higher. The dataset consist of training, development, and development-test data that combined
+		consist of 3,918 positive, 2,736 neutral, and 1,208 negative tweets. The original dataset contained a total of 10,000 tweets -- 100 tweets from 100 topics. Each tweet was labeled
+		by 5 human annotators and only tweets for which 3 out of 5 annotators agreed on their sentiment label were considered. The dataset is available from http://alt.qcri.org/semeval2016/task4/.
 
-		# location semeval tweets
-		semeval_train_tweets_location = os.path.join('files', 'training_tweets', 'semeval', 'train.csv')
-		semeval_test_tweets_location = os.path.join('files', 'training_tweets', 'semeval', 'test.csv')
-		semeval_dev_tweets_location = os.path.join('files', 'training_tweets', 'semeval', 'dev.csv')
+		Tweets are saved into the collection 'semeval_tweets_raw'
+	"""
+	datasets['semeval'] = {	'collection' : 'semeval_tweets_raw',
+							'files' : [os.path.join(location, 'semeval', x) for x in ['train.csv', 'test.csv', 'dev.csv']],
+							'skip_header' : False,
+							'id_column' : 0,
+							'label_rule' : get_label_from_column(1)}
 
-		# read CSV
-		data = read_csv(semeval_train_tweets_location) + read_csv(semeval_test_tweets_location) + read_csv(semeval_dev_tweets_location)
-	
-		# read tweets that have already been processed (if you run for the first time, this will be an empty set)
-		processed_tweets = set([x['tweet_id'] for x in db.read_collection(collection = db_collection)])
+	"""
+		The CLARIN 13-languages dataset contains a total of 1.6 million labeled tweets from 13 different languages, the largest sentiment corpus made publicly available. We used the English subset of the dataset since we restricted
+		our analysis to English tweets. Tweets were collected in September 2013 by using the Twitter Streaming API to obtain a random sample of 1% of all publicly available tweets. The tweets were manually annotated by assigning a
+		positive, neutral, or negative label by a total of 9 annotators; some tweets were labeled by more than 1 annotator or twice by the same annotator. For tweets with multiple annotations, only those with two-third agreement
+		were kept. The original English dataset contained around 90,000 labeled tweets. After recollection, a total of 15,064 positive, 24,263 neutral, and 12,936 negative tweets were obtained. The dataset is available
+		from http://hdl.handle.net/11356/1054.
 
-		# loop over each row in the list
-		for i, row in enumerate(data):
+		Tweets are saved into the collectin 'clarin13_tweets_raw'
+	"""
+	datasets['clarin13'] = {	'collection' : 'clarin13_tweets_raw',
+							'files' : [os.path.join(location, 'clarin13', '{}_Twitter_sentiment.csv'.format(language)) for language in clarin13_languages],
+							'skip_header' : True,
+							'id_column' : 0,
+							'label_rule' : get_label_from_column(1)}
 
-			# verbose
-			logging.info('Processing tweet {}/{}'.format(i + 1, len(data)))
+	"""
+		The Health Care Reform (HCR) dataset was created in 2010 -- around the time the health care bill was signed in the United States -- by extracting tweets with
+		the hashtag #hcr. The tweets were manually annotated by the authors by assigning the labels positive, negative, neutral, unsure, or irrelevant. The dataset was
+		split into training, development and test data. We combined the three different datasets that contained a total of 537 positive, 337 neutral, and 886 negative tweets.
+		The tweets labeled as irrelevant or unsure were not included. The HCR dataset was used to improve sentiment analysis by adding semantic features to tweets.
+		The dataset is available from https://bitbucket.org/speriosu/updown.
 
-			# get values from columns
-			tweet_label = row[1]
-			tweet_id = row[0]
+		Tweets are saved into the collectin 'hcr_tweets_raw'
+	"""
+	datasets['hcr'] = {		'collection' : 'hcr_tweets_raw',
+							'files' : [os.path.join(location, 'hcr', x) for x in ['hcr-train.csv', 'hcr-test.csv', 'hcr-dev.csv']],
+							'skip_header' : True,
+							'id_column' : 0,
+							'label_rule' : get_label_from_column(1)}
 
-			# check if tweet_id has already been processed
-			if not tweet_id in processed_tweets:
+	"""
+		The Obama-McCain Debate (OMD) dataset contains 3,238 tweets collected in September 2008 during the United States presidential debates between Barack Obama and John McCain. The tweets
+		were collected by querying the Twitter API for the hash tags #tweetdebate, #current, and #debate08. A minimum of three independent annotators rated the tweets as positive, negative,
+		mixed, or other. Mixed tweets captured both negative and positive components. Other tweets contained non-evaluative statements or questions. We only included the positive and negative
+		tweets with at least two-thirds agreement between annotators ratings; mixed and other tweets were discarded. The OMD dataset has been used for sentiment classification by
+		social relations, polarity classification, and sentiment classification utilizing semantic concept features. The dataset is available from https://bitbucket.org/speriosu/updown.
 
-				# get content of the tweet
-				tweet = get_tweet_by_id(tweet_id)
+		Rating Codes: 1 = negative, 2 = positive, 3 = mixed, 4 = other
 
-				# create new document to insert into the database
-				new_doc = {}
-				# add label
-				new_doc['label'] = tweet_label
-				# add tweet id
-				new_doc['tweet_id'] = tweet_id
-				# add raw tweet content
-				new_doc['tweet'] = tweet
+		Tweets are saved into the collection 'omd_tweets_raw'
+	"""
+	datasets['omd'] = {		'collection' : 'omd_tweets_raw',
+							'files' : [os.path.join(location, 'omd', 'debate.csv')],
+							'skip_header' : False,
+							'id_column' : 0,
+							'label_rule' : get_omd_label}
 
-				# insert into database
-				db.insert_one_to_collection(collection = db_collection, doc = new_doc)
+	"""
+		The Stanford Test dataset contains 182 positive, 139 neutral, and 177 negative annotated tweets. The tweets were labeled by a human annotator and were retrieved by querying the Twitter
+		search API with randomly chosen queries related to consumer products, company names and people. The Stanford Training dataset, in contrast to the Stanford Test dataset, contains 1.6 million
+		labeled tweets. However, the 1.6 million tweets were automatically labeled, thus without a human annotator, by looking at the presence of emoticons. For example, tweets that contained
+		the positive emoticon :-) would be assigned a positive label, regardless of the remaining content of the tweet. Similarly, tweets that contained the negative emoticon :-( would be assigned a
+		negative label. Such an approach is highly biased and we choose not to include this dataset for the purpose of creating a sentiment classifier from labeled tweets. The Stanford Test dataset,
+		although relatively small, has been used to analyze and represent the semantic content of a sentence for purposes of classification or generation, semantic smoothing to alleviate data sparseness
+		problem for sentiment analysis, and sentiment detection of biased and noisy tweets. The dataset is available from http://www.sentiment140.com/.
+
+		first column provides the sentiment label
+		'0' = negative
+		'2'	= neutral
+		'4' = positive
+
+		Tweets are saved into the collection 'stanford_tweets_raw'
+	"""
+	datasets['stanford'] = {	'collection' : 'stanford_tweets_raw',
+							'files' : [os.path.join(location, 'stanford', 'test.csv')],
+							'skip_header' : False,
+							'id_column' : 1,
+							'label_rule' : get_label_from_column(0)}
 
-	# execute if set to True
-	if get_clarin13_tweets:
+	"""
+		A random subset of target tweets (tweets referring to the three modes of research) that were manually labeled. Adding a subset of target tweets to the training data allows for more accurate classification predictions
+		since the words and phrases found within the target tweets might not necessarily exist in the training tweets that we used from various online repositories.
 
-		"""
-			The CLARIN 13-languages dataset contains a total of 1.6 million labeled tweets from 13 different languages, the largest sentiment corpus made publicly available. We used the English subset of the dataset since we restricted 
-			our analysis to English tweets. Tweets were collected in September 2013 by using the Twitter Streaming API to obtain a random sample of 1% of all publicly available tweets. The tweets were manually annotated by assigning a 
-			positive, neutral, or negative label by a total of 9 annotators; some tweets were labeled by more than 1 annotator or twice by the same annotator. For tweets with multiple annotations, only those with two-third agreement 
-			were kept. The original English dataset contained around 90,000 labeled tweets. After recollection, a total of 15,064 positive, 24,263 neutral, and 12,936 negative tweets were obtained. The dataset is available 
-			from http://hdl.handle.net/11356/1054.
+		Tweets are saved into the collection 'manual_tweets_raw'
+	"""
+	datasets['manual'] = {	'collection' : 'manual_tweets_raw',
+							'files' : [os.path.join(location, 'manual_labeled', 'labels.csv')],
+							'skip_header' : True,
+							'id_column' : 0,
+							'label_rule' : get_manual_label}
 
-			Tweets are saved into the collectin 'clarin13_tweets_raw'
-		"""
+	return datasets
 
-		# name of the collection to store tweets to
-		db_collection = 'clarin13_tweets_raw'
 
-		# location clarin-13 tweets
-		clarin13_tweets_location = os.path.join('files', 'training_tweets', 'clarin13', 'English_Twitter_sentiment.csv')
+def read_dataset_file(name, dataset, file_index, chunk_size = 1000):
 
-		# read CSV and skip the first row (its the header)
-		data = read_csv(clarin13_tweets_location)[1:]
+	"""
+		Read a label file of a dataset in chunks of (dataset name, tweet ID, sentiment code, position of the file in the files of the dataset, row number), rows
+		without a valid tweet ID or label are skipped
+	"""
 
-		# read tweets that have already been processed (if you run for the first time, this will be an empty set)
-		processed_tweets = set([x['tweet_id'] for x in db.read_collection(collection = db_collection)])
+	row_number = 0
 
-		# loop over each row in the list
-		for i, row in enumerate(data):
+	for chunk in read_csv_chunks(dataset['files'][file_index], converters = {dataset['id_column'] : int}, skip_header = dataset['skip_header'], chunk_size = chunk_size):
 
-			# verbose
-			logging.info('Processing tweet {}/{}'.format(i + 1, len(data)))
+		rows = [(name, row[dataset['id_column']], dataset['label_rule'](row), file_index, row_number + i) for i, row in enumerate(chunk)]
+		row_number += len(chunk)
 
-			# get values from columns
-			tweet_label = row[1].lower()
-			tweet_id = row[0]
+		yield [x for x in rows if x[2] is not None]
 
-			# check if tweet_id has already been processed
-			if not tweet_id in processed_tweets:
 
-				# get content of the tweet
-				tweet = get_tweet_by_id(tweet_id)
+def get_tweet_index(datasets, trackers):
 
-				# create new document to insert into the database
-				new_doc = {}
-				# add label
-				new_doc['label'] = tweet_label
-				# add tweet id
-				new_doc['tweet_id'] = tweet_id
-				# add raw tweet content
-				new_doc['tweet'] = tweet
+	"""
+		Build an index of all tweet IDs in the label files of the datasets, with the label of each dataset that has the tweet. A tweet ID that appears in several
+		datasets (or several times in a dataset) only needs to be retrieved from the Twitter API once; a tweet that is already stored for one dataset is copied from
+		the database for the other datasets. A tweet ID that appears several times in a dataset gets the label of its first row, in the order of the files of the
+		dataset (the files are read in parallel, so the order in which the rows are read does not matter); the number of tweet IDs with conflicting labels is logged.
 
-				# insert into database
-				db.insert_one_to_collection(collection = db_collection, doc = new_doc)
+		Parameters
+		----------
+		datasets : dictionary
+			datasets to read, see get_training_datasets()
+		trackers : dictionary
+			key = collection, value = TweetTracker of the processed tweets of that collection
 
+		Returns
+		--------
+		tweets : list of tuples
+			(tweet ID, list of (dataset name, sentiment code) that still need the tweet, collection that already has the tweet or None)
+	"""
 
-	if get_hcr_tweets:
-		
-		"""
-			The Health Care Reform (HCR) dataset was created in 2010 -- around the time the health care bill was signed in the United States -- by extracting tweets with 
-			the hashtag #hcr. The tweets were manually annotated by the authors by assigning the labels positive, negative, neutral, unsure, or irrelevant. The dataset was 
-			split into training, development and test data. We combined the three different datasets that contained a total of 537 positive, 337 neutral, and 886 negative tweets. 
-			The tweets labeled as irrelevant or unsure were not included. The HCR dataset was used to improve sentiment analysis by adding semantic features to tweets. 
-			The dataset is available from https://bitbucket.org/speriosu/updown.
-	
-			Tweets are saved into the collectin 'hcr_tweets_raw'
-		"""
+	names = sorted(datasets.keys())
 
-		# name of the collection to store tweets to
-		db_collection = 'hcr_tweets_raw'
+	# tweet ID, index of the dataset name, sentiment code, and position in the files of the dataset of each row, stored as arrays to keep the index small
+	ids, sources, labels, files, rows = [np.zeros(0, dtype = np.int64)], [np.zeros(0, dtype = np.int8)], [np.zeros(0, dtype = np.int8)], [np.zeros(0, dtype = np.int8)], [np.zeros(0, dtype = np.int64)]
 
-		# location hcr tweets
-		hcr_train_tweets_location = os.path.join('files', 'training_tweets', 'hcr', 'hcr-train.csv')
-		hcr_test_tweets_location = os.path.join('files', 'training_tweets', 'hcr', 'hcr-test.csv')
-		hcr_dev_tweets_location = os.path.join('files', 'training_tweets', 'hcr', 'hcr-dev.csv')
+	for chunk in read_parallel([read_dataset_file(name, datasets[name], file_index) for name in names for file_index in range(len(datasets[name]['files']))]):
 
-		# read CSV and skip the first row (its the header)
-		data = read_csv(hcr_train_tweets_location)[1:] + read_csv(hcr_test_tweets_location)[1:] + read_csv(hcr_dev_tweets_location)[1:]
+		ids.append(np.array([x[1] for x in chunk], dtype = np.int64))
+		sources.append(np.array([names.index(x[0]) for x in chunk], dtype = np.int8))
+		labels.append(np.array([x[2] for x in chunk], dtype = np.int8))
+		files.append(np.array([x[3] for x in chunk], dtype = np.int8))
+		rows.append(np.array([x[4] for x in chunk], dtype = np.int64))
 
-		# some rows have no label so we need to filter them out
-		data = [x for x in data if x[1] != '']
+	ids, sources, labels, files, rows = np.concatenate(ids), np.concatenate(sources), np.concatenate(labels), np.concatenate(files), np.concatenate(rows)
 
-		# read tweets that have already been processed (if you run for the first time, this will be an empty set)
-		processed_tweets = set([x['tweet_id'] for x in db.read_collection(collection = db_collection)])
+	# sort by tweet ID, dataset, file, and row, and keep the first row of each tweet ID in each dataset
+	order = np.lexsort((rows, files, sources, ids))
+	ids, sources, labels = ids[order], sources[order], labels[order]
 
-		# loop over each row in the list
-		for i, row in enumerate(data):
+	first = np.ones(len(ids), dtype = bool)
+	first[1:] = (ids[1:] != ids[:-1]) | (sources[1:] != sources[:-1])
 
-			# verbose
-			logging.info('Processing tweet {}/{}'.format(i + 1, len(data)))
+	# tweet IDs with a row that has another label than the first row of the tweet ID in the same dataset
+	first_row = np.maximum.accumulate(np.where(first, np.arange(len(ids)), 0))
+	num_conflicts = len(np.unique(first_row[labels != labels[first_row]]))
 
-			# get values from columns
-			tweet_label = row[1].lower().strip()
-			tweet_id = row[0]
+	if num_conflicts > 0:
+		logging.warning('{} tweet IDs have conflicting labels within a dataset, the label of the first row (in the order of the files) is kept'.format(num_conflicts))
 
-			# check if tweet_id has already been processed
-			if not tweet_id in processed_tweets:
+	ids, sources, labels = ids[first], sources[first], labels[first]
 
-				# get content of the tweet
-				tweet = get_tweet_by_id(tweet_id)
+	# check which tweets have already been processed for each dataset
+	processed = np.zeros(len(ids), dtype = bool)
 
-				# create new document to insert into the database
-				new_doc = {}
-				# add label
-				new_doc['label'] = tweet_label
-				# add tweet id
-				new_doc['tweet_id'] = tweet_id
-				# add raw tweet content
-				new_doc['tweet'] = tweet
+	for index, name in enumerate(names):
 
-				# insert into database
-				db.insert_one_to_collection(collection = db_collection, doc = new_doc)
+		collection = datasets[name]['collection']
+		processed[sources == index] = trackers[collection].contains(collection, ids[sources == index])
 
-	if get_omd_tweets:
+	# group the rows of each tweet ID
+	tweets = []
 
-		"""
-			The Obama-McCain Debate (OMD) dataset contains 3,238 tweets collected in September 2008 during the United States presidential debates between Barack Obama and John McCain. The tweets 
-			were collected by querying the Twitter API for the hash tags #tweetdebate, #current, and #debate08. A minimum of three independent annotators rated the tweets as positive, negative, 
-			mixed, or other. Mixed tweets captured both negative and positive components. Other tweets contained non-evaluative statements or questions. We only included the positive and negative 
-			tweets with at least two-thirds agreement between annotators ratings; mixed and other tweets were discarded. The OMD dataset has been used for sentiment classification by 
-			social relations, polarity classification, and sentiment classification utilizing semantic concept features. The dataset is available from https://bitbucket.org/speriosu/updown.
+	for group in np.split(np.arange(len(ids)), np.flatnonzero(ids[1:] != ids[:-1]) + 1):
 
-			Rating Codes: 1 = negative, 2 = positive, 3 = mixed, 4 = other
+		if len(group) == 0 or processed[group].all():
+			continue
 
-			Tweets are saved into the collection 'omd_tweets_raw'
-		"""
+		# datasets that still need the tweet, and a collection that already has it
+		new = [(names[sources[i]], int(labels[i])) for i in group if not processed[i]]
+		stored = [datasets[names[sources[i]]]['collection'] for i in group if processed[i]]
 
-		# name of the collection to store tweets to
-		db_collection = 'omd_tweets_raw'
+		tweets.append((int(ids[group[0]]), new, stored[0] if len(stored) > 0 else None))
 
-		# location hcr tweets
-		omd_tweets_location = os.path.join('files', 'training_tweets', 'omd', 'debate.csv')
+	# number of documents to create, and the number of tweets that need a call to the Twitter API
+	num_docs = sum([len(x[1]) for x in tweets])
+	num_calls = sum([1 for x in tweets if x[2] is None])
 
-		# read CSV 
-		data = read_csv(omd_tweets_location)
+	logging.info('Skipped {} tweets that were already processed'.format(processed.sum()))
+	logging.info('{} new tweets in the label files with {} unique tweet IDs, {} tweets are copied from the database: {} calls to the Twitter API saved'.format(num_docs, len(tweets), len(tweets) - num_calls, num_docs - num_calls))
 
-		# read tweets that have already been processed (if you run for the first time, this will be an empty set)
-		processed_tweets = set([x['tweet_id'] for x in db.read_collection(collection = db_collection)])
+	return tweets
 
-		# loop over each row in the list
-		for i, row in enumerate(data):
 
-			# verbose
-			logging.info('Processing tweet {}/{}'.format(i + 1, len(data)))
+def hydrate_tweets(tweets, rate_limiter):
 
-			# get the tweet ID
-			tweet_id = row[0]
+	"""
+		Get the content of the tweets from the database if they are already stored for another dataset, or else from the Twitter API. Called in a fetch thread of
+		the Hydrator
 
-			# check if tweet_id has already been processed
-			if not tweet_id in processed_tweets:
+		Parameters
+		----------
+		tweets : list of tuples
+			(tweet ID, list of (dataset name, sentiment code), collection that already has the tweet or None), see get_tweet_index()
+		rate_limiter : RateLimiter
+			rate limiter of the fetch thread, waited for before each call to the Twitter API
 
-				# We only included the positive and negative tweets with at least two-thirds agreement between annotators ratings; mixed and other tweets were discarded
-				labels = [x for x in row[1:] if x != ""]
-				labels = ['negative' if x == '1' else x for x in labels]
-				labels = ['positive' if x == '2' else x for x in labels]
+		Returns
+		--------
+		docs : list of tuples
+			(dataset name, new document that can be inserted into the database)
+	"""
 
-				# get label and count of rating that occured most
-				tweet_label, count = Counter(labels).most_common(1)[0]
-				# only include if at least 2/3 of the ratings (so positive, postive, negative means that we include the tweet as a positive tweet, whereas positive, negative will be excluded)
-				if count >= math.ceil(len(labels) * 0.66):
-					# only add the positive and negative tweets, ignore tweets that have been labeled as mixed or other
-					if tweet_label in ['positive', 'negative']:
+	# read the tweets that are already stored in a collection (older documents have the tweet ID as a string)
+	stored = {}
 
-						# get content of the tweet
-						tweet = get_tweet_by_id(tweet_id)
+	for collection in set([x[2] for x in tweets if x[2] is not None]):
 
-						# create new document to insert into the database
-						new_doc = {}
-						# add label
-						new_doc['label'] = tweet_label
-						# add tweet id
-						new_doc['tweet_id'] = tweet_id
-						# add raw tweet content
-						new_doc['tweet'] = tweet
+		tweet_ids = [x[0] for x in tweets if x[2] == collection]
 
-						# insert into database
-						db.insert_one_to_collection(collection = db_collection, doc = new_doc)
+		for d in db.find_in_collection(collection = collection, query = {'tweet_id' : {'$in' : tweet_ids + [str(x) for x in tweet_ids]}}, projection = {'tweet_id' : True, 'tweet' : True}):
+			stored[int(d['tweet_id'])] = project_tweet(d['tweet'])
 
-	# execute if set to True
-	if get_stanford_test_tweets:
+	docs = []
 
-		"""
-			The Stanford Test dataset contains 182 positive, 139 neutral, and 177 negative annotated tweets. The tweets were labeled by a human annotator and were retrieved by querying the Twitter 
-			search API with randomly chosen queries related to consumer products, company names and people. The Stanford Training dataset, in contrast to the Stanford Test dataset, contains 1.6 million 
-			labeled tweets. However, the 1.6 million tweets were automatically labeled, thus without a human annotator, by looking at the presence of emoticons. For example, tweets that contained 
-			the positive emoticon :-) would be assigned a positive label, regardless of the remaining content of the tweet. Similarly, tweets that contained the negative emoticon :-( would be assigned a 
-			negative label. Such an approach is highly biased and we choose not to include this dataset for the purpose of creating a sentiment classifier from labeled tweets. The Stanford Test dataset, 
-			although relatively small, has been used to analyze and represent the semantic content of a sentence for purposes of classification or generation, semantic smoothing to alleviate data sparseness 
-			problem for sentiment analysis, and sentiment detection of biased and noisy tweets. The dataset is available from http://www.sentiment140.com/.
-			
-			first column provides the sentiment label
-			'0' = negative
-			'2'	= neutral
-			'4' = positive
+	for tweet_id, new, _ in tweets:
 
-			Tweets are saved into the collection 'stanford_tweets_raw'
-		"""
+		if tweet_id in stored:
+			tweet = stored[tweet_id]
+		else:
+			rate_limiter.wait()
+			tweet = get_tweet_by_id(tweet_id)
 
-		# name of the collection to store tweets to
-		db_collection = 'stanford_tweets_raw'
+		# create new document for each dataset that needs the tweet
+		for name, label in new:
 
-		# location hcr tweets
-		stanford_test_tweets_location = os.path.join('files', 'training_tweets', 'stanford', 'test.csv')
+			new_doc = {}
+			# add label
+			new_doc['label'] = get_sentiment_label(label)
+			# add tweet id
+			new_doc['tweet_id'] = tweet_id
+			# add raw tweet content
+			new_doc['tweet'] = tweet
 
-		# read CSV 
-		data = read_csv(stanford_test_tweets_location)
+			docs.append((name, new_doc))
 
-		# read tweets that have already been processed (if you run for the first time, this will be an empty set)
-		processed_tweets = set([x['tweet_id'] for x in db.read_collection(collection = db_collection)])
+	return docs
 
-		# loop over each row in the list
-		for i, row in enumerate(data):
 
-			# verbose
-			logging.info('Processing tweet {}/{}'.format(i + 1, len(data)))
+def migrate_stored_tweets_collection(db, collection, batch_size = 1000):
 
-			# get the tweet label (search for the column with an x)
-			tweet_label = get_sentiment_label(get_sentiment_code(row[0]))
+	"""
+		Replace the tweets that are stored as JSON text by subdocuments with only the fields that are used later on, so step 5 does not have to decode them
 
-			# get tweet ID
-			tweet_id = row[1]
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		collection : string
+			name of the collection with the raw training tweets
+		batch_size : int (optional)
+			number of documents that are updated at once
+	"""
 
-			# check if tweet_id has already been processed
-			if not tweet_id in processed_tweets:
+	logging.info('Called function: {} '.format(sys._getframe().f_code.co_name))
 
-				# get content of the tweet
-				tweet = get_tweet_by_id(tweet_id)
+	# only the documents that still have the tweet as text
+	query = {'tweet' : {'$type' : 'string'}}
 
-				# create new document to insert into the database
-				new_doc = {}
-				# add label
-				new_doc['label'] = tweet_label
-				# add tweet id
-				new_doc['tweet_id'] = tweet_id
-				# add raw tweet content
-				new_doc['tweet'] = tweet
+	StreamPipeline(name = 'migrate {}'.format(collection), stages = [
+		Source('read stored tweets', lambda: db.find_in_collection(collection = collection, query = query, projection = {'tweet' : True}), total = db.count_collection(collection = collection, query = query)),
+		Transform('project tweet fields', lambda d: {'_id' : d['_id'], 'tweet' : project_tweet(d['tweet'])}),
+		Sink('update documents', lambda docs: db.update_many_to_collection(collection = collection, docs = docs, fields = ['tweet']), batch_size = batch_size),
+	]).run()
 
-				# insert into database
-				db.insert_one_to_collection(collection = db_collection, doc = new_doc)
 
+def save_training_docs(db, datasets, trackers, docs):
 
-	# execute if set to True
-	if get_manual_labeled_tweets:
+	"""
+		Insert the documents into the collection of their dataset in bulk and add them to the trackers, called from the writer thread of the Hydrator
+
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		datasets : dictionary
+			see get_training_datasets()
+		trackers : dictionary
+			key = collection, value = TweetTracker of the processed tweets of that collection
+		docs : list of tuples
+			(dataset name, new document)
+	"""
 
-		"""
-			A random subset of target tweets (tweets referring to the three modes of research) that were manually labeled. Adding a subset of target tweets to the training data allows for more accurate classification predictions
-			since the words and phrases found within the target tweets might not necessarily exist in the training tweets that we used from various online repositories.
+	for name in set([x[0] for x in docs]):
 
-			Tweets are saved into the collection 'manual_tweets_raw'
-		"""
+		collection = datasets[name]['collection']
+		collection_docs = [doc for doc_name, doc in docs if doc_name == name]
 
-		# name of the collection to store tweets to
-		db_collection = 'manual_tweets_raw'
+		# insert into database
+		db.insert_many_to_collection(collection = collection, docs = collection_docs)
 
-		# location of the manual labeled tweets
-		manual_labeled_tweets_location = os.path.join('files', 'training_tweets', 'manual_labeled', 'labels.csv')
+		# add to tracker so we won't process the same tweet again
+		trackers[collection].add(collection, [doc['tweet_id'] for doc in collection_docs])
 
-		# read CSV and skip the first row (its the header)
-		data = read_csv(manual_labeled_tweets_location)[1:]
 
-		# read tweets that have already been processed (if you run for the first time, this will be an empty set)
-		processed_tweets = set([x['tweet_id'] for x in db.read_collection(collection = db_collection)])
+"""
+	Script starts here
+"""
+
+if __name__ == "__main__":
+
+	# create logging to console
+	set_logger()
+
+	logging.info('Start: {} '.format(__file__))
+
+	# create database connection
+	db = MongoDatabase()
+
+	# execute if set to True
+	if migrate_stored_tweets:
+
+		# the tweets of earlier runs are stored as JSON text, store the fields that are used as a subdocument instead
+		for dataset in get_training_datasets().values():
+			migrate_stored_tweets_collection(db, collection = dataset['collection'])
+
+	# instantiate twitter object
+	twitter = Twitter(key = API_KEY, secret = API_SECRET)
+
+	# create connection
+	twitter.connect_to_API()
+
+	# the calls of all fetch threads share one rate limiter (the limit of the API key)
+	rate_limiter = RateLimiter(max_calls = rate_limit_calls, period = rate_limit_period)
 
-		# loop over each row in the list
-		for i, row in enumerate(data):
+	# switch of each dataset
+	switches = {	'sanders' : get_sanders_tweets,
+					'semeval' : get_semeval_tweets,
+					'clarin13' : get_clarin13_tweets,
+					'hcr' : get_hcr_tweets,
+					'omd' : get_omd_tweets,
+					'stanford' : get_stanford_test_tweets,
+					'manual' : get_manual_labeled_tweets}
 
-			# verbose
-			logging.info('Processing tweet {}/{}'.format(i + 1, len(data)))
+	# datasets that are switched on
+	datasets = {name : dataset for name, dataset in get_training_datasets().iteritems() if switches[name]}
 
-			# get the tweet label (search for the column with an x)
-			if row[2] == 'x':
-				tweet_label = 'negative'
-			elif row[3] == 'x':
-				tweet_label = 'neutral'
-			elif row[4] == 'x':
-				tweet_label = 'positive'
-			else:
-				logging.error('Tweet has no label, skipping...')
-				continue
+	logging.info('Processing datasets: {}'.format(', '.join(datasets.keys())))
 
-			# get tweet ID
-			tweet_id = row[0]
+	# tracker of the tweets that have already been processed for each collection (if you run for the first time, this will be empty)
+	trackers = {dataset['collection'] : get_tweet_tracker(db, collection = dataset['collection'], id_field = 'tweet_id', type_field = None) for dataset in datasets.values()}
 
-			# check if tweet_id has already been processed
-			if not tweet_id in processed_tweets:
+	# index of the tweets that still need to be processed, each tweet ID is retrieved only once
+	tweets = get_tweet_index(datasets, trackers)
 
-				# get content of the tweet
-				tweet = get_tweet_by_id(tweet_id)
+	# fetch threads get the tweets from the Twitter API and fill a bounded queue, a single writer thread inserts them into the database in bulk
+	hydrator = Hydrator(fetch = hydrate_tweets,
+						write = lambda docs: save_training_docs(db, datasets, trackers, docs),
+						num_workers = num_workers,
+						rate_limiter = rate_limiter,
+						worker_rate_limit_calls = worker_rate_limit_calls,
+						worker_rate_limit_period = rate_limit_period)
 
-				# create new document to insert into the database
-				new_doc = {}
-				# add label
-				new_doc['label'] = tweet_label
-				# add tweet id
-				new_doc['tweet_id'] = tweet_id
-				# add raw tweet content
-				new_doc['tweet'] = tweet
+	hydrator.run(read_in_chunks(tweets, chunk_size = chunk_size), total = int(math.ceil(len(tweets) / float(chunk_size))))
 
-				# insert into database
-				db.insert_one_to_collection(collection = db_collection, doc = new_doc)
+	logging.info('Created {} documents with {} calls to the Twitter API'.format(sum([len(x[1]) for x in tweets]), rate_limiter.num_calls))
 
+	# save the trackers, so a next run does not have to read the processed tweet IDs from the database
+	for tracker in trackers.values():
+		tracker.save()
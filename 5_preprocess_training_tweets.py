@@ -56,16 +56,134 @@
 		convert slang and abbreviations to their full word expressions, such as brb for 'be right back' or 'ICYMI' for 'in case you missed it'. The machine learning model, described later, would correctly handle most common uses of slang, 
 		with the condition that they are part of the training data. As a result, slang that is indicative of a specific sentiment class (e.g. positive or negative) would be assigned appropriate weights or probabilities during model creation.
 
+	### What do the switches do:
+	There are two switches that can be turned on or off (by setting them to True or False).
+
+	*	preprocess_tweets = [True|False]
+		-	preprocess the raw training tweets and save them to the collection 'training_tweets'
+	*	reprocess_tweets = [True|False]
+		-	preprocess the training tweets that were created with an older version of the preprocessing (see use_preprocess_cache) again, and update them in place
+
+	### Settings
+
+	*	num_workers = cpu_count()
+		-	number of processes that clean, tokenize, and lemmatize the tweets; each process loads spaCy once and set to 1 to process the tweets in a single process
+	*	chunk_size = 1000
+		-	number of tweets send to a process at once and inserted into the database in bulk
+	*	use_preprocess_cache = [True|False]
+		-	read the preprocessed text from the collection 'preprocess_cache', keyed by a hash of the raw text and the version of the preprocessing. Changing the cleaning functions or the spaCy model creates a new version, so outdated texts are preprocessed again
+
 	How to run:
 	python 5_preprocess_training_tweets.py
 
 """
 
 # packages and modules
-import json
+from multiprocessing import cpu_count
 from helper_functions import *
 from database import MongoDatabase
+from reprocess import reprocess_collection
+from stream_pipeline import StreamPipeline, Source, Transform, Filter, BatchTransform, Sink
+
+
+# switches, set to True what needs to be executed
+preprocess_tweets = True
+reprocess_tweets = False
 
+# number of processes that clean the tweets (each loads spaCy once) and number of tweets send to a process at once
+num_workers = cpu_count()
+chunk_size = 1000
+
+# read the preprocessed text of tweets that have been preprocessed before (by step 3 or 5, with the same version of the preprocessing) from the cache
+use_preprocess_cache = True
+
+"""
+	Internal Helper Functions
+"""
+
+def read_raw_training_tweets(db, process_sources):
+
+	"""
+		Read the raw tweets of all the training datasets as one stream, so the worker processes only have to be started once
+
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		process_sources : dictionary
+			key = name of the training dataset, value = collection with the raw tweets
+
+		Returns
+		--------
+		d : dictionary
+			generator of raw tweet documents, with the name of the training dataset added as 'source'
+	"""
+
+	for source, collection in process_sources.iteritems():
+
+		logging.info('Processing tweets from source: {}'.format(source))
+
+		# only read the fields that are used, the tweet is a subdocument so the text can be projected without decoding the tweet (see project_tweet)
+		for d in db.find_in_collection(collection = collection, query = {}, projection = {'tweet_id' : True, 'label' : True, 'tweet.full_text' : True}):
+
+			d['source'] = source
+
+			yield d
+
+
+def create_training_doc(d):
+
+	"""
+		Create the training tweet document from a raw tweet, keeping only the fields needed for the training tweets (so only little data has to be send to the worker processes).
+		The preprocessed text is added later on.
+	"""
+
+	# create new document to insert into the database
+	new_doc = {}
+	# add tweet id (to keep track of the processed tweets)
+	new_doc['tweet_id'] = d['tweet_id']
+	# add raw text
+	new_doc['raw_text'] = d['tweet']['full_text']
+	# add source
+	new_doc['source'] = d['source']
+	# add label
+	new_doc['label'] = get_sentiment_code(d['label'])
+
+	return new_doc
+
+
+def remove_processed(docs, tweet_tracker):
+
+	"""
+		Remove the raw tweets that have already been saved as training tweets, the whole batch is checked at once
+
+		Parameters
+		----------
+		docs : list of dictionaries
+			raw training tweet documents, with the name of the training dataset as 'source'
+		tweet_tracker : TweetTracker
+			tracker of the tweet IDs in the training_tweets collection, with the training dataset as tweet type
+
+		Returns
+		--------
+		docs : list of dictionaries
+			the documents, with None for the processed tweets
+	"""
+
+	processed = tweet_tracker.contains([d['source'] for d in docs], [int(d['tweet_id']) for d in docs])
+
+	return [None if p else d for d, p in zip(docs, processed)]
+
+
+def save_training_docs(db, collection, docs, tweet_tracker):
+
+	"""
+		Save the training tweets to the database and add them to the tracker
+	"""
+
+	db.insert_many_to_collection(collection = collection, docs = docs)
+
+	tweet_tracker.add([d['source'] for d in docs], [int(d['tweet_id']) for d in docs])
 
 
 """
@@ -85,9 +203,6 @@ if __name__ == "__main__":
 	# name of collection to store all the training tweets to
 	db_collection = 'training_tweets'
 
-	# setup spacy object, so we can do some NLP things
-	nlp = setup_spacy()
-
 	# sources to process and the collections they are stored in
 	process_sources = {	'sanders' : 'sanders_tweets_raw',
 						'semeval': 'semeval_tweets_raw',
@@ -97,56 +212,43 @@ if __name__ == "__main__":
 						'stanford': 'stanford_tweets_raw',
 						'manual': 'manual_tweets_raw'}
 
-	# perform preprocessing on each training dataset
-	for source, collection in process_sources.iteritems():
-
-		logging.info('Processing tweets from source: {}'.format(source))
-
-		# get all the raw tweets documents from collection
-		D = db.read_collection(collection = collection)
+	# execute if set to True
+	if preprocess_tweets:
 
-		# loop over each of the tweet
-		for i, d in enumerate(D):
+		# tweets that are stored as JSON text by an older version of step 4 can not be projected
+		for collection in process_sources.values():
+			if db.count_collection(collection = collection, query = {'tweet' : {'$type' : 'string'}}) > 0:
+				logging.error('Collection {} has tweets stored as JSON text, run step 4 with migrate_stored_tweets = True first'.format(collection))
+				exit(1)
 
-			# verbose
-			logging.debug('	-	Processing Tweet {}/{}'.format(i + 1, D.count()))
+		# tracker to keep track of processed tweet IDs per training dataset (training tweets that were created before the tweet ID was saved are not tracked)
+		tweet_tracker = get_tweet_tracker(db, collection = db_collection, id_field = 'tweet_id', type_field = 'source', query = {'tweet_id' : {'$exists' : True}})
 
+		# perform preprocessing on each training dataset, tweets are cleaned, tokenized, and lemmatized in batches (in parallel if num_workers > 1, each worker loads spaCy once)
+		StreamPipeline(name = 'preprocess training tweets', stages = [
+			Source('read raw training tweets', lambda: read_raw_training_tweets(db, process_sources), total = sum([db.count_collection(collection = c) for c in process_sources.values()])),
+			BatchTransform('skip processed tweets', lambda docs: remove_processed(docs, tweet_tracker), batch_size = chunk_size),
 			# check if tweet could be extracted from the Twitter API (sometimes tweets are not available anymore when collecting them some time after they are created,
 			# if this is the case, the content of tweet will be None)
-			if d['tweet'] is not None:
-
-				# check label type is pos, neg, or neu
-				if d['label'] in ['positive', 'negative', 'neutral']:
-
-					# convert tweet content to json
-					tweet = json.loads(d['tweet'])
-					# get the original tweet text
-					raw_text = tweet['full_text']
-					# preprocess the tweet text
-					text = clean_tweet(raw_text)
-					# tokenize the tweet text
-					tokens = get_tokens(text)
-	
-					# check if at least 1 token
-					if len(tokens) > 0:
-
-						# convert to lemma
-						tokens = get_lemma(nlp(' '.join(tokens)))
-						# convert list to string again
-						text = ' '.join(tokens).encode('utf-8')
-
-						# create new document to insert into the database
-						new_doc = {}
-						# add tweet text
-						new_doc['text'] = text
-						# add raw text
-						new_doc['raw_text'] = raw_text
-						# add source
-						new_doc['source'] = source
-						# add label
-						new_doc['label'] = get_sentiment_code(d['label'])
-
-						# insert into database
-						db.insert_one_to_collection(collection = db_collection, doc = new_doc)
-
-	
\ No newline at end of file
+			Filter('skip unavailable tweets', lambda d: d.get('tweet') is not None),
+			# check label type is pos, neg, or neu
+			Filter('skip other labels', lambda d: d['label'] in ['positive', 'negative', 'neutral']),
+			Transform('create training tweets', create_training_doc),
+			BatchTransform('preprocess text', preprocess_docs, batch_size = chunk_size, num_workers = num_workers, initializer = init_preprocess_worker, initargs = (use_preprocess_cache,)),
+			# check if at least 1 token
+			Filter('skip empty tweets', lambda d: len(d['text']) > 0),
+			Sink('save training tweets', lambda docs: save_training_docs(db, db_collection, docs, tweet_tracker), batch_size = chunk_size),
+		]).run()
+
+		# save the tracker, so a next run only preprocesses the new raw tweets
+		tweet_tracker.save()
+
+	# execute if set to True
+	if reprocess_tweets:
+
+		"""
+			Preprocess the training tweets again that were created with an older version of the preprocessing (for example, after changing clean_tweet), only the text and
+			the version of the preprocessing are updated
+		"""
+
+		reprocess_collection(db, collection = db_collection, batch_size = chunk_size, num_workers = num_workers, use_preprocess_cache = use_preprocess_cache)
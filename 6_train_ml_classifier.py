@@ -11,6 +11,93 @@
 	be used to predict sentiment classes on the target tweets. The script can easily be adjusted to allow for other machine learning classifiers and parameter/hyper-parameter 
 	values for grid-search. 
 
+	The grid search vectorizes each cross validation fold once for each combination of vectorizer parameters and reuses the vectorized folds for all candidates with
+	those parameters (see model_search.py), so only the classifier is fitted for each candidate instead of the TF-IDF vectorizer and the classifier. The classifiers are
+	searched at once: the fits of all classifiers share one queue of the cpu_count() processes, and the vectorized folds are memory-mapped so the processes share them.
+
+	NystroemSVC approximates the SVC with an RBF kernel by a linear SVM on a Nystroem feature map of the kernel with n_components features (see
+	approximate_kernel.py). The exact SVC is too slow beyond about 50,000 training tweets; the approximation is fitted in time linear in the number of training
+	tweets, so an RBF-like model can be trained on all training tweets. It is not part of get_grid_setup() and get_pipeline_setup(): on 20,000 training tweets
+	it scored an F1 of 0.52 (n_components = 1000) against 0.75 of the exact SVC and of LinearSVC, and a fit needs about 8 * n_components bytes per training tweet.
+	Add it to both (with the same pipeline setup as SVC, and a grid with the hyper-parameters C, gamma, and n_components) when an RBF-like model is needed on more
+	training tweets than the exact SVC can fit. RBFSamplerSVC (random Fourier features) can be added the same way, but its model holds a dense matrix of the size of
+	the vocabulary times n_components. The benchmark (see below) compares their F1 score and fit time with the exact SVC.
+
+	The vectorized folds, the training tweets vectorized by the fitted vectorizer of the final models, and the vectorized test tweets are saved to a feature store
+	(see feature_store.py), keyed by a fingerprint of the tweets and of the vectorizer parameters. A next run on the same training tweets loads them (memory-mapped)
+	instead of tokenizing and vectorizing the tweets again, and only vectorizes for new vectorizer parameters.
+
+	### What do the switches do
+
+	*	train_gridsearch = [True|False]
+		-	load all training tweets into memory, and train the classifiers of get_grid_setup() with a cross validated hyper-parameter search
+	*	train_streaming = [True|False]
+		-	train linear classifiers (stochastic gradient descent with hinge or log loss) out-of-core: the training tweets are read from the database in batches, converted
+			to features with a HashingVectorizer of fixed size (no vocabulary to keep in memory), and fitted with partial_fit. A fixed part of the training tweets is held out
+			and streamed after each pass to evaluate the classifiers. The memory does not depend on the number of training tweets, so tens of millions of weakly
+			labeled tweets can be used
+	*	benchmark = [True|False]
+		-	measure the cost and accuracy of candidates of each classifier of get_grid_setup() for an increasing number of training tweets, on a synthetic corpus and on
+			the training tweets. Each candidate is fitted (vectorizer and classifier) in a new process, and the fit time, the predict time per 1000 tweets, the increase
+			of the peak memory (RSS) during the fit, the size of the saved model, and the F1 score on the test tweets are saved to benchmark.csv
+
+	### Settings
+
+	*	search_mode = ['grid'|'random'|'halving'|'path']
+		-	'grid' fits all candidates of the grid from get_grid_setup(), 'random' fits the candidates in random order, and 'halving' uses successive halving: all
+			candidates are first fitted on a small part of the training tweets of each fold, and only the best 1 / halving_factor of them go to the next round with
+			halving_factor times more tweets, until the best candidates are fitted on all training tweets. 'path' fits the candidates that only differ in C along the
+			regularization path, from the smallest to the largest C, and warm starts each fit from the previous solution (see path_params and path_patience)
+	*	n_candidates = None
+		-	number of candidates sampled at random from the grid for 'random' and 'halving', None for all candidates
+	*	max_fits = None
+		-	stop the search of each classifier after this many fits (one candidate on one fold), None for no limit
+	*	max_seconds = None
+		-	stop the search after this many seconds, None for no limit
+	*	halving_factor = 3
+	*	halving_min_samples = 1000
+		-	number of training tweets of each fold in the first round of successive halving
+	*	path_params = {'LogisticRegression' : {'classify__solver' : 'lbfgs', 'classify__dual' : False}}
+		-	parameters that replace the values of the grid in the path search. liblinear can not be warm started, so LogisticRegression uses lbfgs, which only
+			solves the primal. LinearSVC is fitted by liblinear and is fitted from scratch for each C, it gains from path_patience
+	*	path_patience = 20
+		-	stop the path of a fold when the score has not improved for this many values of C, None to fit the whole path
+	*	feature_store_folder = os.path.join('files', 'features')
+		-	folder of the feature store, None to vectorize in a temporary folder that is removed after the search
+	*	result_cache_collection = 'model_search_results'
+		-	collection that the score of each fit is saved to as soon as it is done (see result_cache.py), a next run on the same training tweets only fits the
+			candidates and folds that are not in it, for example, after a crash or after a value is added to the grid (random values are drawn with a fixed seed, see
+			get_gridsearch_number_between). None to fit all candidates
+
+	The best score found after each batch of fits, with the number of fits and seconds it took, is saved next to the model as <classifier>_search_log.csv.
+
+	*	streaming_losses = ['hinge', 'log']
+		-	loss of each streaming classifier, hinge for a linear SVM and log for logistic regression; all classifiers are fitted on the same batches
+	*	streaming_alpha = 1e-5
+		-	regularization of the streaming classifiers
+	*	hashing_features = 2 ** 20
+		-	number of features of the HashingVectorizer
+	*	streaming_batch_size = 10000
+		-	number of training tweets read and fitted at once
+	*	streaming_epochs = 3
+		-	number of passes over the training tweets
+	*	holdout_percentage = 10
+		-	percentage of the training tweets (selected by a hash of their _id, so the same tweets every pass and every run) held out to evaluate the classifiers
+	*	shuffle_buffer_size = 100000
+		-	number of training tweets kept in memory to shuffle the stream, the training tweets are stored per training dataset
+
+	*	benchmark_corpora = ['synthetic', 'training_tweets']
+		-	corpora to benchmark on, 'synthetic' is generated by create_synthetic_corpus() so the benchmark can also run for sizes beyond the training tweets
+	*	benchmark_sizes = [1000, 10000, 100000]
+		-	numbers of training tweets to fit on, sizes larger than the training part of a corpus are left out
+	*	benchmark_candidates = 3
+		-	number of candidates of each classifier sampled at random from the grid, None for all candidates
+	*	benchmark_classifier_names = None
+		-	classifiers of get_grid_setup() to benchmark, None for all; for example, ['SVC', 'NystroemSVC', 'LinearSVC'] to compare the approximation of the RBF kernel
+			with the exact SVC and the linear SVM (after adding NystroemSVC to get_grid_setup() and get_pipeline_setup())
+	*	benchmark_location = os.path.join('files', 'benchmarks')
+		-	folder to save benchmark.csv to, the file is written again after each fit so the results so far are kept
+
 	How to run:
 	python 6_train_ml_classifier.py
 
@@ -20,15 +107,24 @@
 import json
 import numpy as np
 import random
-from multiprocessing import cpu_count
+import resource
+import tempfile
+import time
+import zlib
+from multiprocessing import cpu_count, Pool
 from helper_functions import *
 from database import MongoDatabase
+from model_search import ModelSearch
+from approximate_kernel import ApproximateKernelSVC
+from feature_store import FeatureStore
+from result_cache import ResultCache
 # packages and modules for machine learning
 import sklearn
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.model_selection import GridSearchCV
+from sklearn.feature_extraction.text import HashingVectorizer
 from sklearn.model_selection import train_test_split
+from sklearn.model_selection import ParameterGrid, ParameterSampler
 from sklearn.pipeline import Pipeline
 from sklearn import svm
 from sklearn.externals import joblib
@@ -39,10 +135,44 @@ from sklearn.metrics import accuracy_score
 from sklearn.naive_bayes import BernoulliNB
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import SGDClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.ensemble import AdaBoostClassifier
 random.seed(42)
 
+# switches
+train_gridsearch = True
+train_streaming = False
+benchmark = False
+
+# settings of the hyper-parameter search (see model_search.py)
+search_mode = 'grid'
+n_candidates = None
+max_fits = None
+max_seconds = None
+halving_factor = 3
+halving_min_samples = 1000
+path_params = {'LogisticRegression' : {'classify__solver' : 'lbfgs', 'classify__dual' : False}}
+path_patience = 20
+feature_store_folder = os.path.join('files', 'features')
+result_cache_collection = 'model_search_results'
+
+# settings of the streaming training (see train_streaming_classifiers)
+streaming_losses = ['hinge', 'log']
+streaming_alpha = 1e-5
+hashing_features = 2 ** 20
+streaming_batch_size = 10000
+streaming_epochs = 3
+holdout_percentage = 10
+shuffle_buffer_size = 100000
+
+# settings of the benchmark (see benchmark_classifiers)
+benchmark_corpora = ['synthetic', 'training_tweets']
+benchmark_sizes = [1000, 10000, 100000]
+benchmark_candidates = 3
+benchmark_classifier_names = None
+benchmark_location = os.path.join('files', 'benchmarks')
+
 """
 	Internal Helper Functions
 """
@@ -193,13 +323,13 @@ def create_parameter_grid(grid_setup):
 	for row in grid_setup:
 
 		if row['hyperparameter'] == 'C':
-			param_grid.update({'classify__C': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length']) })
+			param_grid.update({'classify__C': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length'], seed = get_hyperparameter_seed(row['hyperparameter'])) })
 		
 		if row['hyperparameter'] == 'gamma':
-			param_grid.update({'classify__gamma': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length']) })
+			param_grid.update({'classify__gamma': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length'], seed = get_hyperparameter_seed(row['hyperparameter'])) })
 		
 		if row['hyperparameter'] == 'alpha':
-			param_grid.update({'classify__alpha': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length']) })
+			param_grid.update({'classify__alpha': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length'], seed = get_hyperparameter_seed(row['hyperparameter'])) })
 		
 		if row['hyperparameter'] == 'fit_prior':
 			param_grid.update({'classify__fit_prior' : [True, False]})
@@ -219,6 +349,13 @@ def create_parameter_grid(grid_setup):
 		if row['hyperparameter'] == 'kernel':
 			param_grid.update({'classify__kernel' : ['linear', 'poly', 'rbf', 'sigmoid']})
 
+		"""
+			APPROXIMATE KERNELS
+		"""
+
+		if row['hyperparameter'] == 'n_components':
+			param_grid.update({'classify__n_components' : [int(x) for x in get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length'], seed = get_hyperparameter_seed(row['hyperparameter']))]})
+
 		"""
 			DESCISION TREES
 		"""
@@ -233,7 +370,7 @@ def create_parameter_grid(grid_setup):
 			param_grid.update({'classify__max_features' : ['auto','sqrt', 'log2', None]})
 
 		if row['hyperparameter'] == 'n_estimators':
-			param_grid.update({'classify__n_estimators' : [int(x) for x in get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length'])]})
+			param_grid.update({'classify__n_estimators' : [int(x) for x in get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length'], seed = get_hyperparameter_seed(row['hyperparameter']))]})
 
 		if row['hyperparameter'] == 'algorithm':
 			param_grid.update({'classify__algorithm' : ['SAMME','SAMME.R']})
@@ -255,10 +392,10 @@ def create_parameter_grid(grid_setup):
 			param_grid.update({'vectorizer__ngram_range': zip(np.repeat(row['min'], row['max'] + 1), range(row['min'], row['max'] + 1))})
 
 		if row['hyperparameter'] == 'min_df':
-			param_grid.update({'vectorizer__min_df': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length']) })
+			param_grid.update({'vectorizer__min_df': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length'], seed = get_hyperparameter_seed(row['hyperparameter'])) })
 	
 		if row['hyperparameter'] == 'max_df':
-			param_grid.update({'vectorizer__max_df': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length']) })
+			param_grid.update({'vectorizer__max_df': get_gridsearch_number_between(row['random'], row['min'], row['max'], row['length'], seed = get_hyperparameter_seed(row['hyperparameter'])) })
 
 			
 	return param_grid
@@ -281,6 +418,10 @@ def get_classifier(classifier):
 		return svm.SVC(max_iter=1000000)
 	elif classifier == 'LinearSVC':
 		return svm.LinearSVC(max_iter=1000000)
+	elif classifier == 'NystroemSVC':
+		return ApproximateKernelSVC(kernel_approximation = 'nystroem', max_iter=1000000)
+	elif classifier == 'RBFSamplerSVC':
+		return ApproximateKernelSVC(kernel_approximation = 'rbf_sampler', max_iter=1000000)
 	elif classifier == 'LogisticRegression':
 		return LogisticRegression(max_iter=1000000)
 	elif classifier == 'MultinomialNB':
@@ -296,10 +437,29 @@ def get_classifier(classifier):
 		exit(1)
 
 
-def get_gridsearch_number_between(random, start, end, length = 1):
+def get_hyperparameter_seed(hyperparameter, seed = 42):
+
+	"""
+		Return the seed of the random values of a hyperparameter, derived from its name, so each hyperparameter gets its own random values (with the same seed, the
+		random values of C and gamma would be the same draws scaled to their range, and a random search would only search a line in the grid)
+
+		Parameters
+		----------
+		hyperparameter : string
+			name of the hyperparameter, for example, 'C'
+		seed: int (optional)
+			base seed of all hyperparameters
+	"""
+
+	return (seed + zlib.crc32(hyperparameter)) & 0xffffffff
+
+
+def get_gridsearch_number_between(random, start, end, length = 1, seed = 42):
 
 	"""
-		Get an array of floats between two values (start and stop) random or a structured range
+		Get an array of floats between two values (start and stop) random or a structured range. The random values are drawn with a fixed seed, so the grid is the
+		same on each run (and the result cache finds the fits of an earlier run); a larger length keeps the values of a smaller length and adds new ones. Use a
+		different seed for each hyperparameter, see get_hyperparameter_seed()
 
 		Parameters
 		----------
@@ -311,6 +471,8 @@ def get_gridsearch_number_between(random, start, end, length = 1):
 			the end of the range
 		length: int (optional)
 			the number of values to generate
+		seed: int (optional)
+			seed of the random values
 
 		Returns
 		--------
@@ -320,7 +482,7 @@ def get_gridsearch_number_between(random, start, end, length = 1):
 	"""
 
 	if random:
-		return [np.random.uniform(start, end) for x in range(0,length)]
+		return [float(x) for x in np.random.RandomState(seed).uniform(start, end, length)]
 	else:
 		return np.linspace(start, end, length)
 
@@ -351,7 +513,7 @@ def create_pipeline(classifier, pipeline_setup):
 	return pipeline
 
 
-def execute_gridsearch_cv(X, Y, test_size, shuffle, pipeline_setup, grid_setup, cv, n_jobs, scoring, verbose, save_model, model_save_location):
+def execute_gridsearch_cv(X, Y, test_size, shuffle, pipeline_setup, grid_setup, cv, n_jobs, scoring, verbose, save_model, model_save_location, search_setup = {}):
 
 	"""
 		Execute a grid search cross validated classification model creation
@@ -382,6 +544,8 @@ def execute_gridsearch_cv(X, Y, test_size, shuffle, pipeline_setup, grid_setup,
 			if model needs to be saved to disk
 		model_save_location: os.path
 			if model needs to be saved, this is the location.
+		search_setup : dictionary (optional)
+			settings for the search, for instance, the search mode and the budget, see ModelSearch
 	"""
 
 	try:
@@ -389,53 +553,382 @@ def execute_gridsearch_cv(X, Y, test_size, shuffle, pipeline_setup, grid_setup,
 		# split data into train and test
 		X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size = test_size, random_state = 42, shuffle = shuffle)
 
-		# execute gridsearch for each classifier
-		for classifier in grid_setup.keys():
+		# pipeline and parameter grid of each classifier
+		estimators = {classifier : (create_pipeline(classifier, pipeline_setup[classifier]), create_parameter_grid(grid_setup[classifier])) for classifier in grid_setup.keys()}
 
-			# get parameter grid values
-			param_grid = create_parameter_grid(grid_setup[classifier])
+		# perform K-fold Cross validation of all classifiers at once, the fits of all classifiers share one queue and each fold is vectorized once and reused by all candidates
+		grid_search = ModelSearch(estimators, cv = cv, n_jobs = n_jobs, scoring = scoring, verbose = verbose, **search_setup)
 
-			# create pipeline
-			pipeline = create_pipeline(classifier, pipeline_setup[classifier])
+		# fit the grid_search model to the training data
+		grid_search.fit(X_train,y_train)
 
+		# evaluate and save each classifier
+		for classifier in grid_setup.keys():
 
-			# perform K-fold Cross validation
-			grid_search = GridSearchCV(pipeline, cv = cv, n_jobs = n_jobs, param_grid = param_grid, scoring = scoring, verbose = verbose)
+			# the pipeline of the classifier refitted with the best parameters
+			model = grid_search.best_estimator_[classifier]
 
-			# fit the grid_search model to the training data
-			grid_search.fit(X_train,y_train)
+			# predict the test set, classifiers with the same fitted vectorizer share the vectorized test tweets
+			y_pred = grid_search.feature_store.predict(model, X_test) if grid_search.feature_store is not None else model.predict(X_test)
 
 			# calculate scores on test set
-			precision, recall, f1, support = sklearn.metrics.precision_recall_fscore_support(y_test, grid_search.predict(X_test), average='weighted')
+			precision, recall, f1, support = sklearn.metrics.precision_recall_fscore_support(y_test, y_pred, average='weighted')
 			# get the confusion matrix
-			cf_matrix = confusion_matrix(y_test, grid_search.predict(X_test))
+			cf_matrix = confusion_matrix(y_test, y_pred)
 
 			# create the results
-			results = {'training_f1' : grid_search.best_score_,
-						'best_parameters' : grid_search.best_params_,
+			results = {'training_f1' : grid_search.best_score_[classifier],
+						'best_parameters' : grid_search.best_params_[classifier],
 						'test_precision' : precision,
 						'test_recall' : recall,
 						'test_f1' : f1,
-						'test_confusion_matrix' : cf_matrix}
+						'test_confusion_matrix' : cf_matrix,
+						'num_fits' : grid_search.num_fits_[classifier],
+						'num_cached_fits' : grid_search.num_cached_fits_[classifier],
+						'fit_seconds' : grid_search.fit_seconds_[classifier]}
 
 			if save_model:
 
 				# make sure that the location to save the classifier to exists
 				create_directory(model_save_location)
 
-				# save classifier to disk
-				joblib.dump(grid_search, os.path.join(model_save_location, classifier + '.pkl'))
+				# save classifier to disk (the vectorizer and classifier as one pipeline)
+				joblib.dump(model, os.path.join(model_save_location, classifier + '.pkl'))
 				
 				# or you can save with pickle, but then also load with pickle in subsequent steps of the analysis
-				# save_pickle(obj = grid_search, file_name = classifier, folder = model_save_location)
+				# save_pickle(obj = model, file_name = classifier, folder = model_save_location)
 
 				# save performance to disk
 				save_dic_to_csv(results, file_name = classifier, folder = model_save_location)
 
+				# save the best score found after each batch of fits
+				save_rows_to_csv([x for x in grid_search.search_log_ if x['classifier'] == classifier], file_name = classifier + '_search_log', folder = model_save_location, columns = ['num_fits', 'fit_seconds', 'search_seconds', 'n_samples', 'best_score', 'best_params'])
+
 	except Exception, e:
 		logging.error('Error executing gridsearch CV: {}'.format(e))
 		return
 
+def is_holdout(doc, holdout_percentage):
+
+	"""
+		Return True if the training tweet is held out for evaluation, based on a hash of its _id so the split is the same every pass and every run
+	"""
+
+	return zlib.crc32(str(doc['_id'])) % 100 < holdout_percentage
+
+
+def read_training_batches(db, collection, batch_size, holdout_percentage, holdout = False, shuffle_buffer_size = None, seed = 42):
+
+	"""
+		Read the training tweets from the database in batches
+
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		collection : string
+			name of the collection with the training tweets
+		batch_size : int
+			number of training tweets in each batch
+		holdout_percentage : int
+			percentage of the training tweets that is held out, see is_holdout()
+		holdout : Boolean (optional)
+			read the held out training tweets instead of the others
+		shuffle_buffer_size : int (optional)
+			shuffle the training tweets with a buffer of this size, see shuffle_stream(); None to read them in the order of the database
+		seed : int (optional)
+			seed of the shuffle
+
+		Returns
+		--------
+		texts, labels : list, np.array()
+			generator of the preprocessed texts and the labels (as strings) of each batch
+	"""
+
+	# only read the fields that are needed
+	docs = (d for d in db.find_in_collection(collection = collection, query = {}, projection = {'text' : True, 'label' : True}) if is_holdout(d, holdout_percentage) == holdout)
+
+	if shuffle_buffer_size is not None:
+		docs = shuffle_stream(docs, buffer_size = shuffle_buffer_size, seed = seed)
+
+	for batch in read_in_chunks(docs, chunk_size = batch_size):
+		yield [d['text'] for d in batch], np.array([str(d['label']) for d in batch])
+
+
+def train_streaming_classifiers(db, collection, losses, alpha, n_features, batch_size, epochs, holdout_percentage, shuffle_buffer_size, save_model, model_save_location):
+
+	"""
+		Train linear classifiers out-of-core with stochastic gradient descent: the training tweets are read in batches, hashed to a fixed number of features, and fitted
+		with partial_fit. The held out training tweets are streamed after each pass to evaluate the classifiers
+
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		collection : string
+			name of the collection with the training tweets
+		losses : list of strings
+			loss of each classifier, for example, 'hinge' (linear SVM) or 'log' (logistic regression)
+		alpha : float
+			regularization of the classifiers
+		n_features : int
+			number of features of the HashingVectorizer
+		batch_size : int
+			number of training tweets read and fitted at once
+		epochs : int
+			number of passes over the training tweets
+		holdout_percentage : int
+			percentage of the training tweets held out for evaluation
+		shuffle_buffer_size : int
+			number of training tweets kept in memory to shuffle the stream, None to not shuffle
+		save_model : Boolean
+			if model needs to be saved to disk
+		model_save_location: os.path
+			if model needs to be saved, this is the location.
+	"""
+
+	logging.info('Called function: {} '.format(sys._getframe().f_code.co_name))
+
+	# the vectorizer has no state, so it does not have to be fitted and every batch gets the same features
+	vectorizer = HashingVectorizer(n_features = n_features)
+
+	classifiers = {loss : SGDClassifier(loss = loss, alpha = alpha, random_state = 42) for loss in losses}
+
+	# all classes need to be given with the first call to partial_fit
+	classes = np.array(sorted(set([str(x) for x in SENTIMENT_CODES.values()])))
+
+	start = time.time()
+
+	for epoch in range(epochs):
+
+		progress = ProgressReporter('training pass {} of {}'.format(epoch + 1, epochs))
+
+		# each batch is hashed once and fitted by all classifiers
+		for texts, labels in read_training_batches(db, collection, batch_size, holdout_percentage, shuffle_buffer_size = shuffle_buffer_size, seed = epoch):
+
+			X = vectorizer.transform(texts)
+
+			for classifier in classifiers.values():
+				classifier.partial_fit(X, labels, classes = classes)
+
+			progress.update(len(texts))
+
+		progress.finish()
+
+		# evaluate on the held out training tweets
+		y_true, y_pred = [], {loss : [] for loss in losses}
+
+		for texts, labels in read_training_batches(db, collection, batch_size, holdout_percentage, holdout = True):
+
+			X = vectorizer.transform(texts)
+
+			y_true.extend(labels)
+
+			for loss, classifier in classifiers.iteritems():
+				y_pred[loss].extend(classifier.predict(X))
+
+		for loss in losses:
+			logging.info('Pass {}, loss {}: held out F1 {:.4f} ({} tweets)'.format(epoch + 1, loss, f1_score(y_true, y_pred[loss], average = 'weighted'), len(y_true)))
+
+	for loss, classifier in classifiers.iteritems():
+
+		# calculate scores on the held out tweets
+		precision, recall, f1, support = precision_recall_fscore_support(y_true, y_pred[loss], average = 'weighted')
+
+		# create the results
+		results = {	'parameters' : classifier.get_params(),
+					'n_features' : n_features,
+					'epochs' : epochs,
+					'training_seconds' : time.time() - start,
+					'test_tweets' : len(y_true),
+					'test_precision' : precision,
+					'test_recall' : recall,
+					'test_f1' : f1,
+					'test_confusion_matrix' : confusion_matrix(y_true, y_pred[loss])}
+
+		if save_model:
+
+			# make sure that the location to save the classifier to exists
+			create_directory(model_save_location)
+
+			# save the vectorizer and the classifier as one pipeline, so it can be used like the models of the grid search
+			joblib.dump(Pipeline([('vectorizer', vectorizer), ('classify', classifier)]), os.path.join(model_save_location, 'SGDClassifier_{}.pkl'.format(loss)))
+
+			# save performance to disk
+			save_dic_to_csv(results, file_name = 'SGDClassifier_{}'.format(loss), folder = model_save_location)
+
+
+def create_synthetic_corpus(num_docs, num_terms = 50000, num_class_terms = 500, signal = 0.2, min_length = 5, max_length = 25, seed = 42):
+
+	"""
+		Create a corpus of synthetic preprocessed tweets with a negative, neutral, or positive class label. The terms are drawn from a Zipf distribution (as the words in
+		tweets), and each term is drawn with probability signal from a set of terms of the class instead
+
+		Parameters
+		----------
+		num_docs : int
+			number of tweets
+		num_terms : int (optional)
+			number of terms of the vocabulary
+		num_class_terms : int (optional)
+			number of terms of each class
+		signal : float (optional)
+			probability that a term is a term of the class of the tweet
+		min_length : int (optional)
+		max_length : int (optional)
+			minimum and maximum number of terms of a tweet
+		seed : int (optional)
+
+		Returns
+		--------
+		X : list of strings
+			synthetic tweets
+		Y : list of strings
+			class label of each tweet, coded as the training tweets: negative = 0, neutral = 1, positive = 2
+	"""
+
+	random_state = np.random.RandomState(seed)
+
+	classes = sorted(set([str(x) for x in SENTIMENT_CODES.values()]))
+
+	# the frequency of a term is inversely proportional to its rank
+	probabilities = 1. / np.arange(1, num_terms + 1)
+	probabilities /= probabilities.sum()
+
+	Y = random_state.randint(len(classes), size = num_docs)
+	lengths = random_state.randint(min_length, max_length + 1, size = num_docs)
+
+	# draw all terms at once, the terms of the classes come after the vocabulary
+	terms = random_state.choice(num_terms, size = lengths.sum(), p = probabilities)
+	class_terms = num_terms + np.repeat(Y, lengths) * num_class_terms + random_state.randint(num_class_terms, size = lengths.sum())
+	terms = np.where(random_state.rand(lengths.sum()) < signal, class_terms, terms)
+
+	X = [' '.join(['term{}'.format(x) for x in doc]) for doc in np.split(terms, np.cumsum(lengths)[:-1])]
+
+	return X, [classes[y] for y in Y]
+
+
+def get_max_rss():
+
+	"""
+		Return the peak resident memory (RSS) of the process in MB, ru_maxrss is in kilobytes on Linux and in bytes on macOS
+	"""
+
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024. ** 2 if sys.platform == 'darwin' else 1024.)
+
+
+def benchmark_candidate(pipeline, params, X_train, y_train, X_test, y_test):
+
+	"""
+		Fit the pipeline with the parameters and measure its cost and accuracy. This runs in a new process, forked from the process that holds all corpora, so the
+		peak memory of the process includes the memory of the corpora; only the increase of the peak memory during the fit is the memory cost of the fit
+
+		Returns
+		--------
+		result : dictionary
+			fit time in seconds, predict time in seconds per 1000 tweets, increase of the peak memory during the fit in MB, size of the saved model in MB, and F1
+			score on the test tweets
+	"""
+
+	# the process starts with the memory of the parent process and of the copied data
+	start_rss = get_max_rss()
+
+	pipeline.set_params(**params)
+
+	start = time.time()
+	pipeline.fit(X_train, y_train)
+	fit_seconds = time.time() - start
+
+	# the pipeline predicts as in step 7, including the vectorizer
+	start = time.time()
+	y_pred = pipeline.predict(X_test)
+	predict_seconds = time.time() - start
+
+	# size of the saved model
+	handle, file_name = tempfile.mkstemp(suffix = '.pkl')
+	os.close(handle)
+	try:
+		joblib.dump(pipeline, file_name)
+		model_size = os.path.getsize(file_name)
+	finally:
+		os.remove(file_name)
+
+	return {'fit_seconds' : fit_seconds,
+			'predict_seconds_per_1k' : predict_seconds * 1000. / len(X_test),
+			'fit_rss_mb' : get_max_rss() - start_rss,
+			'model_size_mb' : model_size / 1024. ** 2,
+			'test_f1' : f1_score(y_test, y_pred, average = 'weighted')}
+
+
+def benchmark_classifiers(corpora, sizes, pipeline_setup, grid_setup, num_candidates, test_size, save_location, classifier_names = None):
+
+	"""
+		Benchmark candidates of each classifier on corpora for an increasing number of training tweets, and save the results as one row per fit to benchmark.csv
+
+		Parameters
+		----------
+		corpora : dictionary
+			key = name of the corpus, value = (X, Y)
+		sizes : list of ints
+			numbers of training tweets to fit on
+		pipeline_setup: dictionary
+			settings for the pipeline of each classifier
+		grid_setup: dictionary
+			settings for the grid of each classifier, the candidates are sampled from it
+		num_candidates : int
+			number of candidates of each classifier, None for all candidates
+		test_size: float
+			part of each corpus used to test
+		save_location : os.path
+			folder to save benchmark.csv to
+		classifier_names : list of strings (optional)
+			classifiers of the grid setup to benchmark, None for all
+	"""
+
+	logging.info('Called function: {} '.format(sys._getframe().f_code.co_name))
+
+	try:
+
+		# the same candidates on all corpora and sizes, so the rows can be compared
+		candidates = {}
+		for classifier in sorted(classifier_names or grid_setup.keys()):
+			param_grid = create_parameter_grid(grid_setup[classifier])
+			candidates[classifier] = list(ParameterSampler(param_grid, n_iter = min(num_candidates or len(ParameterGrid(param_grid)), len(ParameterGrid(param_grid))), random_state = 42))
+
+		rows = []
+
+		# each fit runs in a new process (so the peak memory of one fit does not carry over to the next), and one fit at a time so the fits do not compete for the cpu
+		pool = Pool(processes = 1, maxtasksperchild = 1)
+
+		for corpus, (X, Y) in sorted(corpora.items()):
+
+			X_train, X_test, y_train, y_test = train_test_split(X, Y, test_size = test_size, random_state = 42, shuffle = True)
+
+			for size in sorted(set([min(x, len(X_train)) for x in sizes])):
+
+				for classifier in sorted(candidates.keys()):
+
+					for params in candidates[classifier]:
+
+						result = pool.apply(benchmark_candidate, (create_pipeline(classifier, pipeline_setup[classifier]), params, X_train[:size], y_train[:size], X_test, y_test))
+
+						result.update({'corpus' : corpus, 'classifier' : classifier, 'params' : params, 'n_train' : size, 'n_test' : len(X_test)})
+
+						logging.info('{} on {} {} tweets: fit {:.1f} sec, F1 {:.4f}, fit RSS {:.0f} MB, model {:.1f} MB with {}'.format(classifier, size, corpus, result['fit_seconds'], result['test_f1'], result['fit_rss_mb'], result['model_size_mb'], params))
+
+						rows.append(result)
+
+						# save the results so far
+						save_rows_to_csv(rows, file_name = 'benchmark', folder = save_location, columns = ['corpus', 'classifier', 'params', 'n_train', 'n_test', 'fit_seconds', 'predict_seconds_per_1k', 'fit_rss_mb', 'model_size_mb', 'test_f1'])
+
+		pool.close()
+		pool.join()
+
+	except Exception, e:
+		logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+		exit(1)
+
+
 """
 	Script starts here
 """
@@ -456,17 +949,54 @@ if __name__ == "__main__":
 	# location to save machine learning classification models to
 	model_save_location = os.path.join('files', 'ml_models2')
 
-	# get all the training tweet documents
-	D = db.read_collection(collection = db_collection)
+	# execute if set to True
+	if train_gridsearch:
+
+		# get all the training tweet documents
+		D = db.read_collection(collection = db_collection)
+
+		# get values from list and assign to X and Y
+		X, Y = zip(*[(x['text'], str(x['label'])) for x in D])
+
+		# define pipeline options
+		pipeline_setup = get_pipeline_setup()
+
+		# define grid search parameters and values
+		grid_setup = get_grid_setup()
+
+		# define the search mode and budget
+		search_setup = {	'search_mode' : search_mode,
+							'n_candidates' : n_candidates,
+							'max_fits' : max_fits,
+							'max_seconds' : max_seconds,
+							'halving_factor' : halving_factor,
+							'halving_min_samples' : halving_min_samples,
+							'path_params' : path_params,
+							'path_patience' : path_patience,
+							'feature_store' : FeatureStore(feature_store_folder) if feature_store_folder is not None else None,
+							'result_cache' : ResultCache(result_cache_collection) if result_cache_collection is not None else None}
+
+		# create and save the model
+		execute_gridsearch_cv(X, Y, test_size = .2, shuffle = True, pipeline_setup = pipeline_setup, grid_setup = grid_setup, cv = 10, n_jobs = cpu_count(), scoring = 'f1_weighted', verbose = 10, save_model = True, model_save_location = model_save_location, search_setup = search_setup)
+
+	# execute if set to True
+	if train_streaming:
+
+		# train the linear classifiers in batches read from the database, the memory does not grow with the number of training tweets
+		train_streaming_classifiers(db, db_collection, losses = streaming_losses, alpha = streaming_alpha, n_features = hashing_features, batch_size = streaming_batch_size, epochs = streaming_epochs,
+									holdout_percentage = holdout_percentage, shuffle_buffer_size = shuffle_buffer_size, save_model = True, model_save_location = model_save_location)
+
+	# execute if set to True
+	if benchmark:
 
-	# get values from list and assign to X and Y
-	X, Y = zip(*[(x['text'], str(x['label'])) for x in D])
+		corpora = {}
 
-	# define pipeline options
-	pipeline_setup = get_pipeline_setup()
+		# enough synthetic tweets for the largest size after the test tweets are split off
+		if 'synthetic' in benchmark_corpora:
+			corpora['synthetic'] = create_synthetic_corpus(int(max(benchmark_sizes) / (1 - .2)) + 1)
 
-	# define grid search parameters and values
-	grid_setup = get_grid_setup()
+		if 'training_tweets' in benchmark_corpora:
+			corpora['training_tweets'] = zip(*[(x['text'], str(x['label'])) for x in db.read_collection(collection = db_collection)])
 
-	# create and save the model
-	execute_gridsearch_cv(X, Y, test_size = .2, shuffle = True, pipeline_setup = pipeline_setup, grid_setup = grid_setup, cv = 10, n_jobs = cpu_count(), scoring = 'f1_weighted', verbose = 10, save_model = True, model_save_location = model_save_location)
+		# measure the cost and accuracy of the classifiers for each number of training tweets
+		benchmark_classifiers(corpora, benchmark_sizes, pipeline_setup = get_pipeline_setup(), grid_setup = get_grid_setup(), num_candidates = benchmark_candidates, test_size = .2, save_location = benchmark_location, classifier_names = benchmark_classifier_names)
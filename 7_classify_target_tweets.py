@@ -12,6 +12,16 @@
 	label : negative = 0, neutral = 1, positive = 2
 	tweet_type : 0 = interdisciplinary, 1 = transdisciplinary, 2 = multidisciplinary
 
+	The target tweets are vectorized once by the fitted vectorizer of the model and saved to the feature store (see feature_store.py). Trying another model with the
+	same fitted vectorizer (for example, another classifier of the same run of step 6), or running the script again, loads the vectorized target tweets (memory-mapped)
+	instead of vectorizing them again. The target tweets are predicted in batches.
+
+	### Settings
+
+	*	model_file = os.path.join('files', 'ml_models', 'LinearSVC.pkl')
+		-	model of step 6 to infer the sentiment class labels with
+	*	feature_store_folder = os.path.join('files', 'features')
+		-	folder of the feature store, the same folder as in step 6
 
 	How to run:
 	python 7_classify_target_tweets.py
@@ -22,8 +32,13 @@
 import numpy as np
 from helper_functions import *
 from database import MongoDatabase
+from feature_store import FeatureStore
 from sklearn.externals import joblib
 
+# settings
+model_file = os.path.join('files', 'ml_models', 'LinearSVC.pkl')
+feature_store_folder = os.path.join('files', 'features')
+
 """
 	Script starts here
 """
@@ -40,39 +55,47 @@ if __name__ == "__main__":
 	db = MongoDatabase()
 
 	# load classifier
-	clf = joblib.load(os.path.join('files', 'ml_models', 'LinearSVC.pkl'))
+	clf = joblib.load(model_file)
 
 	# read labels for target tweets that have been manually labeled and convert to dictionary with key = tweet ID and value = label
 	true_labels = {d['tweet_id'] : d['label'] for d in db.read_collection(collection = 'manual_tweets_raw') }
 
-	# load tweets for which we want to infer the sentiment label
-	D = db.read_collection(collection = 'target_tweets')
+	# load tweets for which we want to infer the sentiment label (only the fields that are needed)
+	D = list(db.find_in_collection(collection = 'target_tweets', query = {}, projection = {'tweet_id' : True, 'tweet_type' : True, 'text' : True}))
+
+	# infer the sentiment labels of all target tweets at once, the target tweets are only vectorized if the vectorizer of the model has not vectorized them before
+	predictions = FeatureStore(feature_store_folder).predict(clf, [d['text'] for d in D])
 
 	# create empty numpy array so we can retrieve labels later on somewhat faster
-	labels = np.zeros((D.count(), 3), dtype = np.int)
+	labels = np.zeros((len(D), 3), dtype = np.int)
+
+	# report the progress at most once every few seconds
+	progress = ProgressReporter('classify target tweets', total = len(D))
+
+	# loop over the target tweets in chunks
+	for chunk in read_in_chunks(range(len(D)), chunk_size = 10000):
 
-	# loop over each target tweet
-	for i, d in enumerate(D):
+		for j in chunk:
 
-		logging.debug('	- Processing tweet {}/{}'.format(i + 1, D.count()))
+			d = D[j]
 
-		# check if we have a true label for the target tweet, if so, skip prediction and use true label
-		if d['tweet_id'] in true_labels:
-			# the labels are stored fully written, for example, positive, and we need to go to the coded version, that is 2 for positive
-			d['label'] = get_sentiment_code(true_labels[d['tweet_id']])
-		else:
-			# infer sentiment label from classifier
-			d['label'] = int(clf.predict([d['text']])[0][0])
+			# check if we have a true label for the target tweet, if so, skip prediction and use true label
+			if d['tweet_id'] in true_labels:
+				# the labels are stored fully written, for example, positive, and we need to go to the coded version, that is 2 for positive
+				d['label'] = get_sentiment_code(true_labels[d['tweet_id']])
+			else:
+				# inferred sentiment label from classifier
+				d['label'] = int(predictions[j])
 
+			# add to label array
+			labels[j] = (d['tweet_id'], d['label'], get_tweet_type_code(d['tweet_type']))
 
-		# update the document in the database
-		db.update_collection(collection = 'target_tweets', doc = d)
+		# update the labels of the chunk in the database
+		db.update_many_to_collection(collection = 'target_tweets', docs = [D[j] for j in chunk], fields = ['label'])
 
-		# add to label array
-		labels[i] = (d['tweet_id'], d['label'], get_tweet_type_code(d['tweet_type']))
+		progress.update(len(chunk))
 
-		# increment counter
-		# i +=1
+	progress.finish()
 
 	# location for the labels array
 	labels_location = os.path.join('files', 'labels')
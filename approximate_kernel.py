@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Classifier that approximates an SVM with an RBF kernel by a linear SVM on an explicit feature map of the kernel. The exact SVC needs the kernel between all pairs
+	of training tweets, so its fit time grows quadratically (or worse) with the number of training tweets. The feature map (Nystroem, from a sample of n_components
+	training tweets, or random Fourier features) has a fixed number of features, so the linear SVM on it is fitted in time linear in the number of training tweets.
+
+	The feature map is part of the classifier (and not a step of the pipeline), so the hyper-parameter search only saves the vectorized folds of the vectorizer, and
+	not the dense feature maps of every value of gamma. The memory of a fit is about 8 * n_components bytes per training tweet. Random Fourier features draw a
+	dense matrix of the number of features of the vectorizer times n_components, so on the TF-IDF features of all terms the saved model is much larger than with
+	Nystroem, which keeps n_components (sparse) training tweets.
+"""
+
+# packages and modules
+import logging
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.svm import LinearSVC
+
+
+class ApproximateKernelSVC(BaseEstimator, ClassifierMixin):
+
+	def __init__(self, kernel_approximation = 'nystroem', C = 1.0, gamma = 1.0, n_components = 1000, max_iter = 1000000, random_state = 42):
+
+		"""
+			Parameters
+			----------
+			kernel_approximation : string (optional)
+				'nystroem' for the Nystroem feature map, or 'rbf_sampler' for random Fourier features
+			C : float (optional)
+				regularization of the linear SVM, as the C of SVC
+			gamma : float (optional)
+				parameter of the RBF kernel, as the gamma of SVC
+			n_components : int (optional)
+				number of features of the feature map
+			max_iter : int (optional)
+				maximum number of iterations of the linear SVM
+			random_state : int (optional)
+				seed to sample the training tweets (Nystroem) or the random features (random Fourier features)
+		"""
+
+		self.kernel_approximation = kernel_approximation
+		self.C = C
+		self.gamma = gamma
+		self.n_components = n_components
+		self.max_iter = max_iter
+		self.random_state = random_state
+
+
+	def get_feature_map(self):
+
+		"""
+			Return the feature map of the RBF kernel
+		"""
+
+		if self.kernel_approximation == 'nystroem':
+			return Nystroem(kernel = 'rbf', gamma = self.gamma, n_components = self.n_components, random_state = self.random_state)
+		elif self.kernel_approximation == 'rbf_sampler':
+			return RBFSampler(gamma = self.gamma, n_components = self.n_components, random_state = self.random_state)
+		else:
+			logging.error('Kernel approximation {} not part of kernel approximations'.format(self.kernel_approximation))
+			exit(1)
+
+
+	def fit(self, X, y):
+
+		"""
+			Fit the feature map and the linear SVM on the mapped features
+
+			Parameters
+			----------
+			X : sparse matrix or np.array((n_samples, features))
+				vectorized training tweets
+			y : np.array((n_samples,))
+				class labels
+		"""
+
+		self.feature_map_ = self.get_feature_map().fit(X)
+
+		self.classifier_ = LinearSVC(C = self.C, max_iter = self.max_iter).fit(self.feature_map_.transform(X), y)
+
+		self.classes_ = self.classifier_.classes_
+
+		return self
+
+
+	def decision_function(self, X):
+
+		return self.classifier_.decision_function(self.feature_map_.transform(X))
+
+
+	def predict(self, X):
+
+		return self.classifier_.predict(self.feature_map_.transform(X))
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Bloom filter for integer tweet IDs. A Bloom filter answers 'definitely not seen' or 'maybe seen' with a small bit array, so most lookups of new tweet IDs do not
+	have to search the (memory-mapped) array of processed tweet IDs. All operations work on numpy arrays of IDs at once.
+"""
+
+# packages and modules
+import numpy as np
+
+# constants of the splitmix64 hash function
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
+class BloomFilter:
+
+	def __init__(self, capacity, false_positive_rate = 0.01, bits = None, num_hashes = None):
+
+		"""
+			Parameters
+			----------
+			capacity : int
+				number of IDs the filter is sized for, adding more IDs increases the false positive rate
+			false_positive_rate : float (optional)
+				probability that an ID that was not added is reported as maybe seen
+			bits : np.array(uint8) (optional)
+				bit array of a saved filter, for example, loaded from a memory-mapped file
+			num_hashes : int (optional)
+				number of hash functions of a saved filter
+		"""
+
+		self.capacity = capacity
+
+		# number of bits (multiple of 8) and number of hash functions
+		num_bits = int(np.ceil(-max(capacity, 1) * np.log(false_positive_rate) / np.log(2) ** 2 / 8.0)) * 8
+		self.num_hashes = num_hashes or max(1, int(round(num_bits / float(max(capacity, 1)) * np.log(2))))
+
+		# bit array, stored as bytes
+		self.bits = bits if bits is not None else np.zeros(num_bits // 8, dtype = np.uint8)
+		self.num_bits = np.uint64(len(self.bits) * 8)
+
+
+	def mix(self, x):
+
+		"""
+			Return the splitmix64 hash of each value of an uint64 array
+		"""
+
+		with np.errstate(over = 'ignore'):
+			x = x + GOLDEN_GAMMA
+			x = (x ^ (x >> np.uint64(30))) * MIX_1
+			x = (x ^ (x >> np.uint64(27))) * MIX_2
+			return x ^ (x >> np.uint64(31))
+
+
+	def get_positions(self, ids):
+
+		"""
+			Return the bit positions of each ID (double hashing), shape = (number of IDs, number of hash functions)
+		"""
+
+		h1 = self.mix(np.asarray(ids, dtype = np.int64).astype(np.uint64))
+		h2 = self.mix(h1) | np.uint64(1)
+
+		with np.errstate(over = 'ignore'):
+			return (h1[:, None] + np.arange(self.num_hashes, dtype = np.uint64)[None, :] * h2[:, None]) % self.num_bits
+
+
+	def add(self, ids):
+
+		"""
+			Add an array of IDs to the filter
+		"""
+
+		# a memory-mapped filter is read-only, so copy it into memory first
+		if not self.bits.flags.writeable:
+			self.bits = np.array(self.bits)
+
+		positions = self.get_positions(ids).ravel()
+
+		np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.int64), (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+
+
+	def contains(self, ids):
+
+		"""
+			Return a Boolean array that is False for IDs that were definitely not added
+		"""
+
+		positions = self.get_positions(ids)
+
+		return np.all(self.bits[(positions >> np.uint64(3)).astype(np.int64)] & (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)) > 0, axis = 1)
@@ -8,7 +8,7 @@
 """
 
 # packages and modules
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne, UpdateOne
 import time, logging, sys
 from bson.objectid import ObjectId
 
@@ -33,6 +33,66 @@ class MongoDatabase:
 			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
 			exit(1)
 
+	def find_in_collection(self, collection, query, projection = None):
+
+		"""
+			Read the documents in a certain collection that match a query
+		"""
+
+		try:
+			return self.db[collection].find(query, projection, no_cursor_timeout = True)
+		except Exception, e:
+			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+	def aggregate_collection(self, collection, pipeline):
+
+		"""
+			Run an aggregation pipeline on a certain collection on the database server and return a cursor over the resulting documents
+		"""
+
+		try:
+			return self.db[collection].aggregate(pipeline, allowDiskUse = True)
+		except Exception, e:
+			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+	def create_index(self, collection, keys):
+
+		"""
+			Create an index on a certain collection (nothing happens if the index already exists)
+		"""
+
+		try:
+			self.db[collection].create_index(keys)
+		except Exception, e:
+			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+	def count_collection(self, collection, query = {}):
+
+		"""
+			Count the documents in a certain collection that match a query (count once before a loop, not inside it)
+		"""
+
+		try:
+			return self.db[collection].find(query).count()
+		except Exception, e:
+			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+	def drop_collection(self, collection):
+
+		"""
+			Remove a collection with all its documents and indexes
+		"""
+
+		try:
+			self.db[collection].drop()
+		except Exception, e:
+			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
 	def insert_one_to_collection(self, collection, doc):
 
 
@@ -47,6 +107,21 @@ class MongoDatabase:
 			exit(1)
 
 
+	def insert_many_to_collection(self, collection, docs):
+
+
+		"""
+			Insert a list of documents to a collection in bulk
+		"""
+
+		try:
+			if len(docs) > 0:
+				self.db[collection].insert_many(docs)
+		except Exception, e:
+			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+
 	def update_collection(self, collection, doc):
 
 
@@ -61,3 +136,33 @@ class MongoDatabase:
 		except Exception, e:
 			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
 			exit(1)
+
+
+	def upsert_many_to_collection(self, collection, docs):
+
+
+		"""
+			Insert a list of documents to a collection in bulk, or replace them if a document with the same _id already exists
+		"""
+
+		try:
+			if len(docs) > 0:
+				self.db[collection].bulk_write([ReplaceOne({'_id' : doc['_id']}, doc, upsert = True) for doc in docs], ordered = False)
+		except Exception, e:
+			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+
+	def update_many_to_collection(self, collection, docs, fields):
+
+
+		"""
+			Update certain fields of a list of documents in bulk (documents are matched on _id)
+		"""
+
+		try:
+			if len(docs) > 0:
+				self.db[collection].bulk_write([UpdateOne({'_id' : doc['_id']}, {'$set' : {field : doc[field] for field in fields}}) for doc in docs], ordered = False)
+		except Exception, e:
+			logging.error("[{}] : {}".format(sys._getframe().f_code.co_name,e))
+			exit(1)
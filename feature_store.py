@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that saves vectorized corpora to disk, so the same documents are not tokenized and vectorized again by the next run (of step 6) or by the next model (of
+	step 7). Each entry of the store is a folder with the name of its key, a fingerprint of the version of the corpus and of the vectorizer with its parameters (or the
+	fitted vectorizer). Sparse matrices are saved as the three arrays of the CSR format (data, indices, and indptr) in .npy files, and are memory-mapped when they are
+	loaded again, so the matrices are not read into memory or copied, and processes that load the same entry share the same pages. Other items, such as the fitted
+	vectorizer with its vocabulary, are saved with joblib.
+"""
+
+# packages and modules
+import hashlib
+import json
+import logging
+import os
+import shutil
+import numpy as np
+from scipy import sparse
+from sklearn.pipeline import Pipeline
+from sklearn.externals import joblib
+
+
+class FeatureStore:
+
+	def __init__(self, folder = os.path.join('files', 'features')):
+
+		"""
+			Parameters
+			----------
+			folder : os.path (optional)
+				folder to save the entries to, it can be removed to start over
+		"""
+
+		self.folder = folder
+
+
+	def get_key(self, *parts):
+
+		"""
+			Return the key of an entry, a fingerprint of the parts, for example, the version of the corpus (see get_corpus_version) and the repr of the vectorizer
+		"""
+
+		return hashlib.sha1('\x00'.join([str(x) for x in parts])).hexdigest()
+
+
+	def get_folder(self, key):
+
+		return os.path.join(self.folder, key)
+
+
+	def exists(self, key):
+
+		"""
+			Return True if the entry has been saved, an entry is only complete once its meta data is written
+		"""
+
+		return os.path.isfile(os.path.join(self.get_folder(key), 'meta.json'))
+
+
+	def save(self, key, items):
+
+		"""
+			Save the items of an entry to a temporary folder and rename it, so a crash (or another process that saves the same entry) never leaves a partial entry
+
+			Parameters
+			----------
+			key : string
+			items : dictionary
+				key = name of the item, value = sparse matrix, numpy array, or any other object that can be saved with joblib
+		"""
+
+		temp_folder = '{}.tmp{}'.format(self.get_folder(key), os.getpid())
+
+		if os.path.exists(temp_folder):
+			shutil.rmtree(temp_folder)
+		os.makedirs(temp_folder)
+
+		meta = {}
+
+		for name, value in items.iteritems():
+
+			if sparse.issparse(value):
+
+				value = value.tocsr()
+
+				for part in ['data', 'indices', 'indptr']:
+					np.save(os.path.join(temp_folder, '{}_{}.npy'.format(name, part)), getattr(value, part))
+
+				meta[name] = {'type' : 'csr', 'shape' : list(value.shape)}
+
+			elif isinstance(value, np.ndarray):
+
+				np.save(os.path.join(temp_folder, '{}.npy'.format(name)), value)
+
+				meta[name] = {'type' : 'array'}
+
+			else:
+
+				joblib.dump(value, os.path.join(temp_folder, '{}.pkl'.format(name)))
+
+				meta[name] = {'type' : 'object'}
+
+		with open(os.path.join(temp_folder, 'meta.json'), 'w') as f:
+			json.dump(meta, f)
+
+		try:
+			os.rename(temp_folder, self.get_folder(key))
+		except OSError:
+			# another process saved the same entry first
+			if not self.exists(key):
+				raise
+			shutil.rmtree(temp_folder, ignore_errors = True)
+
+
+	def load(self, key):
+
+		"""
+			Load the items of an entry, the arrays and sparse matrices are memory-mapped (read-only)
+
+			Returns
+			--------
+			items : dictionary
+				key = name of the item, value = item
+		"""
+
+		folder = self.get_folder(key)
+
+		with open(os.path.join(folder, 'meta.json'), 'r') as f:
+			meta = json.load(f)
+
+		items = {}
+
+		for name, info in meta.iteritems():
+
+			if info['type'] == 'csr':
+
+				data, indices, indptr = [np.load(os.path.join(folder, '{}_{}.npy'.format(name, part)), mmap_mode = 'r') for part in ['data', 'indices', 'indptr']]
+
+				# the matrix uses the memory-mapped arrays, they are not copied
+				items[name] = sparse.csr_matrix((data, indices, indptr), shape = tuple(info['shape']), copy = False)
+
+			elif info['type'] == 'array':
+
+				items[name] = np.load(os.path.join(folder, '{}.npy'.format(name)), mmap_mode = 'r')
+
+			else:
+
+				items[name] = joblib.load(os.path.join(folder, '{}.pkl'.format(name)))
+
+		return items
+
+
+	def get(self, key, create):
+
+		"""
+			Load an entry, or create and save it first if it does not exist
+
+			Parameters
+			----------
+			key : string
+			create : function
+				function without arguments that returns the items of the entry
+		"""
+
+		if not self.exists(key):
+			self.save(key, create())
+
+		return self.load(key)
+
+
+	def delete(self, key):
+
+		"""
+			Remove an entry, for example, when the corpus has changed
+		"""
+
+		if os.path.exists(self.get_folder(key)):
+			shutil.rmtree(self.get_folder(key))
+
+
+	def transform(self, transformer, X, version = None):
+
+		"""
+			Return the documents vectorized by a fitted transformer (for example, the vectorizer of a saved model), the documents are only vectorized if they have not
+			been vectorized by the same fitted transformer before
+
+			Parameters
+			----------
+			transformer : object
+				fitted transformer (or pipeline of transformers), its fingerprint includes the fitted vocabulary
+			X : list
+				documents to transform
+			version : string (optional)
+				version of the documents, by default the fingerprint of the documents (see get_corpus_version)
+		"""
+
+		key = self.get_key(version or get_corpus_version(X), joblib.hash(transformer))
+
+		if self.exists(key):
+			logging.debug('Loading vectorized documents from the feature store: {}'.format(key))
+
+		return self.get(key, lambda: {'X' : transformer.transform(X)})['X']
+
+
+	def predict(self, model, X, version = None, batch_size = 10000):
+
+		"""
+			Predict the documents with a model, the steps before the classifier are applied with transform(), so models with the same fitted vectorizer share the
+			vectorized documents
+
+			Parameters
+			----------
+			model : Pipeline or GridSearchCV
+				fitted model, for example, a model saved by step 6
+			X : list
+				documents to predict
+			version : string (optional)
+				version of the documents, see transform()
+			batch_size : int (optional)
+				number of documents predicted at once
+
+			Returns
+			--------
+			y : np.array
+				predicted class of each document
+		"""
+
+		# models of older runs are saved as the grid search
+		if hasattr(model, 'best_estimator_'):
+			model = model.best_estimator_
+
+		if not isinstance(model, Pipeline) or len(model.steps) < 2:
+			return model.predict(X)
+
+		X_features = self.transform(Pipeline(model.steps[:-1]), X, version)
+
+		classifier = model.steps[-1][1]
+
+		if X_features.shape[0] == 0:
+			return np.array([])
+
+		return np.concatenate([classifier.predict(X_features[i:i + batch_size]) for i in range(0, X_features.shape[0], batch_size)])
+
+
+def get_corpus_version(X, y = None):
+
+	"""
+		Return the version of a corpus, a fingerprint of the documents (in their order) and of the class labels if given
+
+		Parameters
+		----------
+		X : list
+			documents, for example, the preprocessed tweet texts
+		y : list (optional)
+			class label of each document
+	"""
+
+	version = hashlib.sha1()
+
+	for x in X:
+		version.update(x.encode('utf-8') if isinstance(x, unicode) else str(x))
+		version.update('\x00')
+
+	if y is not None:
+		version.update('\x01')
+		for label in y:
+			version.update(str(label))
+			version.update('\x00')
+
+	return version.hexdigest()
@@ -14,18 +14,34 @@ import re # to use regular expressions
 import string # to get a list of punctation
 import csv # to read and write CSV files
 import pickle # to save/read objects
+import json # to read tweets that were stored as JSON text
 from datetime import datetime
+from collections import deque # to keep track of pending chunks
+from multiprocessing import Pool # to process chunks in parallel
+import hashlib # to create fingerprints
+import inspect # to fingerprint the code of functions
+from preprocess_cache import PreprocessCache
+from tweet_tracker import TweetTracker
+from instrumentation import ProgressReporter, SamplingFilter, QueueHandler, QueueListener
+from Queue import Queue, Empty
+import threading # to read files in parallel
+import random # to shuffle streams
 
 
-def set_logger(folder_name = 'logs'):
+def set_logger(folder_name = 'logs', level = logging.NOTSET, sample_every = 100):
 
 	"""
-		Set up the logging to console layout
+		Set up the logging to console layout. Log records are written to file and console by a background thread, so logging does not block the processing
 
 		Parameters
 		----------
 		folder_name : string, optional
 				name of the folder where the logs can be saved to
+		level : int, optional
+				minimum level of the log records, for instance, logging.INFO
+		sample_every : int, optional
+				only log the first and then every n-th debug record of each logging statement, for example, a statement inside a loop over all tweets. Info records
+				(such as the progress reports), warnings, and errors are always logged, set to 1 to log everything
 
 	"""
 
@@ -35,13 +51,22 @@ def set_logger(folder_name = 'logs'):
 	# define the name of the log file
 	log_file_name = os.path.join(folder_name, '{:%Y%m%d%H%M%S}.log'.format(datetime.now()))
 
-	# set up the logger layout to console
-	logging.basicConfig(filename=log_file_name, level=logging.NOTSET)
+	# set up the logger layout to file and to console
+	log_file = logging.FileHandler(log_file_name)
+	log_file.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
 	console = logging.StreamHandler()
 	formatter = logging.Formatter('%(name)-12s: %(levelname)-8s %(message)s')
 	console.setFormatter(formatter)
-	logging.getLogger('').addHandler(console)
-	logger = logging.getLogger(__name__)
+
+	# records are put on a queue and written by a background thread
+	queue = Queue()
+	handler = QueueHandler(queue, handlers = [log_file, console])
+	handler.addFilter(SamplingFilter(sample_every))
+	QueueListener(queue, handlers = [log_file, console]).start()
+
+	logger = logging.getLogger('')
+	logger.setLevel(level)
+	logger.addHandler(handler)
 
 
 def create_directory(name):
@@ -160,6 +185,166 @@ def read_csv(filename, folder = None):
 		logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
 		exit(1)
 
+def read_csv_chunks(filename, converters = {}, skip_header = False, chunk_size = 1000):
+
+	"""
+		Read a CSV file as a stream of chunks of typed rows, so only one chunk of the file is in memory at once
+
+		Parameters
+		---------
+		filename : string
+			name of the csv file
+		converters : dictionary (optional)
+			key = column index, value = function that converts the string value of that column, for example, int for a tweet ID. If a function returns None, or raises
+			an error, the row is skipped
+		skip_header : Boolean (optional)
+			skip the first row of the file
+		chunk_size : int (optional)
+			number of rows in each chunk
+
+		Returns
+		--------
+		chunk : list
+			generator of lists with at most chunk_size rows
+	"""
+
+	# increate CSV max size
+	csv.field_size_limit(sys.maxsize)
+
+	with open(filename, 'rb') as f:
+
+		reader = csv.reader(f)
+
+		if skip_header:
+			next(reader, None)
+
+		chunk, skipped = [], 0
+
+		for row in reader:
+
+			try:
+				for index, converter in converters.iteritems():
+					row[index] = converter(row[index])
+			except Exception, e:
+				logging.debug('Skipping row {} of {}: {}'.format(reader.line_num, filename, e))
+				skipped += 1
+				continue
+
+			if any([row[index] is None for index in converters]):
+				skipped += 1
+				continue
+
+			chunk.append(row)
+
+			if len(chunk) == chunk_size:
+				yield chunk
+				chunk = []
+
+		# return the remaining rows
+		if len(chunk) > 0:
+			yield chunk
+
+		if skipped > 0:
+			logging.info('Skipped {} rows of {} that could not be converted or have an unknown value'.format(skipped, filename))
+
+
+def read_csv_files(filenames, converters = {}, skip_header = False, chunk_size = 1000, num_threads = 4, max_pending = 8):
+
+	"""
+		Read several CSV files in parallel threads as one stream of chunks of typed rows. The chunks are passed through a bounded queue, so the memory stays the same
+		no matter how many (or how large) the files are; the order of the chunks across files is not fixed
+
+		Parameters
+		---------
+		filenames : list of strings
+			names of the csv files
+		converters : dictionary (optional)
+			see read_csv_chunks()
+		skip_header : Boolean (optional)
+			skip the first row of each file
+		chunk_size : int (optional)
+			number of rows in each chunk
+		num_threads : int (optional)
+			number of files that are read at the same time
+		max_pending : int (optional)
+			maximum number of chunks that are read ahead
+
+		Returns
+		--------
+		chunk : list
+			generator of lists with at most chunk_size rows
+	"""
+
+	return read_parallel([read_csv_chunks(filename, converters = converters, skip_header = skip_header, chunk_size = chunk_size) for filename in filenames], num_threads = num_threads, max_pending = max_pending)
+
+
+def read_parallel(iterables, num_threads = 4, max_pending = 8):
+
+	"""
+		Read several iterables (for example, generators that read a file in chunks) in parallel threads as one stream. The items are passed through a bounded queue,
+		so the threads only read ahead a fixed number of items
+
+		Parameters
+		---------
+		iterables : list of iterables
+			iterables to read, each iterable is read by one thread at a time
+		num_threads : int (optional)
+			number of iterables that are read at the same time
+		max_pending : int (optional)
+			maximum number of items that are read ahead
+
+		Returns
+		--------
+		item : object
+			generator of the items of all iterables, the order across iterables is not fixed
+	"""
+
+	# iterables that still need to be read, and the items that are read (None marks a finished thread, an exception a failed thread)
+	todo, items = Queue(), Queue(maxsize = max_pending)
+
+	for iterable in iterables:
+		todo.put(iterable)
+
+	def read_iterables():
+
+		try:
+			while True:
+
+				try:
+					iterable = todo.get_nowait()
+				except Empty:
+					break
+
+				for item in iterable:
+					items.put(item)
+
+			items.put(None)
+
+		except Exception, e:
+			items.put(e)
+
+	num_threads = max(1, min(num_threads, len(iterables)))
+
+	for _ in range(num_threads):
+		thread = threading.Thread(target = read_iterables)
+		thread.daemon = True
+		thread.start()
+
+	finished = 0
+
+	while finished < num_threads:
+
+		item = items.get()
+
+		if item is None:
+			finished += 1
+		elif isinstance(item, Exception):
+			logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name, item))
+			exit(1)
+		else:
+			yield item
+
+
 def save_dic_to_csv(dic, file_name, folder):
 
 	"""
@@ -199,6 +384,45 @@ def save_dic_to_csv(dic, file_name, folder):
 		logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
 		exit(1)
 
+def save_rows_to_csv(rows, file_name, folder, columns = None):
+
+	"""
+		Save a list of dictionaries as CSV (comma separated values), one row per dictionary with a header
+
+		Parameters
+		----------
+		rows : list of dictionaries
+			rows with the column names as keys
+		file_name : string
+			The name of the file you want to give it
+		folder: string
+			The folder location
+		columns : list of strings (optional)
+			order of the columns (other keys are left out), by default the sorted keys of all rows
+	"""
+
+	try:
+
+		# create folder name as directory if not exists
+		create_directory(folder)
+
+		# check if .csv is used as an extension, this is not required
+		if file_name[-4:] == '.csv':
+			file_name = file_name[:-4]
+
+		columns = columns or sorted(set([k for row in rows for k in row.keys()]))
+
+		with open(os.path.join(folder, file_name + '.csv'), 'w') as f:
+
+			writer = csv.DictWriter(f, fieldnames = columns, lineterminator = '\n', extrasaction = 'ignore')
+
+			writer.writeheader()
+			writer.writerows(rows)
+
+	except Exception, e:
+		logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+		exit(1)
+
 def save_pickle(obj, file_name, folder):
 	
 	"""
@@ -255,6 +479,227 @@ def load_pickle(file_name, folder = None):
 	with open(os.path.join(file_name + '.pkl'), 'rb') as f:
 		return pickle.load(f)
 
+def read_in_chunks(iterable, chunk_size = 1000):
+
+	"""
+		Read items from an iterable (for example, a database cursor) in chunks
+
+		Parameters
+		----------
+		iterable : iterable
+			items to read
+		chunk_size : int (optional)
+			maximum number of items in each chunk
+
+		Returns
+		--------
+		chunk : list
+			generator of lists with at most chunk_size items
+	"""
+
+	chunk = []
+
+	for item in iterable:
+
+		chunk.append(item)
+
+		if len(chunk) == chunk_size:
+			yield chunk
+			chunk = []
+
+	# return the remaining items
+	if len(chunk) > 0:
+		yield chunk
+
+
+def shuffle_stream(iterable, buffer_size = 100000, seed = 42):
+
+	"""
+		Shuffle a stream of items with a buffer of fixed size: once the buffer is full, each new item takes the place of a random item in the buffer, which is returned.
+		The memory is bounded by the buffer, and items are moved by about buffer_size places (so a stream ordered by, for example, training dataset gets mixed)
+
+		Parameters
+		----------
+		iterable : iterable
+			stream of items, for example, a database cursor
+		buffer_size : int (optional)
+			number of items kept in memory
+		seed : int (optional)
+			seed of the random generator, use a different seed for each pass over the same stream
+
+		Returns
+		--------
+		item : object
+			generator of the shuffled items
+	"""
+
+	rng = random.Random(seed)
+
+	buffer = []
+
+	for item in iterable:
+
+		if len(buffer) < buffer_size:
+			buffer.append(item)
+			continue
+
+		index = rng.randrange(buffer_size)
+
+		yield buffer[index]
+
+		buffer[index] = item
+
+	rng.shuffle(buffer)
+
+	for item in buffer:
+		yield item
+
+
+def get_tweet_tracker(db, collection, id_field = 'id', type_field = 'tweet_type', query = {}, use_bloom_filter = True):
+
+	"""
+		Return the tracker of the processed tweet IDs of a collection. The first time, the tracker is built from the database and saved, after that the saved tracker is
+		memory-mapped. The saved tracker is only used if the number of documents it has seen is the number of documents of the collection (the tracker is saved at the
+		end of a run, so after a crash, or after dropping a collection, it is built from the database again)
+
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		collection : string
+			name of the collection with the processed tweets, also used as the name of the tracker
+		id_field : string (optional)
+			field with the tweet ID
+		type_field : string (optional)
+			field with the tweet type, if None all IDs get the name of the collection as tweet type
+		query : dictionary (optional)
+			query to select the documents that are tracked
+		use_bloom_filter : Boolean (optional)
+			put a Bloom filter in front of the arrays with IDs
+
+		Returns
+		--------
+		tracker : TweetTracker
+	"""
+
+	tracker = TweetTracker(name = collection, use_bloom_filter = use_bloom_filter)
+
+	# the saved tracker misses the tweets of a run that crashed before it was saved
+	if tracker.exists() and tracker.num_docs != db.count_collection(collection = collection, query = query):
+
+		logging.info('Tweet tracker out of date with collection: {}'.format(collection))
+
+		tracker.delete()
+
+	if not tracker.exists():
+
+		logging.info('Building tweet tracker from collection: {}'.format(collection))
+
+		# only read the fields that are needed
+		projection = {id_field : True, type_field : True} if type_field is not None else {id_field : True}
+
+		for docs in read_in_chunks(db.find_in_collection(collection = collection, query = query, projection = projection), chunk_size = 100000):
+			tracker.add([d[type_field] for d in docs] if type_field is not None else collection, [int(d[id_field]) for d in docs])
+
+		tracker.save()
+
+	return tracker
+
+
+# fields of a tweet from the Twitter API that are stored with the training tweets (see project_tweet)
+TWEET_FIELDS = ['id', 'full_text', 'created_at', 'lang']
+
+def project_tweet(tweet, fields = TWEET_FIELDS):
+
+	"""
+		Keep only the fields of a tweet that are used later on, so the tweet can be stored as a small subdocument instead of the full tweet as JSON text
+
+		Parameters
+		----------
+		tweet : dictionary or string
+			tweet from the Twitter API (the _json of a tweepy Status), the JSON text of such a tweet (how older documents stored it), or None for an unavailable tweet
+		fields : list of strings (optional)
+			fields to keep
+
+		Returns
+		--------
+		tweet : dictionary
+			the tweet with only the given fields, or None for an unavailable tweet
+	"""
+
+	if tweet is None:
+		return None
+
+	if isinstance(tweet, basestring):
+		tweet = json.loads(tweet)
+
+	return {field : tweet[field] for field in fields if field in tweet}
+
+
+def map_chunks(func, chunks, num_workers = 1, initializer = None, initargs = (), max_pending = None):
+
+	"""
+		Apply a function to each chunk, either in this process or in a pool of worker processes. Results are returned in the same order as the chunks, so the
+		caller can act as a single writer.
+
+		Parameters
+		----------
+		func : function
+			function that takes a chunk and returns the processed chunk (needs to be defined at module level so it can be send to the worker processes)
+		chunks : iterable
+			chunks to process, for instance, created with read_in_chunks()
+		num_workers : int (optional)
+			number of worker processes, 1 processes the chunks in this process
+		initializer : function (optional)
+			function that is called once in each worker process, for example, to load spaCy
+		initargs : tuple (optional)
+			arguments for the initializer
+		max_pending : int (optional)
+			maximum number of chunks that are send to the workers but not returned yet (defaults to twice the number of workers). This bounds the memory
+			when reading from a large collection
+
+		Returns
+		--------
+		result : object
+			generator of processed chunks
+	"""
+
+	# process chunks in this process
+	if num_workers <= 1:
+
+		if initializer is not None:
+			initializer(*initargs)
+
+		for chunk in chunks:
+			yield func(chunk)
+
+		return
+
+	# chunks send to the workers that have not been returned yet
+	max_pending = max_pending or 2 * num_workers
+	pending = deque()
+
+	# create the worker processes
+	pool = Pool(processes = num_workers, initializer = initializer, initargs = initargs)
+
+	try:
+
+		for chunk in chunks:
+
+			pending.append(pool.apply_async(func, (chunk,)))
+
+			# wait for the oldest chunk before reading more
+			if len(pending) >= max_pending:
+				yield pending.popleft().get()
+
+		# return the remaining chunks
+		while pending:
+			yield pending.popleft().get()
+
+	finally:
+		pool.terminate()
+		pool.join()
+
 def clean_tweet(text):
 
 	"""
@@ -335,6 +780,19 @@ def decontract_text(text):
 	return text
 
 
+# positive and negative emoticons
+EMOTICONS_POS = [":)", ":-)", ":p", ":-p", ":P", ":-P", ":D",":-D", ":]", ":-]", ";)", ";-)", ";p", ";-p", ";P", ";-P", ";D", ";-D", ";]", ";-]", "=)", "=-)", "<3"]
+EMOTICONS_NEG = [":o", ":-o", ":O", ":-O", ":(", ":-(", ":c", ":-c", ":C", ":-C", ":[", ":-[", ":/", ":-/", ":\\", ":-\\", ":n", ":-n", ":u", ":-u", "=(", "=-(", ":$", ":-$"]
+
+# positive and negative emojis
+EMOJIS_POS = [u'\U0001f600',u'\U0001f601',u'\U0001f602',u'\U0001f923',u'\U0001f603',u'\U0001f604',u'\U0001f605',u'\U0001f606',
+			u'\U0001f609',u'\U0001f60a',u'\U0001f60b',u'\U0001f60e',u'\U0001f60d',u'\U0001f618',u'\U0001f617',u'\U0001f619',
+			u'\U0001f61a',u'\\U000263a',u'\U0001f642',u'\U0001f917']
+
+EMOJIS_NEG = [u'\\U0002639',u'\U0001f641',u'\U0001f616',u'\U0001f61e',u'\U0001f61f',u'\U0001f624',u'\U0001f622',u'\U0001f62d',
+			u'\U0001f626',u'\U0001f627',u'\U0001f628',u'\U0001f629',u'\U0001f62c',u'\U0001f630',u'\U0001f631',u'\U0001f633',
+			u'\U0001f635',u'\U0001f621',u'\U0001f620',u'\U0001f612']
+
 def replace_emoticons(text, placeholder_pos = ' HAPPYEMOTICON ', placeholder_neg = ' SADEMOTICON '):
 
 	"""
@@ -356,15 +814,12 @@ def replace_emoticons(text, placeholder_pos = ' HAPPYEMOTICON ', placeholder_neg
 
 	"""
 
-	emoticons_pos = [":)", ":-)", ":p", ":-p", ":P", ":-P", ":D",":-D", ":]", ":-]", ";)", ";-)", ";p", ";-p", ";P", ";-P", ";D", ";-D", ";]", ";-]", "=)", "=-)", "<3"]
-	emoticons_neg = [":o", ":-o", ":O", ":-O", ":(", ":-(", ":c", ":-c", ":C", ":-C", ":[", ":-[", ":/", ":-/", ":\\", ":-\\", ":n", ":-n", ":u", ":-u", "=(", "=-(", ":$", ":-$"]
-
 	# replace positive emoticons by placeholder
-	for e in emoticons_pos:
+	for e in EMOTICONS_POS:
 		text = text.replace(e, placeholder_pos)
 
 	# replace negative emoticons by placeholder
-	for e in emoticons_neg:
+	for e in EMOTICONS_NEG:
 		text = text.replace(e, placeholder_neg)
 
 	return text
@@ -390,22 +845,12 @@ def replace_emojis(text, placeholder_pos = ' HAPPYEMOJI ', placeholder_neg = ' S
 
 	"""
 
-	# define positive emojis
-	emoji_pos = [u'\U0001f600',u'\U0001f601',u'\U0001f602',u'\U0001f923',u'\U0001f603',u'\U0001f604',u'\U0001f605',u'\U0001f606',
-				u'\U0001f609',u'\U0001f60a',u'\U0001f60b',u'\U0001f60e',u'\U0001f60d',u'\U0001f618',u'\U0001f617',u'\U0001f619',
-				u'\U0001f61a',u'\\U000263a',u'\U0001f642',u'\U0001f917']
-
-	# define negative emojis
-	emoji_neg = [u'\\U0002639',u'\U0001f641',u'\U0001f616',u'\U0001f61e',u'\U0001f61f',u'\U0001f624',u'\U0001f622',u'\U0001f62d',
-				u'\U0001f626',u'\U0001f627',u'\U0001f628',u'\U0001f629',u'\U0001f62c',u'\U0001f630',u'\U0001f631',u'\U0001f633',
-				u'\U0001f635',u'\U0001f621',u'\U0001f620',u'\U0001f612']
-
 	# replace positive emojis by placeholder
-	for e in emoji_pos:
+	for e in EMOJIS_POS:
 		text = text.replace(e, placeholder_pos)
 
 	# replace negative emojis by placeholder
-	for e in emoji_neg:
+	for e in EMOJIS_NEG:
 		text = text.replace(e, placeholder_neg)
 
 	return text
@@ -502,6 +947,79 @@ def get_tokens(text):
 	return tokens
 
 
+def clean_tweets(texts):
+
+	"""
+		Batch version of clean_tweet() and get_tokens() that works on a whole list of tweet texts. The same rules are applied in the same order, so the output is the
+		same as calling clean_tweet() and get_tokens() on each text. The texts are joined into a single string with a new line between the texts (the first rule
+		replaces the new lines within the texts), and each rule is a single regular expression, replace, or translate over that string, so the rules do not loop over
+		the texts in Python. None of the rules matches a new line, so a rule never crosses from one text into the next (with re.MULTILINE, $ matches at the end of
+		each text). The emoticons and emojis are replaced with a single regular expression (they never overlap), and the punctuation and specific characters with a
+		single character class. Only splitting the result into the texts and the tokens loops over the texts.
+
+		Parameters
+		----------
+		texts : list of strings, or any iterable of strings (for example, a pandas.Series or a pyarrow.Array)
+			content of the tweets
+
+		Returns
+		--------
+		text : list
+			preprocessed tweets
+		tokens : list
+			list of tokens of each preprocessed tweet
+	"""
+
+	if hasattr(texts, 'to_pylist'):
+		texts = texts.to_pylist()
+	texts = list(texts)
+
+	if len(texts) == 0:
+		return [], []
+
+	# join the texts with a separator that is not in the texts, and replace the new lines within the texts before the separators become new lines
+	text = u'\x00'.join(texts)
+
+	if text.count(u'\x00') != len(texts) - 1:
+		text = [clean_tweet(x) for x in texts]
+		return text, [get_tokens(x) for x in text]
+
+	# replace new lines
+	text = text.replace(u'\n', u' ').replace(u'\x00', u'\n')
+	# replace ampersand character
+	text = text.replace(u'&amp;', u' and ')
+	# replace @
+	text = re.sub(re.compile(r'@.*?( |$)', re.MULTILINE), 'USERTAG ', text)
+	# replace URL
+	text = re.sub(re.compile(r'http[s]{0,1}.*?( |$)', re.MULTILINE), 'URLTAG ', text)
+	# replace hashtag
+	text = text.replace(u'#', u'')
+	# replace contractions
+	for pattern, replacement in [(r"won't", "will not"), (r"can\'t", "can not"), (r"n\'t", " not"), (ur"n\u2019t", " not"), (r"\'re", " are"), (r"\'s", " is"), (ur"\u2019s"," is"),
+								(r"\'d", " would"), (r"\'ll", " will"), (r"\'t", " not"), (r"\'ve", " have"), (r"\'m", " am")]:
+		text = re.sub(pattern, replacement, text)
+	# replace emoticons
+	text = re.sub('|'.join([re.escape(e) for e in EMOTICONS_POS]), ' HAPPYEMOTICON ', text)
+	text = re.sub('|'.join([re.escape(e) for e in EMOTICONS_NEG]), ' SADEMOTICON ', text)
+	# replace emojis
+	text = re.sub(u'|'.join([re.escape(e) for e in EMOJIS_POS]), ' HAPPYEMOJI ', text)
+	text = re.sub(u'|'.join([re.escape(e) for e in EMOJIS_NEG]), ' SADEMOJI ', text)
+	# replace repeating charachtes : happyyyyy -> happyy (remove each character that is followed by two more of it, a literal replacement is not expanded in Python)
+	text = re.sub(r'(.)(?=\1\1)', '', text)
+	# replace punctuation and specific characters (a character class, translate looks up each character in Python)
+	text = re.sub(u'[{}]'.format(re.escape(unicode(string.punctuation) + u'\u201c\u201d\u2014\u2013\u2026')), u' ', text)
+	# replace double spaced
+	text = text.replace(u'  ', u' ').replace(u'  ', u' ')
+
+	# split into the texts, and trim leading and trailing spaces
+	text = [x.strip() for x in text.split(u'\n')]
+
+	# tokenize, the lowercase of the whole string is the same as the lowercase of each token
+	tokens = [[x for x in t.split(u' ') if x != u' ' and not x.isdigit()] for t in u'\n'.join(text).lower().split(u'\n')]
+
+	return text, tokens
+
+
 def get_lemma(spacy_doc):
 
 	"""
@@ -556,6 +1074,138 @@ def word_tokenizer(text):
 		logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
 		exit(1)
 
+def get_preprocessed_text(tokens, spacy_doc):
+
+	"""
+		Return the preprocessed text of a tweet: the lemma of its tokens as one utf-8 string, or an empty string if the tweet has no tokens
+
+		Parameters
+		----------
+		tokens : list
+			tokens of the cleaned tweet, see get_tokens()
+		spacy_doc : spacy nlp object
+			the tokens processed by spaCy
+	"""
+
+	# convert list to string again
+	return ' '.join(get_lemma(spacy_doc)).encode('utf-8') if len(tokens) > 0 else ''
+
+
+def get_code_fingerprint(code, docstring = False):
+
+	"""
+		Return a fingerprint of the compiled code of a function: its bytecode, constants, and the names it uses. Comments, the docstring, and line numbers are not
+		part of the compiled code, so changing them does not change the fingerprint
+
+		Parameters
+		----------
+		code : code object
+			the compiled code, for example, func_code of a function
+		docstring : Boolean (optional)
+			the first constant is the docstring of the function
+	"""
+
+	consts = code.co_consts[1:] if docstring else code.co_consts
+
+	# code objects of nested functions and generator expressions are fingerprinted themselves (their repr contains their memory address)
+	consts = [get_code_fingerprint(x) if inspect.iscode(x) else repr(x) for x in consts]
+
+	return hashlib.sha1('\x00'.join([code.co_code, repr(consts), repr(code.co_names)])).hexdigest()
+
+
+def get_preprocess_version(nlp):
+
+	"""
+		Create a fingerprint of the preprocessing pipeline from the compiled code of the functions that determine the preprocessed text and the spaCy model that is
+		used for the lemmatization. Changing any of them results in a new fingerprint. Comments and docstrings are left out, as are clean_tweets() (a faster version
+		of clean_tweet() and get_tokens() with the same output, see tests/test_clean_tweets.py) and preprocess_docs() (reads and writes the cache and calls the
+		functions below), so changing those does not make all cached texts outdated
+
+		Parameters
+		----------
+		nlp : spacy nlp object
+
+		Returns
+		--------
+		version : string
+			hash of the preprocessing pipeline
+	"""
+
+	# functions that determine the outcome of the preprocessing
+	functions = [clean_tweet, decontract_text, replace_emoticons, replace_emojis, replace_repeating_characters, replace_punctuation, replace_specific_characters, get_tokens, get_lemma, get_preprocessed_text]
+
+	# compiled code of the functions and the emoticons and emojis they replace
+	source = ''.join([get_code_fingerprint(f.func_code, docstring = f.__doc__ is not None) for f in functions]) + repr([EMOTICONS_POS, EMOTICONS_NEG, EMOJIS_POS, EMOJIS_NEG])
+
+	# version of spaCy and its language model
+	model = '{}{}{}{}'.format(spacy.__version__, nlp.meta.get('lang'), nlp.meta.get('name'), nlp.meta.get('version'))
+
+	return hashlib.sha1(source + model).hexdigest()
+
+
+def init_preprocess_worker(use_cache = True):
+
+	"""
+		Load spaCy and the preprocess cache once for the process that executes preprocess_docs(), this can be the main process or a worker process
+
+		Parameters
+		----------
+		use_cache : Boolean (optional)
+			read and write the preprocessed texts through the preprocess cache
+	"""
+
+	global worker_nlp, worker_version, worker_cache
+
+	worker_nlp = setup_spacy()
+
+	worker_version = get_preprocess_version(worker_nlp)
+
+	worker_cache = PreprocessCache(version = worker_version) if use_cache else None
+
+
+def preprocess_docs(docs):
+
+	"""
+		Clean, tokenize, and lemmatize the raw text of a chunk of documents. Call init_preprocess_worker() first (or pass it as the initializer of map_chunks)
+
+		Parameters
+		----------
+		docs : list of dictionaries
+			documents with the original tweet text as 'raw_text'
+
+		Returns
+		--------
+		docs : list of dictionaries
+			the same documents with the preprocessed tweet text added as 'text' (empty string if the tweet has no tokens), and the version of the preprocessing as 'pipeline_version'
+	"""
+
+	# read texts that have been preprocessed before
+	cached = worker_cache.get_many([d['raw_text'] for d in docs]) if worker_cache is not None else {}
+
+	# only preprocess the texts that are not cached (a raw text can appear more than once within the same chunk)
+	raw_texts = list(set([d['raw_text'] for d in docs if d['raw_text'] not in cached]))
+
+	# preprocess the tweet texts and tokenize them (as one column, this gives the same tokens as clean_tweet() and get_tokens())
+	tokens = list(clean_tweets(raw_texts)[1])
+
+	# convert to lemma, spaCy processes the texts as a stream which is faster than one by one
+	texts = {}
+	for raw_text, t, spacy_doc in zip(raw_texts, tokens, worker_nlp.pipe([' '.join(x) for x in tokens])):
+
+		texts[raw_text] = get_preprocessed_text(t, spacy_doc)
+
+	# save the new texts to the cache
+	if worker_cache is not None:
+		worker_cache.set_many(texts)
+
+	# add the preprocessed text to the documents
+	texts.update(cached)
+	for d in docs:
+		d['text'] = texts[d['raw_text']]
+		d['pipeline_version'] = worker_version
+
+	return docs
+
 def get_sentiment_code(label):
 
 	"""
@@ -593,6 +1243,28 @@ def get_sentiment_code(label):
 		exit(1)
 
 
+# sentiment labels of the labeled datasets and their code (see get_sentiment_code)
+SENTIMENT_CODES = {'negative' : 0, 'neutral' : 1, 'positive' : 2, '0' : 0, '2' : 1, '4' : 2}
+
+def convert_sentiment_label(label):
+
+	"""
+		Convert a sentiment label from a labeled dataset to the numeric code of the sentiment, this can be used as a converter for read_csv_chunks()
+
+		Parameters
+		----------
+		label : string
+			written sentiment label (for example, Positive or ' negative') or the code used by the Stanford dataset ('0', '2', '4')
+
+		Returns
+		--------
+		code : int
+			see get_sentiment_code(), or None if the label is not positive, negative, or neutral (for example, irrelevant)
+	"""
+
+	return SENTIMENT_CODES.get(label.strip().lower())
+
+
 def get_sentiment_label(code):
 	
 	"""
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that retrieves tweets (or other items) from an API with a pool of fetch threads and writes them with a single bulk writer thread. The fetch threads fill a
+	bounded queue that the writer drains, so calls to the API and writes to the database overlap instead of adding up for every tweet.
+"""
+
+# packages and modules
+import logging
+import sys
+import threading
+import time
+from Queue import Queue, Empty
+from rate_limiter import RateLimiter
+from instrumentation import ProgressReporter
+
+
+class Hydrator:
+
+	def __init__(self, fetch, write, num_workers = 8, max_pending = 100, batch_size = 1000, flush_interval = 5, rate_limiter = None, worker_rate_limit_calls = None, worker_rate_limit_period = 900):
+
+		"""
+			Parameters
+			----------
+			fetch : function
+				function that takes a task and a rate limiter and returns a list of items; it needs to call rate_limiter.wait() before each call to the API
+			write : function
+				function that takes a list of items and writes them in bulk, only called from the writer thread
+			num_workers : int (optional)
+				number of fetch threads
+			max_pending : int (optional)
+				maximum number of tasks and of fetched results that are queued, this bounds the memory
+			batch_size : int (optional)
+				number of items the writer collects before writing them
+			flush_interval : int (optional)
+				maximum number of seconds the writer holds items before writing them
+			rate_limiter : RateLimiter (optional)
+				rate limiter shared by all fetch threads, for example, the limit of the API key
+			worker_rate_limit_calls : int (optional)
+				maximum number of calls of each fetch thread within worker_rate_limit_period seconds, None for no limit per thread
+			worker_rate_limit_period : int (optional)
+				length of the time window of the limit per thread in seconds
+		"""
+
+		logging.info('Initialize {}'.format(self.__class__.__name__))
+
+		self.fetch = fetch
+		self.write = write
+		self.num_workers = num_workers
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self.rate_limiter = rate_limiter
+		self.worker_rate_limit_calls = worker_rate_limit_calls
+		self.worker_rate_limit_period = worker_rate_limit_period
+
+		# tasks for the fetch threads, and fetched results for the writer (None stops a thread)
+		self.tasks = Queue(maxsize = max_pending)
+		self.results = Queue(maxsize = max_pending)
+
+		# exceptions of the threads, the first exception stops the fetching of the remaining tasks
+		self.errors = []
+		self.stopped = threading.Event()
+
+
+	def get_worker_rate_limiter(self):
+
+		"""
+			Return the rate limiter of a fetch thread, it waits for the limit of the thread and for the shared limit
+		"""
+
+		limiters = [x for x in [RateLimiter(self.worker_rate_limit_calls, self.worker_rate_limit_period) if self.worker_rate_limit_calls else None, self.rate_limiter] if x is not None]
+
+		return CombinedRateLimiter(limiters)
+
+
+	def run_worker(self):
+
+		"""
+			Fetch tasks until the task queue is closed
+		"""
+
+		rate_limiter = self.get_worker_rate_limiter()
+
+		try:
+			while True:
+
+				task = self.tasks.get()
+
+				if task is None:
+					return
+
+				# another thread failed, skip the remaining tasks
+				if self.stopped.is_set():
+					continue
+
+				self.results.put(self.fetch(task, rate_limiter))
+
+		except Exception, e:
+			self.errors.append(e)
+			self.stopped.set()
+
+			# keep draining the tasks, so the producer does not block
+			while self.tasks.get() is not None:
+				pass
+
+
+	def run_writer(self, progress):
+
+		"""
+			Write the fetched items in batches until the result queue is closed
+		"""
+
+		batch, last = [], time.time()
+
+		try:
+			while True:
+
+				# a time out only checks if the batch has waited too long, no result has arrived
+				try:
+					items = self.results.get(timeout = self.flush_interval)
+					arrived = items is not None
+				except Empty:
+					items, arrived = [], False
+
+				if arrived:
+					batch.extend(items)
+					progress.update()
+
+				# write when the batch is full, when it has waited too long, or when all results are in
+				if len(batch) > 0 and (items is None or len(batch) >= self.batch_size or time.time() - last >= self.flush_interval):
+					self.write(batch)
+					batch, last = [], time.time()
+
+				if items is None:
+					return
+
+		except Exception, e:
+			self.errors.append(e)
+
+			# stop the fetch threads, there is no use in fetching what can not be written
+			self.stopped.set()
+
+			# keep draining the results, so the fetch threads do not block
+			while self.results.get() is not None:
+				pass
+
+
+	def run(self, tasks, total = None):
+
+		"""
+			Fetch all tasks and write the results
+
+			Parameters
+			----------
+			tasks : iterable
+				tasks for the fetch function, for example, chunks of tweet IDs
+			total : int (optional)
+				number of tasks, used to report the progress
+		"""
+
+		progress = ProgressReporter('hydrate', total = total)
+
+		workers = [threading.Thread(target = self.run_worker) for _ in range(self.num_workers)]
+		writer = threading.Thread(target = self.run_writer, args = (progress,))
+
+		for thread in workers + [writer]:
+			thread.daemon = True
+			thread.start()
+
+		# the bounded queue blocks the producer when the fetch threads are busy
+		for task in tasks:
+
+			if self.stopped.is_set():
+				break
+
+			self.tasks.put(task)
+
+		for _ in workers:
+			self.tasks.put(None)
+
+		for thread in workers:
+			thread.join()
+
+		# all results are in, stop the writer
+		self.results.put(None)
+		writer.join()
+
+		progress.finish()
+
+		if len(self.errors) > 0:
+			logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name, self.errors[0]))
+			exit(1)
+
+
+class CombinedRateLimiter:
+
+	def __init__(self, rate_limiters):
+
+		"""
+			Parameters
+			----------
+			rate_limiters : list of RateLimiter
+				rate limiters that all need to allow a call, for example, the limit of a fetch thread and the limit of the API key
+		"""
+
+		self.rate_limiters = rate_limiters
+
+
+	def wait(self):
+
+		for rate_limiter in self.rate_limiters:
+			rate_limiter.wait()
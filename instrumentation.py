@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Classes to report progress and to log without slowing down the processing
+		-	ProgressReporter logs the number of processed items, the throughput, and the estimated time remaining, at most once every few seconds
+		-	QueueHandler and QueueListener move the writing of log records (to file and console) to a background thread
+		-	SamplingFilter only lets through 1 in every n debug records of each logging statement
+"""
+
+# packages and modules
+import atexit
+import logging
+import os
+import threading
+import time
+from Queue import Queue
+
+
+class ProgressReporter:
+
+	def __init__(self, name, total = None, interval = 10):
+
+		"""
+			Parameters
+			----------
+			name : string
+				name of what is processed, used in the log messages
+			total : int (optional)
+				total number of items to process, count it once before processing (if None, only the throughput is reported)
+			interval : int (optional)
+				minimum number of seconds between two log messages
+		"""
+
+		self.name = name
+		self.total = total
+		self.interval = interval
+
+		# number of processed items
+		self.count = 0
+
+		# time of start and of the last log message
+		self.start = time.time()
+		self.last = self.start
+
+
+	def update(self, n = 1):
+
+		"""
+			Add n processed items and log the progress if the interval has passed
+		"""
+
+		self.count += n
+
+		if time.time() - self.last >= self.interval:
+			self.report()
+
+
+	def report(self):
+
+		"""
+			Log the number of processed items, the throughput, and the estimated time remaining
+		"""
+
+		self.last = time.time()
+
+		# items per second
+		elapsed = self.last - self.start
+		rate = self.count / elapsed if elapsed > 0 else 0.0
+
+		if self.total:
+			eta = (self.total - self.count) / rate if rate > 0 else float('inf')
+			logging.info('{}: {}/{} ({:.1f}%) {:.1f}/sec ETA {:.0f} sec'.format(self.name, self.count, self.total, 100.0 * self.count / self.total, rate, eta))
+		else:
+			logging.info('{}: {} {:.1f}/sec'.format(self.name, self.count, rate))
+
+
+	def finish(self):
+
+		"""
+			Log the final progress
+		"""
+
+		self.report()
+
+
+class SamplingFilter(logging.Filter):
+
+	def __init__(self, sample_every = 100):
+
+		"""
+			Parameters
+			----------
+			sample_every : int (optional)
+				only let through the first and then every n-th debug record of each logging statement (info records, such as the progress reports, warnings, and errors
+				are always let through)
+		"""
+
+		logging.Filter.__init__(self)
+
+		self.sample_every = sample_every
+
+		# number of records of each logging statement
+		self.counts = {}
+
+
+	def filter(self, record):
+
+		if record.levelno > logging.DEBUG or self.sample_every <= 1:
+			return True
+
+		# each logging statement (for example, the statement inside the loop of a script) is sampled separately
+		key = (record.pathname, record.lineno)
+
+		count = self.counts.get(key, 0)
+		self.counts[key] = count + 1
+
+		return count % self.sample_every == 0
+
+
+class QueueHandler(logging.Handler):
+
+	def __init__(self, queue, handlers):
+
+		"""
+			Parameters
+			----------
+			queue : Queue
+				queue that is read by the QueueListener
+			handlers : list of logging.Handler
+				handlers of the listener, used directly in child processes (the listener thread only runs in the process that created it)
+		"""
+
+		logging.Handler.__init__(self)
+
+		self.queue = queue
+		self.handlers = handlers
+
+		# process that created the handler
+		self.pid = os.getpid()
+
+
+	def emit(self, record):
+
+		try:
+
+			# handle the record directly in worker processes
+			if os.getpid() != self.pid:
+				for handler in self.handlers:
+					if record.levelno >= handler.level:
+						handler.handle(record)
+				return
+
+			# format the message now, so the arguments can not change before the listener handles the record
+			record.msg = record.getMessage()
+			record.args = None
+
+			self.queue.put_nowait(record)
+
+		except Exception:
+			self.handleError(record)
+
+
+class QueueListener:
+
+	def __init__(self, queue, handlers):
+
+		"""
+			Parameters
+			----------
+			queue : Queue
+				queue that is filled by the QueueHandler
+			handlers : list of logging.Handler
+				handlers that write the log records, for example, to file and console
+		"""
+
+		self.queue = queue
+		self.handlers = handlers
+
+		# background thread that handles the records
+		self.thread = threading.Thread(target = self.monitor)
+		self.thread.daemon = True
+
+
+	def start(self):
+
+		self.thread.start()
+
+		# handle the remaining records when the script ends
+		atexit.register(self.stop)
+
+
+	def monitor(self):
+
+		while True:
+
+			record = self.queue.get()
+
+			# None is used to stop the listener
+			if record is None:
+				return
+
+			for handler in self.handlers:
+				if record.levelno >= handler.level:
+					handler.handle(record)
+
+
+	def stop(self):
+
+		if self.thread.is_alive():
+			self.queue.put(None)
+			self.thread.join()
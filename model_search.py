@@ -0,0 +1,706 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that searches the hyper-parameters of several pipelines (a vectorizer followed by a classifier) with cross validation, like GridSearchCV, but vectorizes each
+	cross validation fold only once. GridSearchCV refits the vectorizer for every candidate, even though most candidates only change the parameters of the classifier.
+	Here, the vectorizer is fitted once per fold for each combination of vectorizer parameters, and the vectorized folds are reused by all candidates (of all
+	classifiers) with those parameters, so each candidate only fits the classifier.
+
+	The candidate fits of all classifiers are put in one queue that all processes take from, so a classifier with few or fast candidates does not leave processes
+	idle. The vectorized folds are saved once to a feature store (see feature_store.py) and memory-mapped, so the processes share them read-only instead of each
+	getting its own copy. The folds, and the vectorizer fitted on all data for the final pipelines, are keyed by the version of the training data and the vectorizer
+	parameters, so with a persistent feature store a next search on the same data loads them instead of vectorizing again.
+
+	Next to the exhaustive grid search, the candidates can be sampled at random, or searched with successive halving: all candidates are first fitted on a small part
+	of the training data of each fold, and only the best 1 / halving_factor of them (of each classifier) go to the next round with halving_factor times more data. The
+	search can be given a budget of fits or seconds, and it keeps track of the best score found after each batch of fits, so the searches can be compared per unit of
+	compute.
+
+	The path search fits the candidates of a linear classifier that only differ in C along the regularization path: on each fold, the candidates are fitted one after
+	the other from the smallest to the largest C, and each fit starts from the solution of the previous fit if the classifier can be warm started. The solutions for
+	neighbouring values of C are nearly the same, so a warm started fit only needs a few iterations. The path of a fold can stop when the score has not improved for a
+	number of values of C.
+
+	With a result cache (see result_cache.py), the score of each fit is saved as soon as the fit is done, and the fits that are in the cache are not fitted again, so a
+	search that crashed or that is extended with more candidates continues where it was.
+"""
+
+# packages and modules
+import logging
+import math
+import shutil
+import tempfile
+import time
+import numpy as np
+from itertools import izip_longest
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from sklearn.model_selection import StratifiedKFold, ParameterGrid, ParameterSampler
+from sklearn.metrics import get_scorer
+from sklearn.utils import safe_indexing
+from sklearn.externals.joblib import Parallel, delayed
+from feature_store import FeatureStore, get_corpus_version
+
+
+class ModelSearch:
+
+	def __init__(self, estimators, cv = 10, scoring = 'f1_weighted', n_jobs = 1, verbose = 0, search_mode = 'grid', n_candidates = None, max_fits = None,
+				max_seconds = None, halving_factor = 3, halving_min_samples = 1000, random_state = 42, feature_store = None, result_cache = None, path_params = {}, path_patience = None):
+
+		"""
+			Parameters
+			----------
+			estimators : dictionary
+				key = name of the classifier, value = (pipeline, parameter grid). The pipeline has the classifier as the last step, the steps before it (for example, a
+				vectorizer) are fitted once per fold. The parameter grid is as for GridSearchCV, for example, {'classify__C' : [0.1, 1.0], 'vectorizer__min_df' : [1, 2]}
+			cv : int (optional)
+				number of (stratified) cross validation folds
+			scoring : string (optional)
+				scoring function for cross validation, for instance, f1_weighted
+			n_jobs : int (optional)
+				number of parallel processes that vectorize the folds and fit the candidates
+			verbose : int (optional)
+				debug output of the parallel processes, 10 is most
+			search_mode : string (optional)
+				'grid' to fit all candidates of the grid (in the order of the grid), 'random' to fit the candidates in random order, 'halving' for successive halving, or
+				'path' to fit the candidates that only differ in C along the regularization path. The path search does not use the budget and the result cache
+			n_candidates : int (optional)
+				number of candidates of each classifier sampled at random from the grid for 'random' and 'halving', None for all candidates
+			max_fits : int (optional)
+				stop the search of each classifier after this many fits (one fit is one candidate on one fold), None for no limit
+			max_seconds : int (optional)
+				stop the search after this many seconds, None for no limit. The fits that have started are finished first
+			halving_factor : int (optional)
+				only the best 1 / halving_factor of the candidates go to the next round of successive halving, with halving_factor times more training data
+			halving_min_samples : int (optional)
+				number of training documents of each fold in the first round of successive halving
+			random_state : int (optional)
+				seed to sample the candidates
+			feature_store : FeatureStore (optional)
+				store to save the vectorized folds to and to load them from, by default a store in a temporary folder that is removed after the search
+			result_cache : ResultCache (optional)
+				cache to save the score of each fit to and to load the scores of earlier searches from, None to fit all candidates
+			path_params : dictionary (optional)
+				key = name of the classifier, value = parameters that replace the values of the grid in the path search, for example, a solver of LogisticRegression
+				that can be warm started ({'classify__solver' : 'lbfgs', 'classify__dual' : False})
+			path_patience : int (optional)
+				stop the path of a fold when the score has not improved for this many values of C, None to fit the whole path
+		"""
+
+		logging.info('Initialize {}'.format(self.__class__.__name__))
+
+		self.estimators = estimators
+		self.cv = cv
+		self.scoring = scoring
+		self.n_jobs = n_jobs
+		self.verbose = verbose
+		self.search_mode = search_mode
+		self.n_candidates = n_candidates
+		self.max_fits = max_fits
+		self.max_seconds = max_seconds
+		self.halving_factor = halving_factor
+		self.halving_min_samples = halving_min_samples
+		self.random_state = random_state
+		self.feature_store = feature_store
+		self.result_cache = result_cache
+		self.path_params = path_params
+		self.path_patience = path_patience
+
+
+	def get_candidates(self, name, param_grid):
+
+		"""
+			Return the parameters of the candidates of the parameter grid of a classifier, in the order they are fitted
+		"""
+
+		grid = ParameterGrid(param_grid)
+
+		if self.search_mode == 'grid':
+			return list(grid)
+
+		if self.search_mode == 'path':
+			return list(ParameterGrid(dict(param_grid, **{k : [v] for k, v in self.path_params.get(name, {}).items()})))
+
+		if self.search_mode in ['random', 'halving']:
+			return list(ParameterSampler(param_grid, n_iter = min(self.n_candidates or len(grid), len(grid)), random_state = self.random_state))
+
+		logging.error('Search mode {} not part of search modes'.format(self.search_mode))
+		exit(1)
+
+
+	def split_params(self, name, params):
+
+		"""
+			Split the parameters of a candidate into the parameters of the steps before the classifier and the parameters of the classifier (without the step name)
+		"""
+
+		prefix = self.estimators[name][0].steps[-1][0] + '__'
+
+		transform_params = {k : v for k, v in params.items() if not k.startswith(prefix)}
+		classifier_params = {k[len(prefix):] : v for k, v in params.items() if k.startswith(prefix)}
+
+		return transform_params, classifier_params
+
+
+	def get_transformer(self, name, params):
+
+		"""
+			Return the steps before the classifier with the parameters of a candidate as a pipeline, or None if the classifier is fitted on the raw data
+		"""
+
+		steps = self.estimators[name][0].steps[:-1]
+
+		if len(steps) == 0:
+			return None
+
+		return Pipeline([(step_name, clone(step)) for step_name, step in steps]).set_params(**self.split_params(name, params)[0])
+
+
+	def get_fold_key(self, name, params):
+
+		"""
+			Return the key of the vectorized folds of a candidate, candidates of any classifier with the same vectorizer and vectorizer parameters share the same folds
+		"""
+
+		return repr(self.get_transformer(name, params))
+
+
+	def get_fold_data(self, name, params):
+
+		"""
+			Return the keys of the vectorized folds of a candidate in the feature store, the folds that are not in the store are vectorized (in parallel) and saved
+			the first time they are needed
+
+			Returns
+			--------
+			fold_data : list of strings
+				key of each fold in the feature store, the entry has the items X_train, y_train, X_test, and y_test
+		"""
+
+		key = self.get_fold_key(name, params)
+
+		if key not in self.fold_data:
+
+			start = time.time()
+
+			keys = [self.store.get_key(self.version, 'fold', self.cv, f, key) for f in range(len(self.folds))]
+			missing = [f for f in range(len(self.folds)) if not self.store.exists(keys[f])]
+
+			Parallel(n_jobs = self.n_jobs, verbose = self.verbose)(delayed(vectorize_fold)(self.store, keys[f], self.get_transformer(name, params), self.X, self.y, self.folds[f][0], self.folds[f][1]) for f in missing)
+
+			# the processes load the memory-mapped arrays by their key, not a copy of the data
+			self.fold_data[key] = keys
+
+			logging.debug('Vectorized {} folds ({} loaded from the feature store) in {:.1f} sec'.format(len(missing), len(self.folds) - len(missing), time.time() - start))
+
+		return self.fold_data[key]
+
+
+	def get_refit_data(self, name, params):
+
+		"""
+			Return the key of the training data vectorized by the steps before the classifier fitted on all data, the data is vectorized and saved if it is not in
+			the feature store. The entry has the items X and y, and the fitted steps if there are steps before the classifier
+		"""
+
+		transformer = self.get_transformer(name, params)
+
+		key = self.store.get_key(self.version, 'all', repr(transformer))
+
+		if not self.store.exists(key):
+			vectorize_all(self.store, key, transformer, self.X, self.y)
+
+		return key
+
+
+	def get_result_key(self, name, i, f, n_samples = None):
+
+		"""
+			Return the key of the fit of a candidate on a fold in the result cache, a fingerprint of the training data, the folds, the scoring, the pipeline with the
+			parameters of the candidate, and the number of training documents
+		"""
+
+		return self.result_cache.get_key(self.version, self.cv, f, self.scoring, n_samples, name, repr(self.estimators[name][0]), repr(sorted(self.candidates[name][i].items())))
+
+
+	def get_cached_results(self, candidates, n_samples = None):
+
+		"""
+			Add the scores of the fits of the candidates that are in the result cache
+
+			Returns
+			--------
+			folds : dictionary
+				key = (name of the classifier, index of the candidate), value = folds that still need to be fitted
+		"""
+
+		folds = {(name, i) : range(len(self.folds)) for name, i in candidates}
+
+		if self.result_cache is None:
+			return folds
+
+		keys = {(name, i, f) : self.get_result_key(name, i, f, n_samples) for name, i in candidates for f in range(len(self.folds))}
+
+		cached = self.result_cache.get_many(keys.values())
+
+		for (name, i, f), key in keys.iteritems():
+
+			if key in cached:
+				self.scores.setdefault((name, i, n_samples), []).append(cached[key]['score'])
+				self.num_cached_fits_[name] += 1
+				folds[(name, i)].remove(f)
+
+		if len(cached) > 0:
+			logging.info('Loaded {} of {} fits from the result cache'.format(len(cached), len(keys)))
+
+		return folds
+
+
+	def get_remaining_fits(self, name):
+
+		"""
+			Return the number of fits of a classifier left within the budget
+		"""
+
+		if self.max_seconds is not None and time.time() - self.start >= self.max_seconds:
+			return 0
+
+		if self.max_fits is not None:
+			return max(self.max_fits - self.num_fits_[name], 0)
+
+		return float('inf')
+
+
+	def evaluate(self, candidates, n_samples = None):
+
+		"""
+			Fit the candidates on all folds. The fits of all classifiers are put in one queue, in batches if there is a budget so it can be checked in between
+
+			Parameters
+			----------
+			candidates : list of tuples
+				(name of the classifier, index of the candidate) of the candidates to fit
+			n_samples : int (optional)
+				number of training documents of each fold to fit on, None for all
+
+			Returns
+			--------
+			completed : Boolean
+				False if the budget ran out before all candidates were fitted
+		"""
+
+		# without a budget all fits go into the queue at once, so the processes never wait for a batch to finish
+		if self.max_fits is None and self.max_seconds is None:
+			batch_size = max(len(candidates), 1)
+		else:
+			batch_size = max(self.n_jobs if self.n_jobs > 0 else 1, 1) * 4
+
+		completed = True
+
+		# the fits of earlier searches are not fitted again, and do not count towards the budget
+		folds = self.get_cached_results(candidates, n_samples)
+		candidates = [x for x in candidates if len(folds[x]) > 0]
+
+		for start in range(0, len(candidates), batch_size):
+
+			# only fit the candidates that can be fitted on all folds within the budget of their classifier
+			batch, batch_fits = [], {}
+			for name, i in candidates[start:start + batch_size]:
+				if self.get_remaining_fits(name) >= batch_fits.get(name, 0) + len(folds[(name, i)]):
+					batch.append((name, i))
+					batch_fits[name] = batch_fits.get(name, 0) + len(folds[(name, i)])
+				else:
+					completed = False
+
+			if len(batch) == 0:
+				continue
+
+			tasks = [(name, i, f) for name, i in batch for f in folds[(name, i)]]
+
+			# the processes save the score of each fit to the result cache as soon as it is done
+			result_keys = {task : self.get_result_key(task[0], task[1], task[2], n_samples) if self.result_cache is not None else None for task in tasks}
+
+			# vectorize the folds that are needed before filling the queue
+			fold_data = {(name, i) : self.get_fold_data(name, self.candidates[name][i]) for name, i in batch}
+
+			results = Parallel(n_jobs = self.n_jobs, verbose = self.verbose)(delayed(fit_and_score)(self.estimators[name][0].steps[-1][1], self.split_params(name, self.candidates[name][i])[1], self.store, fold_data[(name, i)][f], self.scorer, n_samples, self.result_cache, result_keys[(name, i, f)], {'classifier' : name, 'params' : repr(self.candidates[name][i]), 'fold' : f, 'n_samples' : n_samples}) for name, i, f in tasks)
+
+			for (name, i, f), (score, fit_time) in zip(tasks, results):
+				self.scores.setdefault((name, i, n_samples), []).append(score)
+				self.fit_seconds_[name] += fit_time
+				self.num_fits_[name] += 1
+
+			self.log_progress(set([name for name, _ in batch]), n_samples)
+
+		return completed
+
+
+	def get_paths(self, name, candidates):
+
+		"""
+			Return the candidates of a classifier grouped by their parameters other than C, each group sorted from the smallest to the largest C. Without C in the
+			grid, each candidate is a path of its own
+		"""
+
+		key = self.estimators[name][0].steps[-1][0] + '__C'
+
+		paths = {}
+		for i in candidates:
+			paths.setdefault(repr(sorted([(k, v) for k, v in self.candidates[name][i].items() if k != key])), []).append(i)
+
+		return [sorted(path, key = lambda i: self.candidates[name][i].get(key)) for _, path in sorted(paths.items())]
+
+
+	def evaluate_path(self, candidates):
+
+		"""
+			Fit the candidates along the regularization path on all folds, the paths of all classifiers and folds are put in one queue
+
+			Parameters
+			----------
+			candidates : dictionary
+				key = name of the classifier, value = indexes of the candidates to fit
+		"""
+
+		tasks = [(name, path, f) for name in sorted(candidates) for path in self.get_paths(name, candidates[name]) for f in range(len(self.folds))]
+
+		# the candidates of a path only differ in C, so they share the vectorized folds
+		fold_data = {(name, path[0]) : self.get_fold_data(name, self.candidates[name][path[0]]) for name, path, _ in tasks}
+
+		results = Parallel(n_jobs = self.n_jobs, verbose = self.verbose)(delayed(fit_path)(self.estimators[name][0].steps[-1][1], [self.split_params(name, self.candidates[name][i])[1] for i in path], self.store, fold_data[(name, path[0])][f], self.scorer, self.path_patience) for name, path, f in tasks)
+
+		# a path that stopped early has no scores for the largest values of C of that fold
+		for (name, path, f), path_results in zip(tasks, results):
+			for i, (score, fit_time) in zip(path, path_results):
+				self.scores.setdefault((name, i, None), []).append(score)
+				self.fit_seconds_[name] += fit_time
+				self.num_fits_[name] += 1
+
+		self.log_progress(candidates.keys())
+
+
+	def get_queue(self, candidates):
+
+		"""
+			Return the candidates of all classifiers as one list, taking one candidate of each classifier in turn so all classifiers make progress within the budget
+		"""
+
+		queue = [[(name, i) for i in candidates[name]] for name in sorted(candidates)]
+
+		return [x for row in izip_longest(*queue) for x in row if x is not None]
+
+
+	def get_mean_scores(self, name, candidates, n_samples = None):
+
+		"""
+			Return the mean score over the folds of each candidate of a classifier that has been fitted on all folds with n_samples training documents
+		"""
+
+		return {i : np.mean(self.scores[(name, i, n_samples)]) for i in candidates if len(self.scores.get((name, i, n_samples), [])) == len(self.folds)}
+
+
+	def log_progress(self, names, n_samples = None):
+
+		"""
+			Keep track of the best candidate of each classifier found so far and the compute spent to find it
+		"""
+
+		for name in sorted(names):
+
+			scores = self.get_mean_scores(name, range(len(self.candidates[name])), n_samples)
+
+			if len(scores) == 0:
+				continue
+
+			best = max(scores, key = scores.get)
+
+			self.search_log_.append({	'classifier' : name,
+										'num_fits' : self.num_fits_[name],
+										'fit_seconds' : self.fit_seconds_[name],
+										'search_seconds' : time.time() - self.start,
+										'n_samples' : n_samples,
+										'best_score' : scores[best],
+										'best_params' : self.candidates[name][best]})
+
+			logging.info('{}: {} fits, {:.1f} sec: best score {:.4f} with {}'.format(name, self.num_fits_[name], time.time() - self.start, scores[best], self.candidates[name][best]))
+
+
+	def fit(self, X, y):
+
+		"""
+			Score the candidates of all classifiers on all folds, and refit the pipeline of each classifier with its best parameters on all data
+
+			Parameters
+			----------
+			X : list
+				training documents, for example, the preprocessed tweet texts
+			y : list
+				class label of each document
+		"""
+
+		self.X, self.y = X, np.asarray(y)
+
+		# version of the training data, part of the keys of the vectorized data in the feature store
+		self.version = get_corpus_version(self.X, self.y)
+
+		self.start = time.time()
+		self.num_fits_ = {name : 0 for name in self.estimators}
+		self.fit_seconds_ = {name : 0.0 for name in self.estimators}
+		self.num_cached_fits_ = {name : 0 for name in self.estimators}
+		self.search_log_ = []
+
+		self.folds = list(StratifiedKFold(n_splits = self.cv).split(np.zeros(len(self.y)), self.y))
+		self.candidates = {name : self.get_candidates(name, param_grid) for name, (_, param_grid) in self.estimators.iteritems()}
+		self.scorer = get_scorer(self.scoring)
+
+		# store of the vectorized folds
+		self.store = self.feature_store or FeatureStore(tempfile.mkdtemp(prefix = 'model_search_'))
+
+		# key = vectorizer with its parameters, value = keys of the vectorized folds in the store
+		self.fold_data = {}
+		# key = (classifier, candidate, number of training documents), value = score of each fold
+		self.scores = {}
+
+		logging.info('Searching {} candidates of {} classifiers on {} folds ({} search)'.format(sum([len(x) for x in self.candidates.values()]), len(self.estimators), len(self.folds), self.search_mode))
+
+		try:
+
+			candidates = {name : range(len(self.candidates[name])) for name in self.estimators}
+			n_samples = None
+
+			# candidates and number of training documents of each round that has been (partly) fitted
+			rounds = []
+
+			if self.search_mode == 'halving':
+
+				# number of training documents of each round, the last round uses all training documents of the folds
+				max_samples = min([len(train) for train, _ in self.folds])
+				max_candidates = max([len(x) for x in candidates.values()])
+				num_rounds = 1 + int(min(math.log(max(max_candidates, 1), self.halving_factor), math.log(max(max_samples / float(self.halving_min_samples), 1), self.halving_factor)))
+
+				for r in range(num_rounds - 1):
+
+					n_samples = int(max_samples / self.halving_factor ** (num_rounds - 1 - r))
+
+					logging.info('Round {} of {}: {} candidates on {} training documents'.format(r + 1, num_rounds, sum([len(x) for x in candidates.values()]), n_samples))
+
+					completed = self.evaluate(self.get_queue(candidates), n_samples)
+					rounds.append((candidates, n_samples))
+
+					if not completed:
+						break
+
+					# keep the best candidates of each classifier for the next round
+					scores = {name : self.get_mean_scores(name, candidates[name], n_samples) for name in candidates}
+					candidates = {name : sorted(scores[name], key = scores[name].get, reverse = True)[:int(math.ceil(len(scores[name]) / float(self.halving_factor)))] for name in scores}
+					n_samples = None
+
+			if self.search_mode == 'path':
+				logging.info('Fitting {} candidates along the regularization path'.format(sum([len(x) for x in candidates.values()])))
+				self.evaluate_path(candidates)
+				rounds.append((candidates, None))
+
+			elif n_samples is None:
+				logging.info('Fitting {} candidates on all training documents'.format(sum([len(x) for x in candidates.values()])))
+				self.evaluate(self.get_queue(candidates))
+				rounds.append((candidates, None))
+
+			self.cv_results_, self.best_params_, self.best_score_ = {}, {}, {}
+
+			for name in self.estimators:
+
+				# the candidates of the last round with at least one candidate fitted on all folds
+				scores = {}
+				for round_candidates, round_samples in reversed(rounds):
+					scores = self.get_mean_scores(name, round_candidates[name], round_samples)
+					if len(scores) > 0:
+						break
+
+				if len(scores) == 0:
+					logging.error('No candidate of {} could be fitted within the budget'.format(name))
+					exit(1)
+
+				fitted = sorted(scores)
+
+				self.cv_results_[name] = {	'params' : [self.candidates[name][i] for i in fitted],
+											'mean_test_score' : np.array([scores[i] for i in fitted])}
+
+				best = max(scores, key = scores.get)
+
+				self.best_params_[name] = self.candidates[name][best]
+				self.best_score_[name] = scores[best]
+
+				logging.info('{}: best score {:.4f} after {} fits ({:.1f} sec fitting)'.format(name, self.best_score_[name], self.num_fits_[name], self.fit_seconds_[name]))
+
+			# refit the classifier of each classifier with its best parameters on all data, classifiers with the same vectorizer parameters share the fitted vectorizer
+			names = sorted(self.estimators)
+			refit_data = {name : self.get_refit_data(name, self.best_params_[name]) for name in names}
+			self.best_estimator_ = dict(zip(names, Parallel(n_jobs = self.n_jobs, verbose = self.verbose)(delayed(refit)(self.estimators[name][0].steps[-1], self.split_params(name, self.best_params_[name])[1], self.store, refit_data[name]) for name in names)))
+
+			logging.info('Finished search in {:.1f} sec'.format(time.time() - self.start))
+
+		finally:
+
+			# do not keep the data in the saved search
+			del self.X, self.y, self.fold_data, self.folds
+
+			if self.feature_store is None:
+				shutil.rmtree(self.store.folder, ignore_errors = True)
+
+			del self.store
+
+		return self
+
+
+def vectorize(transformer, X, y):
+
+	"""
+		Fit the transformer and transform the documents, the documents are returned as they are if the transformer is None
+	"""
+
+	if transformer is None:
+		return X
+
+	X = transformer.fit_transform(X, y)
+
+	# sort the indices of sparse matrices now, the memory-mapped matrices are read-only so classifiers can not sort them in place
+	if hasattr(X, 'sum_duplicates'):
+		X.sum_duplicates()
+
+	# the terms that were removed by min_df and max_df are only kept for inspection, and can be more than the vocabulary
+	for _, step in transformer.steps:
+		if hasattr(step, 'stop_words_'):
+			step.stop_words_ = None
+
+	return X
+
+
+def vectorize_fold(store, key, transformer, X, y, train, test):
+
+	"""
+		Fit a clone of the transformer on the training part of a fold, transform both parts, and save them to the feature store. The classifier is fitted on the
+		raw data if the transformer is None
+	"""
+
+	X_train, X_test, y_train, y_test = safe_indexing(X, train), safe_indexing(X, test), y[train], y[test]
+
+	if transformer is not None:
+		transformer = clone(transformer)
+		X_train = vectorize(transformer, X_train, y_train)
+		X_test = transformer.transform(X_test)
+
+		if hasattr(X_test, 'sum_duplicates'):
+			X_test.sum_duplicates()
+
+	store.save(key, {'X_train' : X_train, 'y_train' : y_train, 'X_test' : X_test, 'y_test' : y_test})
+
+
+def vectorize_all(store, key, transformer, X, y):
+
+	"""
+		Fit a clone of the transformer on all documents and save the transformed documents, and the fitted transformer with its vocabulary, to the feature store
+	"""
+
+	items = {'y' : y}
+
+	if transformer is not None:
+		items['transformer'] = clone(transformer)
+
+	items['X'] = vectorize(items.get('transformer'), X, y)
+
+	store.save(key, items)
+
+
+def fit_and_score(classifier, params, store, key, scorer, n_samples = None, result_cache = None, result_key = None, result_fields = {}):
+
+	"""
+		Fit a clone of the classifier with the parameters on the training part of a vectorized fold (only the first n_samples documents if given), and return the
+		score on the test part and the fit time. The score is saved to the result cache if it is given, with the fields to look it up
+	"""
+
+	fold_data = store.load(key)
+
+	X_train, y_train, X_test, y_test = fold_data['X_train'], fold_data['y_train'], fold_data['X_test'], fold_data['y_test']
+
+	if n_samples is not None:
+		X_train, y_train = X_train[:n_samples], y_train[:n_samples]
+
+	classifier = clone(classifier).set_params(**params)
+
+	start = time.time()
+
+	classifier.fit(X_train, y_train)
+
+	fit_time = time.time() - start
+
+	score = scorer(classifier, X_test, y_test)
+
+	if result_cache is not None:
+		result_cache.set(result_key, dict(result_fields, score = float(score), fit_time = fit_time))
+
+	return score, fit_time
+
+
+def fit_path(classifier, path, store, key, scorer, patience = None):
+
+	"""
+		Fit a clone of the classifier with the parameters of each candidate of a path in turn on a vectorized fold, and return the score on the test part and the fit
+		time of each fit. Each fit starts from the solution of the previous fit if the classifier can be warm started, the path stops when the score has not improved
+		for patience fits
+	"""
+
+	fold_data = store.load(key)
+
+	X_train, y_train, X_test, y_test = fold_data['X_train'], fold_data['y_train'], fold_data['X_test'], fold_data['y_test']
+
+	classifier = clone(classifier)
+
+	# liblinear (LinearSVC, and LogisticRegression with solver liblinear) ignores warm_start and fits each C from scratch
+	if 'warm_start' in classifier.get_params():
+		classifier.set_params(warm_start = True)
+
+	results, best_score, num_worse = [], None, 0
+
+	for params in path:
+
+		classifier.set_params(**params)
+
+		start = time.time()
+
+		classifier.fit(X_train, y_train)
+
+		fit_time = time.time() - start
+
+		score = scorer(classifier, X_test, y_test)
+
+		results.append((score, fit_time))
+
+		if best_score is None or score > best_score:
+			best_score, num_worse = score, 0
+		else:
+			num_worse += 1
+
+		if patience is not None and num_worse >= patience:
+			break
+
+	return results
+
+
+def refit(step, params, store, key):
+
+	"""
+		Fit a clone of the classifier step with the parameters on all vectorized data, and return it as a pipeline with the fitted steps before it
+	"""
+
+	data = store.load(key)
+
+	step_name, classifier = step
+
+	classifier = clone(classifier).set_params(**params).fit(data['X'], data['y'])
+
+	steps = data['transformer'].steps if 'transformer' in data else []
+
+	return Pipeline(steps + [(step_name, classifier)])
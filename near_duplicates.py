@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that finds near-duplicate tweets by using MinHash signatures and locality sensitive hashing (LSH). The signatures are split into bands and each band is
+	hashed into a bucket; tweets that share a bucket are candidates and are compared by their estimated Jaccard similarity. The buckets and signatures are stored
+	in the database, so the index persists across runs and does not grow the memory of the process. The signatures are stored by a fingerprint of the text, so an
+	identical text is always found, also when the buckets it falls in are represented by other texts.
+"""
+
+# packages and modules
+import hashlib
+import logging
+import sys
+import zlib
+import numpy as np
+from database import MongoDatabase
+
+# parameters of the hash functions (same as the datasketch package)
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class NearDuplicateIndex:
+
+	def __init__(self, threshold = 0.8, num_perm = 128, shingle_size = 2, collection = 'near_duplicate_index', seed = 1):
+
+		"""
+			Parameters
+			----------
+			threshold : float (optional)
+				minimum (estimated) Jaccard similarity of the shingles of two tweets to be considered duplicates, 1.0 only removes identical tweets
+			num_perm : int (optional)
+				number of hash functions (permutations) of the MinHash signature, more gives a better estimate of the similarity
+			shingle_size : int (optional)
+				number of consecutive words in a shingle
+			collection : string (optional)
+				name of the collection to store the buckets to, the signatures are stored in collection + '_signatures'. Drop both collections when the tweets are processed from scratch
+			seed : int (optional)
+				seed of the hash functions, needs to be the same across runs
+		"""
+
+		logging.info('Initialize {}'.format(self.__class__.__name__))
+
+		self.threshold = threshold
+		self.num_perm = num_perm
+		self.shingle_size = shingle_size
+
+		# number of bands and number of rows (hash values) per band
+		self.bands, self.rows = self.get_optimal_bands(threshold, num_perm)
+
+		logging.debug('LSH with {} bands of {} rows'.format(self.bands, self.rows))
+
+		# parameters of the hash functions
+		generator = np.random.RandomState(seed)
+		self.a = generator.randint(1, MERSENNE_PRIME, size = num_perm, dtype = np.uint64)
+		self.b = generator.randint(0, MERSENNE_PRIME, size = num_perm, dtype = np.uint64)
+
+		# database collections for the buckets and the signatures
+		self.bucket_collection = collection
+		self.signature_collection = collection + '_signatures'
+
+		# texts that are found to be new but are not saved to the database yet (see save), key = signature ID, value = (signature, keys of the buckets it represents)
+		self.pending = {}
+		self.pending_buckets = {}
+
+		# create database connection
+		self.db = MongoDatabase()
+
+
+	def get_optimal_bands(self, threshold, num_perm):
+
+		"""
+			Return the number of bands and rows that minimize the sum of the false positive and false negative probability for the threshold
+
+			Returns
+			--------
+			bands : int
+			rows : int
+		"""
+
+		best, best_error = (num_perm, 1), float('inf')
+
+		# similarities below and above the threshold
+		below = np.linspace(0.0, threshold, 100)
+		above = np.linspace(threshold, 1.0, 100)
+
+		for bands in range(1, num_perm + 1):
+
+			rows = num_perm // bands
+
+			# probability that two tweets with similarity s share at least one bucket
+			false_positive = np.trapz(1.0 - (1.0 - below ** rows) ** bands, below)
+			false_negative = np.trapz((1.0 - above ** rows) ** bands, above)
+
+			if false_positive + false_negative < best_error:
+				best, best_error = (bands, rows), false_positive + false_negative
+
+		return best
+
+
+	def get_shingles(self, text):
+
+		"""
+			Return the set of shingles (consecutive words) of a text, a text with fewer words than the shingle size is a single shingle
+		"""
+
+		tokens = text.split()
+
+		if len(tokens) <= self.shingle_size:
+			return set([' '.join(tokens)])
+
+		return set([' '.join(tokens[i:i + self.shingle_size]) for i in range(len(tokens) - self.shingle_size + 1)])
+
+
+	def get_signature(self, text):
+
+		"""
+			Return the MinHash signature of a text
+
+			Returns
+			--------
+			signature : np.array(num_perm)
+				minimum hash value of the shingles for each hash function
+		"""
+
+		# hash the utf-8 encoded text
+		if isinstance(text, unicode):
+			text = text.encode('utf-8')
+
+		# 32 bit hash of each shingle
+		hash_values = np.array([zlib.crc32(s) & 0xffffffff for s in self.get_shingles(text)], dtype = np.uint64)
+
+		# apply each hash function to each shingle (overflow is intended) and take the minimum
+		with np.errstate(over = 'ignore'):
+			permuted = np.bitwise_and((np.outer(hash_values, self.a) + self.b) % MERSENNE_PRIME, MAX_HASH)
+
+		return permuted.min(axis = 0)
+
+
+	def get_bucket_keys(self, signature, group):
+
+		"""
+			Return the key of the bucket of each band of the signature. Tweets of different groups (for example, tweet types) never share a bucket
+		"""
+
+		return ['{}:{}:{}'.format(group, i, hashlib.sha1(signature[i * self.rows:(i + 1) * self.rows].tobytes()).hexdigest()) for i in range(self.bands)]
+
+
+	def get_signature_id(self, text, group):
+
+		"""
+			Return the ID of the signature of a text, a fingerprint of the group and the text
+		"""
+
+		return hashlib.sha1('{}:{}'.format(group, text.encode('utf-8') if isinstance(text, unicode) else text)).hexdigest()
+
+
+	def find_new(self, texts, groups):
+
+		"""
+			Check which texts are not a near duplicate of a text in the index or of an earlier text in the list. The new texts are only added to the index in memory,
+			call save() once the tweets of the texts are saved, so a crash before that does not leave texts in the index whose tweets were never saved
+
+			Parameters
+			----------
+			texts : list of strings
+				(preprocessed) texts of the tweets
+			groups : list of strings
+				group of each text, for example, the tweet type. Only texts within the same group can be duplicates
+
+			Returns
+			--------
+			is_new : list of Booleans
+				True if the text is not a near duplicate
+		"""
+
+		try:
+
+			# signature, signature ID, and bucket keys of each text
+			signatures = [self.get_signature(text) for text in texts]
+			signature_ids = [self.get_signature_id(text, group) for text, group in zip(texts, groups)]
+			bucket_keys = [self.get_bucket_keys(signature, group) for signature, group in zip(signatures, groups)]
+
+			# texts that are already in the index (saved or pending) as they are. A bucket only keeps the first signature that claims it, so an identical text is not
+			# always found through the buckets
+			exact = set([signature_id for signature_id in signature_ids if signature_id in self.pending])
+			exact.update([d['_id'] for d in self.db.find_in_collection(collection = self.signature_collection, query = {'_id' : {'$in' : list(set(signature_ids) - exact)}}, projection = {'_id' : True})])
+
+			# buckets that are already in the index (saved or pending), and the signature that represents them
+			all_keys = list(set([key for keys in bucket_keys for key in keys]))
+			buckets = {key : self.pending_buckets[key] for key in all_keys if key in self.pending_buckets}
+			buckets.update({d['_id'] : d['signature_id'] for d in self.db.find_in_collection(collection = self.bucket_collection, query = {'_id' : {'$in' : all_keys}})})
+
+			# signatures of the candidates
+			stored = {signature_id : self.pending[signature_id][0] for signature_id in set(buckets.values()) if signature_id in self.pending}
+			stored.update({d['_id'] : np.array(d['signature'], dtype = np.uint64) for d in self.db.find_in_collection(collection = self.signature_collection, query = {'_id' : {'$in' : list(set(buckets.values()) - set(stored))}})})
+
+			is_new = []
+
+			for signature_id, signature, keys in zip(signature_ids, signatures, bucket_keys):
+
+				# identical texts are duplicates, otherwise candidates share at least one bucket, and duplicates have an estimated similarity above the threshold
+				candidates = set([buckets[key] for key in keys if key in buckets])
+				duplicate = signature_id in exact or any([np.mean(stored[c] == signature) >= self.threshold for c in candidates])
+
+				is_new.append(not duplicate)
+
+				if duplicate:
+					continue
+
+				# add the text to the index, it represents the buckets that are new
+				exact.add(signature_id)
+				stored[signature_id] = signature
+				new_keys = [key for key in keys if key not in buckets]
+
+				for key in new_keys:
+					buckets[key] = signature_id
+					self.pending_buckets[key] = signature_id
+
+				self.pending[signature_id] = (signature, new_keys)
+
+			return is_new
+
+		except Exception, e:
+			logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+
+	def save(self, texts, groups):
+
+		"""
+			Save the texts that were found to be new by find_new() to the database, call this after their tweets are saved
+
+			Parameters
+			----------
+			texts : list of strings
+				(preprocessed) texts of the saved tweets
+			groups : list of strings
+				group of each text
+		"""
+
+		try:
+
+			new_signatures, new_buckets = [], []
+
+			for text, group in zip(texts, groups):
+
+				signature_id = self.get_signature_id(text, group)
+
+				if signature_id not in self.pending:
+					continue
+
+				signature, keys = self.pending.pop(signature_id)
+
+				new_signatures.append({'_id' : signature_id, 'signature' : [int(x) for x in signature]})
+
+				for key in keys:
+					del self.pending_buckets[key]
+					new_buckets.append({'_id' : key, 'signature_id' : signature_id})
+
+			# the signatures first, so a saved bucket always has its signature
+			self.db.upsert_many_to_collection(collection = self.signature_collection, docs = new_signatures)
+			self.db.upsert_many_to_collection(collection = self.bucket_collection, docs = new_buckets)
+
+		except Exception, e:
+			logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+
+	def drop(self):
+
+		"""
+			Remove the index from the database, for example, before it is built again from the tweets after their texts were preprocessed again
+		"""
+
+		self.db.drop_collection(collection = self.bucket_collection)
+		self.db.drop_collection(collection = self.signature_collection)
+
+		self.pending, self.pending_buckets = {}, {}
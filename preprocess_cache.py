@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that caches the preprocessed text of tweets in the database, so the same raw text is only cleaned and lemmatized once (also across steps 3 and 5 and across runs)
+"""
+
+# packages and modules
+import hashlib
+import logging
+import sys
+from database import MongoDatabase
+
+
+class PreprocessCache:
+
+	def __init__(self, version, collection = 'preprocess_cache'):
+
+		"""
+			Parameters
+			----------
+			version : string
+				fingerprint of the preprocessing pipeline, see get_preprocess_version(). Cached texts that were created with another version are ignored and
+				overwritten once they are preprocessed again
+			collection : string (optional)
+				name of the collection to store the cached texts to
+		"""
+
+		logging.info('Initialize {}'.format(self.__class__.__name__))
+
+		# set version
+		self.version = version
+
+		# set collection
+		self.collection = collection
+
+		# create database connection (each process needs its own connection)
+		self.db = MongoDatabase()
+
+
+	def get_key(self, raw_text):
+
+		"""
+			Return the hash of the raw tweet text, this is used as the _id of the cached document
+		"""
+
+		return hashlib.sha1(raw_text.encode('utf-8')).hexdigest()
+
+
+	def get_many(self, raw_texts):
+
+		"""
+			Read the cached preprocessed texts
+
+			Parameters
+			----------
+			raw_texts : list of strings
+				original tweet texts
+
+			Returns
+			--------
+			cached : dictionary
+				key = raw text, value = preprocessed text; only contains the raw texts that were cached with the current version
+		"""
+
+		try:
+
+			# hash of each raw text
+			keys = {self.get_key(raw_text) : raw_text for raw_text in raw_texts}
+
+			# read the cached texts that were created with the current version of the preprocessing
+			D = self.db.find_in_collection(collection = self.collection, query = {'_id' : {'$in' : keys.keys()}, 'version' : self.version}, projection = {'text' : True})
+
+			# the database returns unicode, the preprocessing returns utf-8 encoded text
+			return {keys[d['_id']] : d['text'].encode('utf-8') for d in D}
+
+		except Exception, e:
+			logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+
+	def set_many(self, texts):
+
+		"""
+			Save preprocessed texts to the cache
+
+			Parameters
+			----------
+			texts : dictionary
+				key = raw text, value = preprocessed text
+		"""
+
+		self.db.upsert_many_to_collection(collection = self.collection, docs = [{'_id' : self.get_key(raw_text), 'version' : self.version, 'text' : text} for raw_text, text in texts.iteritems()])
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that limits the number of calls to an API within a time window, shared by all threads that call the API. The Twitter API allows a fixed number of calls
+	per 15 minutes (for example, 900 calls to statuses/show); waiting before a call is cheaper than running into the limit and waiting for the full window.
+"""
+
+# packages and modules
+import logging
+import threading
+import time
+from collections import deque
+
+
+class RateLimiter:
+
+	def __init__(self, max_calls = 900, period = 900):
+
+		"""
+			Parameters
+			----------
+			max_calls : int (optional)
+				maximum number of calls within the period
+			period : int (optional)
+				length of the time window in seconds
+		"""
+
+		logging.info('Initialize {}: {} calls per {} seconds'.format(self.__class__.__name__, max_calls, period))
+
+		self.max_calls = max_calls
+		self.period = period
+
+		# times of the calls within the current window
+		self.calls = deque()
+
+		# total number of calls
+		self.num_calls = 0
+
+		# only one thread at a time can claim a call
+		self.lock = threading.Lock()
+
+
+	def wait(self):
+
+		"""
+			Wait until a call is allowed and claim it
+		"""
+
+		with self.lock:
+
+			while True:
+
+				now = time.time()
+
+				# forget the calls that are outside of the window
+				while self.calls and now - self.calls[0] >= self.period:
+					self.calls.popleft()
+
+				if len(self.calls) < self.max_calls:
+					break
+
+				# wait until the oldest call leaves the window
+				time.sleep(self.period - (now - self.calls[0]))
+
+			self.calls.append(now)
+			self.num_calls += 1
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Reprocess the documents of a preprocessed collection (target_tweets or training_tweets) that were created with an older version of the preprocessing. Each
+	preprocessed document is stamped with the version of the preprocessing as 'pipeline_version', so after changing the cleaning functions or the spaCy model, only
+	the outdated documents are preprocessed again and updated in place. The near-duplicate index of the collection is built from the preprocessed texts, so it is built
+	again from the updated collection.
+"""
+
+# packages and modules
+from helper_functions import *
+from stream_pipeline import StreamPipeline, Source, BatchTransform, Sink
+
+
+def reprocess_collection(db, collection, batch_size = 1000, num_workers = 1, use_preprocess_cache = True, near_duplicate_index = None):
+
+	"""
+		Preprocess the raw text of all documents that do not have the current pipeline version, and update their text and pipeline version. If documents are updated,
+		the near-duplicate index is dropped first and built again afterwards from the texts of all documents of the collection (in the order they were inserted), so
+		new tweets are compared with the signatures of the current texts. An empty index is also built again, for example, after a run that was interrupted. If the
+		rebuild itself is interrupted, drop the index (NearDuplicateIndex.drop) and run again. Documents are not removed, also not when they are duplicates of each
+		other with the new preprocessing
+
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		collection : string
+			name of the preprocessed collection, the documents need to have the original tweet text as 'raw_text'
+		batch_size : int (optional)
+			number of documents that are preprocessed and updated at once
+		num_workers : int (optional)
+			number of worker processes, see map_chunks()
+		use_preprocess_cache : Boolean (optional)
+			read and write the preprocessed texts through the preprocess cache
+		near_duplicate_index : NearDuplicateIndex (optional)
+			index of the near-duplicate tweets of the collection (the documents need to have a 'tweet_type'), None if the collection has no index
+	"""
+
+	logging.info('Called function: {} '.format(sys._getframe().f_code.co_name))
+
+	# the current version of the preprocessing
+	version = get_preprocess_version(setup_spacy())
+
+	logging.info('Current preprocessing version: {}'.format(version))
+
+	# index so the outdated documents can be found without reading the whole collection
+	db.create_index(collection = collection, keys = [('pipeline_version', 1)])
+
+	# number of outdated documents
+	query = {'pipeline_version' : {'$ne' : version}}
+	num_outdated = db.count_collection(collection = collection, query = query)
+
+	if num_outdated > 0 and near_duplicate_index is not None:
+
+		# the signatures of the old texts are removed before the texts are updated, so an interrupted run builds the index again on the next run
+		near_duplicate_index.drop()
+
+	# preprocess the outdated documents and update them in place
+	StreamPipeline(name = 'reprocess {}'.format(collection), stages = [
+		Source('read outdated documents', lambda: db.find_in_collection(collection = collection, query = query, projection = {'raw_text' : True}), total = num_outdated),
+		BatchTransform('preprocess text', preprocess_docs, batch_size = batch_size, num_workers = num_workers, initializer = init_preprocess_worker, initargs = (use_preprocess_cache,)),
+		Sink('update documents', lambda docs: db.update_many_to_collection(collection = collection, docs = docs, fields = ['text', 'pipeline_version']), batch_size = batch_size),
+	]).run()
+
+	if near_duplicate_index is not None and db.count_collection(collection = near_duplicate_index.signature_collection) == 0:
+
+		# build the index from the current texts
+		StreamPipeline(name = 'rebuild near-duplicate index of {}'.format(collection), stages = [
+			Source('read documents', lambda: db.find_in_collection(collection = collection, query = {}, projection = {'text' : True, 'tweet_type' : True}), total = db.count_collection(collection = collection)),
+			Sink('index texts', lambda docs: add_to_index(near_duplicate_index, docs), batch_size = batch_size),
+		]).run()
+
+
+def add_to_index(near_duplicate_index, docs):
+
+	"""
+		Add the texts of documents that are already saved to the near-duplicate index, a text that is a near duplicate of an indexed text is not added
+	"""
+
+	texts, groups = [d['text'] for d in docs], [d['tweet_type'] for d in docs]
+
+	near_duplicate_index.find_new(texts = texts, groups = groups)
+	near_duplicate_index.save(texts = texts, groups = groups)
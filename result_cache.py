@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that caches the scores of the hyper-parameter search in the database. Each fit of a candidate on a cross validation fold is saved as soon as it is done,
+	keyed by a fingerprint of the training data, the fold, the pipeline with the parameters of the candidate, and the scoring. A search that crashed, or that is run
+	again with more candidates (for example, one more value of C), only fits the candidates and folds that are not in the cache.
+"""
+
+# packages and modules
+import hashlib
+import logging
+import sys
+from database import MongoDatabase
+
+
+class ResultCache:
+
+	def __init__(self, collection = 'model_search_results'):
+
+		"""
+			Parameters
+			----------
+			collection : string (optional)
+				name of the collection to store the scores to
+		"""
+
+		logging.info('Initialize {}'.format(self.__class__.__name__))
+
+		# set collection
+		self.collection = collection
+
+		# the database connection is created when it is first used, so the cache can be given to other processes (each process needs its own connection)
+		self.db = None
+
+
+	def __getstate__(self):
+
+		# the database connection can not be copied to another process
+		state = self.__dict__.copy()
+		state['db'] = None
+
+		return state
+
+
+	def get_db(self):
+
+		if self.db is None:
+			self.db = MongoDatabase()
+
+		return self.db
+
+
+	def get_key(self, *parts):
+
+		"""
+			Return the key of a fit, a fingerprint of the parts, this is used as the _id of the cached document
+		"""
+
+		return hashlib.sha1('\x00'.join([str(x) for x in parts])).hexdigest()
+
+
+	def get_many(self, keys):
+
+		"""
+			Read the cached scores
+
+			Parameters
+			----------
+			keys : list of strings
+				keys of the fits
+
+			Returns
+			--------
+			cached : dictionary
+				key = key of the fit, value = document with the score and the fit time; only contains the fits that are cached
+		"""
+
+		try:
+
+			cached = {}
+
+			# read in chunks, so the query stays small
+			for i in range(0, len(keys), 10000):
+				for d in self.get_db().find_in_collection(collection = self.collection, query = {'_id' : {'$in' : keys[i:i + 10000]}}, projection = {'score' : True, 'fit_time' : True}):
+					cached[d['_id']] = d
+
+			return cached
+
+		except Exception, e:
+			logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+			exit(1)
+
+
+	def set(self, key, doc):
+
+		"""
+			Save the score of a fit to the cache
+
+			Parameters
+			----------
+			key : string
+				key of the fit
+			doc : dictionary
+				score and fit time of the fit, and fields to look it up, for example, the classifier and the parameters
+		"""
+
+		doc['_id'] = key
+
+		self.get_db().upsert_many_to_collection(collection = self.collection, docs = [doc])
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Export and Import Corpus Snapshots
+	----------------------------------
+
+	Retrieving the training tweets from the Twitter API (step 4) can take weeks, and some tweets are not available anymore. This script exports the collections of the
+	workflow to a snapshot folder, so the database can be rebuilt on another machine without the Twitter API. Each collection is written to compressed Parquet files
+	of part_size documents. A document is stored as its BSON encoding next to its _id, so nested and schemaless documents are restored exactly, including ObjectIds,
+	dates, and the types of the numbers. A manifest (manifest.json) lists the number of documents and the SHA-256 checksum of each file.
+
+	The import checks the checksums of all files of a collection before it inserts the documents in bulk. A collection that already has documents is skipped, unless
+	drop_collections = True. The saved tweet trackers (files/trackers) of an imported collection are removed, so they are built again from the imported documents.
+
+	### What do the switches do
+
+	*	export_snapshot = [True|False]
+		-	write the collections to the snapshot folder, an earlier export of the same collections is replaced
+	*	import_snapshot = [True|False]
+		-	read the collections of the manifest in the snapshot folder into the database
+
+	### Settings
+
+	*	snapshot_folder = os.path.join('files', 'snapshots')
+		-	folder with the manifest and a subfolder with the Parquet files of each collection
+	*	snapshot_collections = ['sanders_tweets_raw', ... , 'target_tweets', 'near_duplicate_index', 'near_duplicate_index_signatures', 'preprocess_cache']
+		-	collections to export, other collections (for example, 'raw_tweets' or 'filtered_tweets') can be added. The near-duplicate index (both collections) belongs
+			to target_tweets, without it step 3 does not find the duplicates of the imported target tweets. The preprocess cache can be left out, it is filled again by
+			steps 3 and 5 (the texts are then preprocessed again)
+	*	part_size = 10000
+		-	number of documents in each Parquet file, and the number of documents inserted at once during the import
+	*	compression = 'snappy'
+		-	compression of the Parquet files, for example, 'snappy', 'gzip', or 'zstd'
+	*	drop_collections = False
+		-	replace collections that already have documents when importing
+
+	How to run:
+	python snapshot_corpus.py
+
+"""
+
+# packages and modules
+import json
+import hashlib
+import shutil
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bson import BSON
+from helper_functions import *
+from database import MongoDatabase
+from tweet_tracker import TweetTracker
+
+# switches
+export_snapshot = False
+import_snapshot = False
+
+# settings
+snapshot_folder = os.path.join('files', 'snapshots')
+snapshot_collections = ['sanders_tweets_raw', 'semeval_tweets_raw', 'clarin13_tweets_raw', 'hcr_tweets_raw', 'omd_tweets_raw', 'stanford_tweets_raw', 'manual_tweets_raw',
+						'training_tweets', 'target_tweets', 'near_duplicate_index', 'near_duplicate_index_signatures', 'preprocess_cache']
+part_size = 10000
+compression = 'snappy'
+drop_collections = False
+
+
+def get_checksum(file_name, block_size = 2 ** 20):
+
+	"""
+		Return the SHA-256 checksum of a file
+
+		Parameters
+		----------
+		file_name : os.path
+			file to read in blocks
+		block_size : int (optional)
+			number of bytes to read at once
+
+		Returns
+		--------
+		checksum : string
+			hexadecimal SHA-256 checksum
+	"""
+
+	checksum = hashlib.sha256()
+
+	with open(file_name, 'rb') as f:
+		for block in iter(lambda: f.read(block_size), b''):
+			checksum.update(block)
+
+	return checksum.hexdigest()
+
+
+def export_collection(db, collection, folder, part_size = 10000, compression = 'snappy'):
+
+	"""
+		Write all documents of a collection to Parquet files
+
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		collection : string
+			name of the collection to export
+		folder : os.path
+			snapshot folder, the files are written to a subfolder with the name of the collection
+		part_size : int (optional)
+			number of documents in each file
+		compression : string (optional)
+			compression of the Parquet files
+
+		Returns
+		--------
+		entry : dictionary
+			number of documents and the files with their number of documents and checksum, for the manifest
+	"""
+
+	logging.info('Called function: {} '.format(sys._getframe().f_code.co_name))
+
+	try:
+
+		# remove the files of an earlier export, so no old files are left behind
+		if os.path.exists(os.path.join(folder, collection)):
+			shutil.rmtree(os.path.join(folder, collection))
+
+		create_directory(os.path.join(folder, collection))
+
+		entry = {'count' : 0, 'parts' : []}
+
+		progress = ProgressReporter('export {}'.format(collection), total = db.count_collection(collection = collection))
+
+		for index, docs in enumerate(read_in_chunks(db.read_collection(collection = collection), chunk_size = part_size)):
+
+			# the _id as text to find documents without decoding them, and the full document as BSON
+			table = pa.Table.from_arrays([	pa.array([str(d['_id']) for d in docs], type = pa.string()),
+											pa.array([BSON.encode(d) for d in docs], type = pa.binary())], names = ['_id', 'document'])
+
+			file_name = os.path.join(collection, 'part-{:05d}.parquet'.format(index))
+
+			pq.write_table(table, os.path.join(folder, file_name), compression = compression)
+
+			entry['parts'].append({'file' : file_name, 'count' : len(docs), 'sha256' : get_checksum(os.path.join(folder, file_name))})
+			entry['count'] += len(docs)
+
+			progress.update(len(docs))
+
+		progress.finish()
+
+		return entry
+
+	except Exception, e:
+		logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+		exit(1)
+
+
+def import_collection(db, collection, folder, entry, part_size = 10000, drop_collection = False):
+
+	"""
+		Insert the documents of the Parquet files of a collection into the database
+
+		Parameters
+		----------
+		db : MongoDatabase
+			database connection
+		collection : string
+			name of the collection to import
+		folder : os.path
+			snapshot folder
+		entry : dictionary
+			entry of the collection in the manifest
+		part_size : int (optional)
+			number of documents to insert at once
+		drop_collection : Boolean (optional)
+			drop the collection first if it already has documents, otherwise such a collection is skipped
+	"""
+
+	logging.info('Called function: {} '.format(sys._getframe().f_code.co_name))
+
+	try:
+
+		# check all files before dropping or inserting anything, so a damaged snapshot does not leave a partial collection
+		for part in entry['parts']:
+			if get_checksum(os.path.join(folder, part['file'])) != part['sha256']:
+				logging.error('Checksum of {} does not match the manifest, skipping collection {}'.format(part['file'], collection))
+				return
+
+		if db.count_collection(collection = collection) > 0:
+
+			if not drop_collection:
+				logging.warning('Collection {} already has documents, skipping (set drop_collections = True to replace it)'.format(collection))
+				return
+
+			logging.info('Dropping collection: {}'.format(collection))
+			db.drop_collection(collection = collection)
+
+		progress = ProgressReporter('import {}'.format(collection), total = entry['count'])
+
+		for part in entry['parts']:
+
+			documents = pq.read_table(os.path.join(folder, part['file']), columns = ['document']).column('document').to_pylist()
+
+			for chunk in read_in_chunks(documents, chunk_size = part_size):
+
+				db.insert_many_to_collection(collection = collection, docs = [BSON(x).decode() for x in chunk])
+
+				progress.update(len(chunk))
+
+		progress.finish()
+
+		# the saved tracker of the collection does not know the imported documents
+		TweetTracker(name = collection).delete()
+
+		count = db.count_collection(collection = collection)
+
+		if count != entry['count']:
+			logging.error('Imported {} documents into {}, the manifest lists {}'.format(count, collection, entry['count']))
+
+	except Exception, e:
+		logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+		exit(1)
+
+
+if __name__ == "__main__":
+
+	# create logging to console
+	set_logger()
+
+	logging.info('Start: {} '.format(__file__))
+
+	# create database connection
+	db = MongoDatabase()
+
+	# file with the collections, files, and checksums of the snapshot
+	manifest_file = os.path.join(snapshot_folder, 'manifest.json')
+
+	# execute if set to True
+	if export_snapshot:
+
+		create_directory(snapshot_folder)
+
+		# keep the collections of an earlier export that are not exported again
+		manifest = json.load(open(manifest_file, 'r')) if os.path.isfile(manifest_file) else {'collections' : {}}
+
+		for collection in snapshot_collections:
+
+			manifest['collections'][collection] = export_collection(db, collection, snapshot_folder, part_size = part_size, compression = compression)
+
+			logging.info('Exported {} documents from {}'.format(manifest['collections'][collection]['count'], collection))
+
+		manifest['created'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+		# write the manifest last, and at once, so it only lists complete files
+		with open(manifest_file + '.tmp', 'w') as f:
+			json.dump(manifest, f, indent = 4, sort_keys = True)
+		os.rename(manifest_file + '.tmp', manifest_file)
+
+	# execute if set to True
+	if import_snapshot:
+
+		manifest = json.load(open(manifest_file, 'r'))
+
+		for collection, entry in sorted(manifest['collections'].items()):
+
+			import_collection(db, collection, snapshot_folder, entry, part_size = part_size, drop_collection = drop_collections)
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Classes to build a streaming pipeline out of stages: a source that reads documents, transforms and filters that work on one document or on a batch of documents,
+	and a sink that writes documents in bulk. Stages are chained generators, so a stage only reads the next document when the stage after it asks for one, and a
+	parallel batch stage only reads ahead a bounded number of batches (backpressure). Each stage reports its own throughput when the pipeline has finished.
+"""
+
+# packages and modules
+import logging
+import time
+from helper_functions import read_in_chunks, map_chunks
+from instrumentation import ProgressReporter
+
+
+class Stage:
+
+	def __init__(self, name):
+
+		# set name of the stage, used when reporting the throughput
+		self.name = name
+
+
+	def process(self, items):
+
+		"""
+			Return a generator of processed items, the base stage passes the items through unchanged (for example, to measure the throughput at a point of the
+			pipeline), other stages override this
+		"""
+
+		for item in items:
+			yield item
+
+
+class Source(Stage):
+
+	def __init__(self, name, read, total = None):
+
+		"""
+			Parameters
+			----------
+			name : string
+				name of the stage
+			read : function
+				function without arguments that returns an iterable of documents, for example, a database cursor
+			total : int (optional)
+				number of documents that will be read (count it once up front), used to report the progress of the pipeline
+		"""
+
+		Stage.__init__(self, name)
+
+		self.read = read
+		self.total = total
+
+
+	def process(self, items):
+
+		"""
+			Read the documents (a source has no input)
+		"""
+
+		for item in self.read():
+			yield item
+
+
+class Transform(Stage):
+
+	def __init__(self, name, func):
+
+		"""
+			Parameters
+			----------
+			name : string
+				name of the stage
+			func : function
+				function that takes a document and returns the transformed document, or None to drop the document
+		"""
+
+		Stage.__init__(self, name)
+
+		self.func = func
+
+
+	def process(self, items):
+
+		for item in items:
+
+			item = self.func(item)
+
+			if item is not None:
+				yield item
+
+
+class Filter(Stage):
+
+	def __init__(self, name, predicate):
+
+		"""
+			Parameters
+			----------
+			name : string
+				name of the stage
+			predicate : function
+				function that takes a document and returns True to keep the document
+		"""
+
+		Stage.__init__(self, name)
+
+		self.predicate = predicate
+
+
+	def process(self, items):
+
+		for item in items:
+
+			if self.predicate(item):
+				yield item
+
+
+class BatchTransform(Stage):
+
+	def __init__(self, name, func, batch_size = 1000, num_workers = 1, initializer = None, initargs = (), max_pending = None):
+
+		"""
+			Parameters
+			----------
+			name : string
+				name of the stage
+			func : function
+				function that takes a list of documents and returns a list of transformed documents (None values are dropped). Needs to be defined at module level
+				when num_workers > 1
+			batch_size : int (optional)
+				number of documents in each batch
+			num_workers : int (optional)
+				number of worker processes, see map_chunks()
+			initializer : function (optional)
+				function that is called once in each worker process
+			initargs : tuple (optional)
+				arguments for the initializer
+			max_pending : int (optional)
+				maximum number of batches that are read ahead, see map_chunks()
+		"""
+
+		Stage.__init__(self, name)
+
+		self.func = func
+		self.batch_size = batch_size
+		self.num_workers = num_workers
+		self.initializer = initializer
+		self.initargs = initargs
+		self.max_pending = max_pending
+
+
+	def process(self, items):
+
+		for batch in map_chunks(self.func, read_in_chunks(items, self.batch_size), num_workers = self.num_workers, initializer = self.initializer, initargs = self.initargs, max_pending = self.max_pending):
+
+			for item in batch:
+
+				if item is not None:
+					yield item
+
+
+class Sink(Stage):
+
+	def __init__(self, name, write, batch_size = 1000):
+
+		"""
+			Parameters
+			----------
+			name : string
+				name of the stage
+			write : function
+				function that takes a list of documents and writes them, for example, to the database in bulk
+			batch_size : int (optional)
+				number of documents to write at once
+		"""
+
+		Stage.__init__(self, name)
+
+		self.write = write
+		self.batch_size = batch_size
+
+
+	def process(self, items):
+
+		"""
+			Write the documents in batches and pass them on, so the pipeline can count them
+		"""
+
+		for batch in read_in_chunks(items, self.batch_size):
+
+			self.write(batch)
+
+			for item in batch:
+				yield item
+
+
+class StreamPipeline:
+
+	def __init__(self, name, stages):
+
+		"""
+			Parameters
+			----------
+			name : string
+				name of the pipeline
+			stages : list of Stage objects
+				stages to chain, starting with a source
+		"""
+
+		logging.info('Initialize {}: {}'.format(self.__class__.__name__, name))
+
+		self.name = name
+		self.stages = stages
+
+		# number of documents that left each stage and the time spent in each stage, including the stages before it
+		self.counts = [0] * len(stages)
+		self.seconds = [0.0] * len(stages)
+
+		# report the progress of the documents read by the source
+		self.progress = ProgressReporter(name, total = getattr(stages[0], 'total', None))
+
+
+	def measure(self, index, items):
+
+		"""
+			Count the documents that a stage returns and the time spent waiting for them
+		"""
+
+		items = iter(items)
+
+		while True:
+
+			start = time.time()
+
+			try:
+				item = next(items)
+			except StopIteration:
+				self.seconds[index] += time.time() - start
+				return
+
+			self.seconds[index] += time.time() - start
+			self.counts[index] += 1
+
+			if index == 0:
+				self.progress.update()
+
+			yield item
+
+
+	def run(self):
+
+		"""
+			Pull all documents through the stages and report the throughput of each stage
+		"""
+
+		items = None
+
+		# chain the stages
+		for index, stage in enumerate(self.stages):
+			items = self.measure(index, stage.process(items))
+
+		# the last stage drives the pipeline
+		for _ in items:
+			pass
+
+		self.progress.finish()
+		self.report()
+
+
+	def report(self):
+
+		"""
+			Log the number of documents, the time spent, and the throughput of each stage (time spent in the stages before it excluded)
+		"""
+
+		logging.info('Finished pipeline: {}'.format(self.name))
+
+		for index, stage in enumerate(self.stages):
+
+			# time spent in this stage only
+			seconds = self.seconds[index] - (self.seconds[index - 1] if index > 0 else 0.0)
+
+			logging.info('	-	{:<30} {:>10} docs {:>10.1f} sec {:>10.1f} docs/sec'.format(stage.name, self.counts[index], seconds, self.counts[index] / seconds if seconds > 0 else 0.0))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Tests of clean_tweets(), the batch version of clean_tweet() and get_tokens(). Run from the root folder with: python -m unittest discover tests
+"""
+
+# packages and modules
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from helper_functions import clean_tweets, clean_tweet, get_tokens
+
+
+class CleanTweetsTest(unittest.TestCase):
+
+	texts = [	u'@user I can\'t believe it :) http://t.co/abc #science',
+				u'Sooooo happy!!! ❤ we\'re done &amp; it\'s great\n',
+				u'what a day :( \U0001F622 “quoted” — 2018',
+				u'',
+				u'   ',
+				u'ends with a user @user',
+				u'ends with a link http://t.co/x',
+				u'ooo',
+				u'oo']
+
+
+	def test_same_as_clean_tweet(self):
+
+		text, tokens = clean_tweets(self.texts)
+
+		for i, raw_text in enumerate(self.texts):
+
+			self.assertEqual(text[i], clean_tweet(raw_text))
+			self.assertEqual(tokens[i], get_tokens(clean_tweet(raw_text)))
+
+
+	def test_rules_stay_within_a_text(self):
+
+		# the texts are joined into one string, a rule that reaches the end of a text must not continue into the next text
+		text, tokens = clean_tweets([u'hi @user', u'there', u'so', u'ooo :', u')'])
+
+		self.assertEqual(text, [u'hi USERTAG', u'there', u'so', u'oo', u''])
+
+
+	def test_separator_in_text(self):
+
+		# a text with the separator of the joined string is cleaned text by text
+		texts = [u'a text with a \x00 in it :)', u'another text']
+		text, tokens = clean_tweets(texts)
+
+		self.assertEqual(text, [clean_tweet(x) for x in texts])
+
+
+	def test_empty(self):
+
+		# a chunk where all texts are cached passes an empty list
+		text, tokens = clean_tweets([])
+
+		self.assertEqual(len(text), 0)
+		self.assertEqual(len(tokens), 0)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that keeps track of processed tweet IDs. The IDs of each tweet type are stored as a sorted numpy array of 64 bit integers (8 bytes per tweet instead of a
+	Python string in a set), optionally with a Bloom filter in front. The arrays are saved to .npy files and memory-mapped when they are loaded again, so a next run
+	does not have to read all the processed IDs from the database.
+"""
+
+# packages and modules
+import json
+import logging
+import os
+import re
+import numpy as np
+from bloom_filter import BloomFilter
+
+
+class TweetTracker:
+
+	def __init__(self, name, folder = os.path.join('files', 'trackers'), use_bloom_filter = False, false_positive_rate = 0.01, merge_size = 100000):
+
+		"""
+			Parameters
+			----------
+			name : string
+				name of the tracker, used for the file names, for example, the name of the collection that is tracked
+			folder : os.path (optional)
+				folder to save the tracker files to
+			use_bloom_filter : Boolean (optional)
+				check a Bloom filter first, so most new IDs are not searched for in the (memory-mapped) arrays
+			false_positive_rate : float (optional)
+				false positive rate of the Bloom filter
+			merge_size : int (optional)
+				number of added IDs of a tweet type that are kept in a set before they are merged into the sorted array
+		"""
+
+		logging.info('Initialize {}: {}'.format(self.__class__.__name__, name))
+
+		self.name = name
+		self.folder = folder
+		self.use_bloom_filter = use_bloom_filter
+		self.false_positive_rate = false_positive_rate
+		self.merge_size = merge_size
+
+		# key = tweet type, value = sorted array of IDs
+		self.ids = {}
+		# key = tweet type, value = set of IDs that are added but not yet merged
+		self.pending = {}
+		# key = tweet type, value = BloomFilter
+		self.bloom_filters = {}
+		# tweet types that are changed since they were loaded
+		self.changed = set()
+		# number of documents whose IDs were added (a collection can hold the same ID more than once), None if the tracker was saved without it
+		self.num_docs = 0
+
+		# load the saved IDs
+		self.load()
+
+
+	def get_file(self, tweet_type = None, extension = 'npy'):
+
+		"""
+			Return the file of the IDs of a tweet type, or of the meta data of the tracker if no tweet type is given
+		"""
+
+		if tweet_type is None:
+			return os.path.join(self.folder, '{}.{}'.format(self.name, extension))
+
+		return os.path.join(self.folder, '{}_{}.{}'.format(self.name, re.sub(r'\W', '_', tweet_type), extension))
+
+
+	def exists(self):
+
+		"""
+			Return True if the tracker has been saved before
+		"""
+
+		return os.path.isfile(self.get_file(extension = 'json'))
+
+
+	def load(self):
+
+		"""
+			Memory-map the saved IDs and Bloom filters
+		"""
+
+		if not self.exists():
+			return
+
+		with open(self.get_file(extension = 'json'), 'r') as f:
+			meta = json.load(f)
+
+		self.num_docs = meta.get('num_docs')
+
+		for tweet_type, info in meta['types'].iteritems():
+
+			self.ids[tweet_type] = np.load(self.get_file(tweet_type), mmap_mode = 'r')
+
+			if self.use_bloom_filter:
+				# the tracker could have been saved without Bloom filters
+				if info.get('num_hashes') is not None:
+					self.bloom_filters[tweet_type] = BloomFilter(capacity = info['capacity'], false_positive_rate = self.false_positive_rate, bits = np.load(self.get_file(tweet_type, 'bloom.npy'), mmap_mode = 'r'), num_hashes = info['num_hashes'])
+				else:
+					self.create_bloom_filter(tweet_type)
+					self.changed.add(tweet_type)
+
+		logging.info('Loaded {} tweet IDs'.format(len(self)))
+
+
+	def group_by_type(self, tweet_type, ids):
+
+		"""
+			Return the IDs as an int64 array and the indexes of the IDs of each tweet type
+
+			Parameters
+			----------
+			tweet_type : string or list of strings
+				the tweet type of all IDs, or the tweet type of each ID
+			ids : int or list of ints
+
+			Returns
+			--------
+			ids : np.array(int64)
+			groups : list of tuples
+				(tweet type, indexes of the IDs of this type)
+		"""
+
+		ids = np.atleast_1d(np.asarray(ids, dtype = np.int64))
+
+		if isinstance(tweet_type, basestring):
+			return ids, [(tweet_type, np.arange(len(ids)))]
+
+		types = np.asarray(tweet_type)
+
+		return ids, [(t, np.flatnonzero(types == t)) for t in set(tweet_type)]
+
+
+	def add(self, tweet_type, ids):
+
+		"""
+			Add processed IDs, one for each document that is saved
+
+			Parameters
+			----------
+			tweet_type : string or list of strings
+				the tweet type of all IDs, or the tweet type of each ID
+			ids : int or list of ints
+		"""
+
+		ids, groups = self.group_by_type(tweet_type, ids)
+
+		if self.num_docs is not None:
+			self.num_docs += len(ids)
+
+		for t, index in groups:
+
+			self.pending.setdefault(t, set()).update(ids[index].tolist())
+			self.changed.add(t)
+
+			if self.use_bloom_filter:
+
+				# size a new Bloom filter, or a larger one when it is full
+				if t not in self.bloom_filters or len(self.ids.get(t, [])) + len(self.pending[t]) > self.bloom_filters[t].capacity:
+					self.create_bloom_filter(t)
+				else:
+					self.bloom_filters[t].add(ids[index])
+
+			if len(self.pending[t]) >= self.merge_size:
+				self.merge(t)
+
+
+	def create_bloom_filter(self, tweet_type):
+
+		"""
+			Create a Bloom filter with room for twice the current number of IDs of a tweet type, and add the IDs
+		"""
+
+		current = self.ids.get(tweet_type, np.zeros(0, dtype = np.int64))
+		pending = np.fromiter(self.pending.get(tweet_type, set()), dtype = np.int64)
+
+		bloom_filter = BloomFilter(capacity = max(2 * (len(current) + len(pending)), self.merge_size), false_positive_rate = self.false_positive_rate)
+
+		# add in chunks to limit the memory of the hash positions
+		for i in range(0, len(current), self.merge_size):
+			bloom_filter.add(current[i:i + self.merge_size])
+		bloom_filter.add(pending)
+
+		self.bloom_filters[tweet_type] = bloom_filter
+
+
+	def merge(self, tweet_type):
+
+		"""
+			Merge the pending IDs of a tweet type into the sorted array
+		"""
+
+		pending = self.pending.pop(tweet_type, None)
+
+		if not pending:
+			return
+
+		current = self.ids.get(tweet_type, np.zeros(0, dtype = np.int64))
+
+		self.ids[tweet_type] = np.union1d(current, np.fromiter(pending, dtype = np.int64, count = len(pending)))
+
+
+	def contains(self, tweet_type, ids):
+
+		"""
+			Check which IDs are processed
+
+			Parameters
+			----------
+			tweet_type : string or list of strings
+				the tweet type of all IDs, or the tweet type of each ID
+			ids : int or list of ints
+
+			Returns
+			--------
+			processed : np.array(bool)
+				True if the ID of that tweet type has been added
+		"""
+
+		ids, groups = self.group_by_type(tweet_type, ids)
+
+		processed = np.zeros(len(ids), dtype = bool)
+
+		for t, index in groups:
+
+			# only the IDs that might have been added need to be searched for
+			if t in self.bloom_filters:
+				index = index[self.bloom_filters[t].contains(ids[index])]
+
+			current = self.ids.get(t)
+
+			if current is not None and len(current) > 0:
+				position = np.minimum(np.searchsorted(current, ids[index]), len(current) - 1)
+				processed[index] = current[position] == ids[index]
+
+			pending = self.pending.get(t)
+
+			if pending:
+				processed[index] |= np.array([x in pending for x in ids[index].tolist()], dtype = bool)
+
+		return processed
+
+
+	def __contains__(self, key):
+
+		"""
+			Check if a single (tweet type, ID) is processed
+		"""
+
+		tweet_type, tweet_id = key
+
+		return bool(self.contains(tweet_type, tweet_id)[0])
+
+
+	def __len__(self):
+
+		return sum([len(x) for x in self.ids.values()]) + sum([len(x) for x in self.pending.values()])
+
+
+	def save(self):
+
+		"""
+			Merge the pending IDs and save the changed tweet types to .npy files, the files are replaced at once so a crash never leaves a partial file
+		"""
+
+		if not os.path.exists(self.folder):
+			os.makedirs(self.folder)
+
+		for tweet_type in self.changed:
+
+			self.merge(tweet_type)
+
+			self.save_file(self.ids[tweet_type], self.get_file(tweet_type))
+
+			if tweet_type in self.bloom_filters:
+				self.save_file(self.bloom_filters[tweet_type].bits, self.get_file(tweet_type, 'bloom.npy'))
+
+		# meta data of each tweet type, and the number of documents to check the tracker against its collection
+		meta = {'types' : {}, 'num_docs' : self.num_docs}
+
+		for tweet_type, ids in self.ids.iteritems():
+
+			meta['types'][tweet_type] = {'count' : len(ids)}
+
+			if tweet_type in self.bloom_filters:
+				meta['types'][tweet_type]['num_hashes'] = self.bloom_filters[tweet_type].num_hashes
+				meta['types'][tweet_type]['capacity'] = self.bloom_filters[tweet_type].capacity
+
+		self.save_file(meta, self.get_file(extension = 'json'))
+
+		self.changed = set()
+
+		logging.debug('Saved {} tweet IDs'.format(len(self)))
+
+
+	def save_file(self, data, file_name):
+
+		"""
+			Write an array (or the meta data as json) to a temporary file and rename it
+		"""
+
+		temp_file = file_name + '.tmp'
+
+		with open(temp_file, 'wb') as f:
+			if isinstance(data, dict):
+				json.dump(data, f)
+			else:
+				np.save(f, data)
+
+		os.rename(temp_file, file_name)
+
+
+	def delete(self):
+
+		"""
+			Remove the saved files of the tracker, so it is built again from the database, for example, after the tracked collection was replaced
+		"""
+
+		if not self.exists():
+			return
+
+		with open(self.get_file(extension = 'json'), 'r') as f:
+			meta = json.load(f)
+
+		for tweet_type in meta['types']:
+			for file_name in [self.get_file(tweet_type), self.get_file(tweet_type, 'bloom.npy')]:
+				if os.path.isfile(file_name):
+					os.remove(file_name)
+
+		os.remove(self.get_file(extension = 'json'))
+
+		self.ids, self.pending, self.bloom_filters, self.changed, self.num_docs = {}, {}, {}, set(), 0
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""
+	Created by:	Shaheen Syed
+	Date: 		August 2018
+
+	Class that matches a list of words against a text in a single scan (Aho-Corasick automaton)
+"""
+
+# packages and modules
+import logging
+import sys
+from collections import deque
+
+
+class WordMatcher:
+
+	def __init__(self, words, word_boundary = False):
+
+		"""
+			Build the automaton once from a list of words
+
+			Parameters
+			----------
+			words : list of strings
+				words (or phrases) to search for, for example, a list of academic occupations
+			word_boundary : Boolean (optional)
+				if True, only match words that are not part of a larger word, for example, 'actuary' will then not match 'actuaryship'
+		"""
+
+		logging.info('Initialize {}'.format(self.__class__.__name__))
+
+		# set words
+		self.words = words
+
+		# set word boundary matching
+		self.word_boundary = word_boundary
+
+		# transitions, failure links, and indexes of the words that end in each state (state 0 is the root)
+		self.transitions = [{}]
+		self.failure = [0]
+		self.output = [[]]
+
+		# add each word to the trie
+		for index, word in enumerate(self.words):
+			self.add_word(index, word)
+
+		# create the failure links so the text can be scanned without backtracking
+		self.build_failure_links()
+
+
+	def add_word(self, index, word):
+
+		"""
+			Add a word to the trie
+
+			Parameters
+			----------
+			index : int
+				position of the word in the list of words
+			word : string
+				word to add
+		"""
+
+		state = 0
+
+		for c in word:
+
+			# create new state if transition does not exist yet
+			if c not in self.transitions[state]:
+				self.transitions.append({})
+				self.failure.append(0)
+				self.output.append([])
+				self.transitions[state][c] = len(self.transitions) - 1
+
+			state = self.transitions[state][c]
+
+		self.output[state].append(index)
+
+
+	def build_failure_links(self):
+
+		"""
+			Set the failure link of each state to the longest proper suffix that is also a state in the trie (breadth first)
+		"""
+
+		queue = deque(self.transitions[0].values())
+
+		while queue:
+
+			state = queue.popleft()
+
+			for c, next_state in self.transitions[state].iteritems():
+
+				queue.append(next_state)
+
+				# follow failure links until a state has a transition for c
+				failure = self.failure[state]
+				while failure != 0 and c not in self.transitions[failure]:
+					failure = self.failure[failure]
+
+				self.failure[next_state] = self.transitions[failure].get(c, 0)
+
+				# words that end in the failure state also end in this state
+				self.output[next_state] = self.output[next_state] + self.output[self.failure[next_state]]
+
+
+	def is_word_boundary(self, text, start, end):
+
+		"""
+			Check if text[start:end] is not surrounded by alphanumeric characters
+		"""
+
+		if start > 0 and text[start - 1].isalnum():
+			return False
+
+		if end < len(text) and text[end].isalnum():
+			return False
+
+		return True
+
+
+	def find(self, text):
+
+		"""
+			Return all words that occur in text
+
+			Parameters
+			----------
+			text : string
+				text to search in, for example, the bio of a user
+
+			Returns
+			--------
+			matches : list of strings
+				the matched words, in the same order as the words the matcher was created with
+		"""
+
+		try:
+
+			# indexes of matched words (words that are empty match any text, as with the 'in' operator)
+			found = set([] if self.word_boundary else self.output[0])
+
+			state = 0
+
+			for i, c in enumerate(text):
+
+				# follow failure links until a state has a transition for c
+				while state != 0 and c not in self.transitions[state]:
+					state = self.failure[state]
+
+				state = self.transitions[state].get(c, 0)
+
+				for index in self.output[state]:
+
+					if self.word_boundary and not self.is_word_boundary(text, i - len(self.words[index]) + 1, i + 1):
+						continue
+
+					found.add(index)
+
+			return [self.words[index] for index in sorted(found)]
+
+		except Exception, e:
+			logging.error('[{}] : {}'.format(sys._getframe().f_code.co_name,e))
+			exit(1)